@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP Autosave
+Background, coalescing writer for small JSON files such as the last used settings
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+# Seconds close() waits for the last write before giving up
+FLUSH_TIMEOUT = 2.0
+
+
+class JSONAutosaver:
+    """Write JSON snapshots of one file on a background thread
+
+    ``submit`` only stores the newest snapshot and wakes the writer, so it
+    never blocks on disk I/O and a burst of submits ends up as one write.
+    Each write goes to a temporary file that replaces the real one, so a
+    crash leaves either the old or the new contents. A snapshot equal to
+    the last one written is skipped.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.writes = 0
+        self._condition = threading.Condition()
+        self._pending = None
+        self._written = None
+        self._busy = False
+        self._closed = False
+        self._thread = None
+
+    def submit(self, data):
+        """Queue data (a JSON-serialisable dict) to be written, replacing any snapshot still waiting"""
+        with self._condition:
+            if self._closed:
+                return
+            self._pending = data
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="freerdp-autosave", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def flush(self, timeout=None):
+        """Wait until every submitted snapshot has been written, returning False on timeout"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending is None and not self._busy, timeout)
+
+    def close(self, timeout=FLUSH_TIMEOUT):
+        """Write the last snapshot and stop the writer thread"""
+        flushed = self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        return flushed
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None or self._closed)
+                if self._pending is None:
+                    return
+                data, self._pending = self._pending, None
+                self._busy = True
+            try:
+                if data != self._written:
+                    self._write(data)
+                    self._written = data
+            except Exception as e:
+                print(f"Error saving {self.path.name}: {e}")
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def _write(self, data):
+        temp_file = self.path.with_name(self.path.name + ".tmp")
+        with open(temp_file, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_file, self.path)
+        self.writes += 1
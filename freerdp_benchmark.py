@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP Benchmarks
+Times the store, connection list and command builder hot paths against synthetic inventories
+and writes the results as JSON, so releases can be compared for regressions
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from freerdp_autosave import JSONAutosaver
+from freerdp_core import BUILDER_VERSION, DEFAULT_SETTINGS, build_command, compile_profile
+from freerdp_discovery import FreeRDPInfo
+from freerdp_store import ConnectionStore
+
+# Inventory sizes timed by default; 100000 is available through --sizes
+DEFAULT_SIZES = (1000, 10000)
+
+# Timed runs per benchmark; the median is the figure compared between runs
+DEFAULT_REPEAT = 5
+
+# Lookups, builds or saves per timed run of the per-item benchmarks
+BATCH = 1000
+
+# A median this much slower than the baseline's counts as a regression
+REGRESSION_THRESHOLD = 0.25
+
+# Rows the connection list shows at once, as in the Connections tab
+VISIBLE_ROWS = 8
+
+RESULTS_VERSION = 1
+
+SITES = ("hq", "lon", "nyc", "sgp", "fra", "syd")
+RESOLUTIONS = (("1920", "1080"), ("2560", "1440"), ("1280", "720"), ("3840", "2160"))
+
+# A FreeRDP 3 build with H.264, as the probe would report it
+BENCH_INFO = FreeRDPInfo("/usr/bin/xfreerdp", "3.5.1", ("v", "u", "size", "gfx", "rfx", "codec-cache", "network"),
+                         0.0, ("h264",))
+
+
+def synthetic_settings(index, rng):
+    """Return one profile in the get_current_settings() schema, varied the way real inventories are"""
+    site = rng.choice(SITES)
+    width, height = rng.choice(RESOLUTIONS)
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(
+        server=f"srv{index:06d}.{site}.corp.example",
+        port=rng.choice(("3389",) * 9 + ("3390",)),
+        username=f"user{rng.randrange(500):03d}",
+        domain=rng.choice(("", "CORP", "LAB")),
+        width=width,
+        height=height,
+        fullscreen=rng.random() < 0.3,
+        color_depth=rng.choice(("32", "32", "24", "16")),
+        clipboard=rng.random() < 0.7,
+        compression=rng.random() < 0.2,
+        gateway=f"gw.{site}.corp.example" if rng.random() < 0.25 else "",
+        wfreerdp_path=BENCH_INFO.path,
+        cert_ignore=rng.random() < 0.1,
+        network_tuning=rng.choice(("", "", "lan", "wan")),
+        custom_params="/log-level:WARN" if rng.random() < 0.05 else "",
+    )
+    return settings
+
+
+def synthetic_inventory(count, seed=0):
+    """Yield count (name, settings) pairs, the same for the same seed"""
+    rng = random.Random(seed)
+    for index in range(count):
+        settings = synthetic_settings(index, rng)
+        yield f"{settings['username']}@{settings['server']}", settings
+
+
+def time_runs(func, repeat, setup=None):
+    """Return the wall time of repeat calls of func, each after an untimed setup()"""
+    samples = []
+    for i in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(name, size, samples, ops=1):
+    """Return the JSON record of one benchmark: seconds per run and operations per second"""
+    ordered = sorted(samples)
+    median = statistics.median(ordered)
+    return {
+        'name': name,
+        'size': size,
+        'runs': len(ordered),
+        'ops': ops,
+        'min': ordered[0],
+        'median': median,
+        'p95': ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))],
+        'ops_per_second': ops / median if median else None,
+    }
+
+
+class HeadlessList:
+    """Stand-in for the connection list's VirtualTreeview when Tk has no display
+
+    Does the model work set_rows and set_filter do, sorting by name and
+    fetching the values of the visible rows, without creating Tk items.
+    """
+
+    def __init__(self, get_values, sort_value, page_size=VISIBLE_ROWS):
+        self.get_values = get_values
+        self.sort_value = sort_value
+        self.page_size = page_size
+        self.rows = []
+        self._all_rows = []
+
+    def set_rows(self, keys):
+        self._all_rows = sorted(keys, key=lambda key: self.sort_value(key, "name"))
+        self.set_filter(None)
+
+    def set_filter(self, keys):
+        keys = None if keys is None else set(keys)
+        self.rows = [key for key in self._all_rows if keys is None or key in keys]
+        return [self.get_values(key) for key in self.rows[:self.page_size]]
+
+
+def make_list(store, use_tk):
+    """Return (connection list, backend name, cleanup) wired to store like the Connections tab"""
+
+    def row_values(profile_id):
+        record = store.index.by_id(profile_id)
+        return record.name, record.server or "No server", record.username, "", ""
+
+    def sort_value(profile_id, column):
+        return getattr(store.index.by_id(profile_id), column).lower()
+
+    if use_tk:
+        import tkinter as tk
+        from freerdp_widgets import VirtualTreeview
+        root = tk.Tk()
+        columns = [("name", "Name", 200), ("server", "Server", 200), ("username", "User", 120),
+                   ("last_used", "Last Used", 120), ("status", "Status", 60)]
+        widget = VirtualTreeview(root, columns, row_values, sort_value=sort_value, height=VISIBLE_ROWS)
+        widget.pack()
+        widget.sort_by("name")
+        root.update()
+
+        class TkList:
+            """Applies each change and lets Tk redraw, as the event loop would"""
+
+            def set_rows(self, keys):
+                widget.set_rows(keys)
+                root.update_idletasks()
+
+            def set_filter(self, keys):
+                widget.set_filter(keys)
+                root.update_idletasks()
+
+        return TkList(), "tk", root.destroy
+    return HeadlessList(row_values, sort_value), "headless", lambda: None
+
+
+def bench_inventory(size, repeat, folder, use_tk, seed=0):
+    """Time the store and connection list paths for one inventory size"""
+    results = []
+    inventory = list(synthetic_inventory(size, seed))
+    names = [name for name, settings in inventory]
+    rng = random.Random(seed)
+    db_file = Path(folder) / f"bench-{size}.db"
+
+    def remove_db():
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            Path(str(db_file) + suffix).unlink(missing_ok=True)
+
+    def save_all():
+        store = ConnectionStore(db_file)
+        store.put_many(inventory)
+        store.close()
+
+    results.append(summarize("save_connections", size, time_runs(save_all, repeat, remove_db), size))
+
+    def load():
+        ConnectionStore(db_file).close()
+
+    results.append(summarize("load_connections", size, time_runs(load, repeat), 1))
+
+    store = ConnectionStore(db_file)
+    sample = rng.sample(names, min(BATCH, len(names)))
+
+    def save_one():
+        for name in sample[:100]:
+            store.put(name, dict(store[name], clipboard=not store[name]['clipboard']))
+
+    results.append(summarize("save_connection", size, time_runs(save_one, repeat), 100))
+
+    connection_list, backend, cleanup = make_list(store, use_tk)
+    try:
+        def update_list():
+            connection_list.set_rows(record.id for record in store.index.records())
+
+        results.append(summarize("update_connection_list", size, time_runs(update_list, repeat), 1))
+
+        # The store builds its search index on the first search; time that once, apart from the rest
+        results.append(summarize("first_search", size, time_runs(lambda: store.search("srv00 lon"), 1), 1))
+
+        def search():
+            connection_list.set_filter(store.search("srv00 lon"))
+            connection_list.set_filter(None)
+
+        results.append(summarize("filter_connection_list", size, time_runs(search, repeat), 1))
+    finally:
+        cleanup()
+
+    def lookup():
+        for name in sample:
+            store.index.by_id(store.index.get(name).id)
+
+    results.append(summarize("selection_lookup", size, time_runs(lookup, repeat), len(sample)))
+
+    cold = {}
+
+    def open_cold():
+        if cold:
+            cold['store'].close()
+        cold['store'] = ConnectionStore(db_file)
+
+    def load_selected():
+        # A fresh store each run, so every profile is read and decoded as on its first selection
+        for name in sample:
+            cold['store'][name]
+
+    results.append(summarize("load_connection", size, time_runs(load_selected, repeat, open_cold), len(sample)))
+    cold['store'].close()
+
+    def compile_stored():
+        for name in sample:
+            compile_profile(store, name, "", lambda path: BENCH_INFO)
+
+    # The first pass compiles and stores each argv; the timed passes reuse it
+    compile_stored()
+    results.append(summarize("compile_profile_stored", size, time_runs(compile_stored, repeat), len(sample)))
+    store.close()
+    remove_db()
+    for result in results:
+        result['backend'] = backend if "connection_list" in result['name'] else None
+    return results
+
+
+def bench_builder(repeat, folder, seed=0):
+    """Time build_command and saving/loading the last used settings"""
+    results = []
+    profiles = [settings for name, settings in synthetic_inventory(BATCH, seed)]
+
+    def build_all():
+        for settings in profiles:
+            build_command(settings, BENCH_INFO)
+
+    results.append(summarize("build_command", None, time_runs(build_all, repeat), BATCH))
+
+    last_settings_file = Path(folder) / "last_settings.json"
+    autosaver = JSONAutosaver(last_settings_file)
+    counter = iter(range(sys.maxsize))
+
+    def save_last():
+        # Each snapshot differs, so none is skipped as unchanged
+        for settings in profiles[:100]:
+            autosaver.submit(dict(settings, custom_params=str(next(counter))))
+            autosaver.flush()
+
+    results.append(summarize("save_last_settings", None, time_runs(save_last, repeat), 100))
+    autosaver.close()
+
+    def load_last():
+        for i in range(100):
+            with open(last_settings_file, 'r') as f:
+                json.load(f)
+
+    results.append(summarize("load_last_settings", None, time_runs(load_last, repeat), 100))
+    return results
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT, use_tk=False, on_result=None):
+    """Run every benchmark, returning the results document"""
+    results = []
+    with tempfile.TemporaryDirectory(prefix="freerdp-bench-") as folder:
+        for size in sizes:
+            for result in bench_inventory(size, repeat, folder, use_tk):
+                results.append(result)
+                if on_result:
+                    on_result(result)
+        for result in bench_builder(repeat, folder):
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return {
+        'version': RESULTS_VERSION,
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'builder_version': BUILDER_VERSION,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Return (name, size, baseline median, median) for each benchmark slower than the baseline by threshold"""
+    previous = {(result['name'], result['size']): result for result in baseline.get('results', [])}
+    regressions = []
+    for result in results['results']:
+        old = previous.get((result['name'], result['size']))
+        if old and result['median'] > old['median'] * (1 + threshold):
+            regressions.append((result['name'], result['size'], old['median'], result['median']))
+    return regressions
+
+
+def describe(result):
+    size = f"[{result['size']}]" if result['size'] else ""
+    rate = f", {result['ops_per_second']:,.0f} ops/s" if result['ops_per_second'] else ""
+    return f"{result['name']}{size}: median {result['median'] * 1000:.2f} ms{rate}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the FreeRDP GUI Wrapper hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Inventory sizes to time (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per benchmark")
+    parser.add_argument("--tk", action="store_true",
+                        help="Time the real Tk connection list (needs a display, e.g. xvfb-run)")
+    parser.add_argument("--output", metavar="FILE", help="Write the JSON results to FILE instead of stdout")
+    parser.add_argument("--compare", metavar="FILE", help="Baseline results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Slowdown of the median counted as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.repeat, args.tk,
+                             on_result=lambda result: print(describe(result), file=sys.stderr))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for name, size, old, new in regressions:
+            print(f"Regression: {name}{f'[{size}]' if size else ''} {old * 1000:.2f} ms -> {new * 1000:.2f} ms",
+                  file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP Command Line
+Headless access to saved connections without importing or starting Tk
+"""
+
+import argparse
+import getpass
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from freerdp_core import (CONNECTIONS_FILE, CONTROL_FILE, DISCOVERY_CACHE_FILE, LEGACY_CONNECTIONS_FILE,
+                          NETWORK_CACHE_FILE, TELEMETRY_FILE, VAULT_FILE, compile_profile, complete_settings,
+                          format_command, stdin_credentials)
+from freerdp_control import ControlError, NotRunning, send_request
+from freerdp_discovery import DiscoveryCache
+from freerdp_display import DisplayLayout
+from freerdp_import import Importer, export_csv, export_rdp
+from freerdp_probe import LinkCache, ReachabilityProber, first_failure, probe_settings
+from freerdp_store import ConnectionStore
+from freerdp_telemetry import TelemetryLog
+from freerdp_vault import Vault, VaultError, profile_password
+
+
+class ProfileNotFound(Exception):
+    pass
+
+
+class Unreachable(Exception):
+    pass
+
+
+def open_store():
+    """Open the saved connections store shared with the GUI"""
+    return ConnectionStore(CONNECTIONS_FILE, legacy_json=LEGACY_CONNECTIONS_FILE)
+
+
+def profile_settings(store, name):
+    """Return the complete settings of a saved profile"""
+    if name not in store:
+        raise ProfileNotFound(name)
+    return complete_settings(store[name])
+
+
+def profile_command(store, name):
+    """Return the FreeRDP command for a saved profile, compiled once and stored with it"""
+    settings = profile_settings(store, name)
+    discovery = DiscoveryCache(DISCOVERY_CACHE_FILE)
+    default_path = '' if settings['wfreerdp_path'].strip() else discovery.find() or ''
+    links = LinkCache(NETWORK_CACHE_FILE)
+    if links.needs_measure(settings):
+        links.measure(settings)
+    return compile_profile(store, name, default_path, discovery.probe, get_monitors=DisplayLayout().monitors,
+                           tune=links.tier)
+
+
+def connect_password(settings):
+    """Return the password to write to FreeRDP's stdin, asking for the vault's master password when needed"""
+    vault = Vault(VAULT_FILE)
+    if settings['password_id'] and not settings['password']:
+        vault.unlock(getpass.getpass("Vault master password: "))
+    return profile_password(settings, vault)
+
+
+def hand_off(command, **params):
+    """Hand a request to the running GUI, returning False when no GUI is running"""
+    try:
+        send_request(CONTROL_FILE, command, **params)
+    except NotRunning:
+        return False
+    return True
+
+
+def cmd_list(args):
+    """Print saved profiles, optionally filtered by a search query"""
+    store = open_store()
+    records = store.index.records()
+    if args.search:
+        matches = store.search(args.search)
+        records = [record for record in records if record.id in matches]
+
+    if args.json:
+        print(json.dumps([{'name': record.name, 'server': record.server, 'username': record.username,
+                           'domain': record.domain, 'gateway': record.gateway, 'last_used': record.last_used,
+                           'template': record.template}
+                          for record in records], indent=2))
+    else:
+        for record in records:
+            print(f"{record.name}\t{record.server}\t{record.username}")
+    return 0
+
+
+def cmd_show_command(args):
+    """Print the FreeRDP command for a saved profile"""
+    print(format_command(profile_command(open_store(), args.profile)))
+    return 0
+
+
+def cmd_connect(args):
+    """Launch a saved profile, waiting for FreeRDP unless --detach is given or a running GUI takes it over"""
+    if not args.standalone and hand_off("connect", profile=args.profile, check=args.check):
+        print(f"Connecting '{args.profile}' in the running FreeRDP GUI")
+        return 0
+    store = open_store()
+    cmd = profile_command(store, args.profile)
+    settings = profile_settings(store, args.profile)
+    if args.check and settings['check_reachability']:
+        failure = first_failure(probe_settings(settings))
+        if failure:
+            raise Unreachable(failure.describe())
+    password = connect_password(settings)
+    store.touch(args.profile)
+
+    if not args.detach:
+        if password is None:
+            return subprocess.call(cmd)
+        return subprocess.run(cmd, input=stdin_credentials(cmd, password), text=True).returncode
+
+    stdin = subprocess.PIPE if password is not None else subprocess.DEVNULL
+    if sys.platform == "win32":
+        process = subprocess.Popen(cmd, stdin=stdin, text=True,
+                                   creationflags=subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP)
+    else:
+        process = subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, text=True,
+                                   start_new_session=True)
+    if password is not None:
+        process.stdin.write(stdin_credentials(cmd, password))
+        process.stdin.close()
+    print(process.pid)
+    return 0
+
+
+def cmd_check(args):
+    """Probe saved profiles concurrently and print whether each one is reachable"""
+    store = open_store()
+    names = args.profiles or list(store)
+    jobs = [(name, profile_settings(store, name)) for name in names]
+    results = {}
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def on_result(name, probe_results):
+        with lock:
+            results[name] = probe_results
+            if len(results) == len(jobs):
+                done.set()
+
+    prober = ReachabilityProber()
+    prober.probe_many(jobs, on_result)
+    if jobs:
+        done.wait()
+    prober.shutdown()
+
+    down = 0
+    for name in names:
+        for result in results[name]:
+            print(f"{name}\t{'up' if result.ok else 'down'}\t{result.describe()}")
+        down += first_failure(results[name]) is not None
+    return 1 if down else 0
+
+
+def cmd_measure(args):
+    """Measure the link to saved profiles' servers and print the network tier each maps to"""
+    store = open_store()
+    links = LinkCache(NETWORK_CACHE_FILE)
+    failed = 0
+    for name in args.profiles:
+        quality = links.measure(profile_settings(store, name))
+        print(f"{name}\t{quality.describe()}")
+        failed += not quality.ok
+    return 1 if failed else 0
+
+
+def cmd_history(args):
+    """Print per-profile connection latency percentiles, or export them"""
+    telemetry = TelemetryLog(TELEMETRY_FILE)
+    if args.csv:
+        telemetry.export_csv(args.csv)
+    elif args.json:
+        telemetry.export_json(args.json)
+    else:
+        print("profile\tattempts\tfailures\tstartup p50/p95 ms\tprobe p50/p95 ms")
+        for stats in telemetry.summary():
+            print(f"{stats.profile}\t{stats.attempts}\t{stats.failures}\t"
+                  f"{stats.percentile('startup', 0.5)}/{stats.percentile('startup', 0.95)}\t"
+                  f"{stats.percentile('probe', 0.5)}/{stats.percentile('probe', 0.95)}")
+    return 0
+
+
+def cmd_import(args):
+    """Import .rdp, CSV and Remmina files (or folders of them), reporting progress on stderr"""
+    paths = [os.path.abspath(path) for path in args.paths]
+    if not args.standalone and hand_off("import", paths=paths, template=args.template):
+        print(f"Importing {len(paths)} paths in the running FreeRDP GUI")
+        return 0
+    store = open_store()
+    if args.template and args.template not in store.templates:
+        raise ValueError(f"no template named '{args.template}'")
+
+    def on_progress(stats):
+        print(f"\r{stats.describe()}", end="", file=sys.stderr, flush=True)
+
+    stats = Importer(store, template=args.template, on_progress=None if args.quiet else on_progress).run(paths)
+    if not args.quiet:
+        print(file=sys.stderr)
+    for error in stats.errors:
+        print(f"Error: {error}", file=sys.stderr)
+    print(stats.describe())
+    return 1 if stats.errors else 0
+
+
+def cmd_export(args):
+    """Export every saved profile as CSV or as .rdp files"""
+    store = open_store()
+    if args.csv:
+        count = export_csv(store, args.csv)
+    else:
+        count = export_rdp(store, args.rdp)
+    print(f"Exported {count} profiles")
+    return 0
+
+
+def cmd_sessions(args):
+    """List the sessions started by the running GUI"""
+    try:
+        sessions = send_request(CONTROL_FILE, "sessions")
+    except NotRunning:
+        print("No FreeRDP GUI is running", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(sessions, indent=2))
+    else:
+        for session in sessions:
+            print(f"{session['id']}\t{session['name']}\t{session['pid']}\t{session['status']}")
+    return 0
+
+
+def cmd_monitors(args):
+    """List the local monitors with the numbers used by the Monitors setting"""
+    monitors = DisplayLayout().monitors()
+    if not monitors:
+        print("No monitors detected", file=sys.stderr)
+        return 1
+    for monitor in monitors:
+        print(monitor.describe())
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="FreeRDP GUI Wrapper command line")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    subparsers.required = True
+
+    list_parser = subparsers.add_parser("list", help="List saved connections")
+    list_parser.add_argument("--search", help="Only list profiles matching all words of SEARCH")
+    list_parser.add_argument("--json", action="store_true", help="Print the list as JSON")
+    list_parser.set_defaults(func=cmd_list)
+
+    show_parser = subparsers.add_parser("show-command", help="Print the FreeRDP command for a profile")
+    show_parser.add_argument("profile", help="Saved connection name")
+    show_parser.set_defaults(func=cmd_show_command)
+
+    connect_parser = subparsers.add_parser("connect", help="Connect using a saved profile")
+    connect_parser.add_argument("profile", help="Saved connection name")
+    connect_parser.add_argument("--detach", action="store_true",
+                                help="Start FreeRDP in the background and print its PID")
+    connect_parser.add_argument("--no-check", dest="check", action="store_false",
+                                help="Skip the reachability check before starting FreeRDP")
+    connect_parser.add_argument("--standalone", action="store_true",
+                                help="Start FreeRDP from this process even when the GUI is running")
+    connect_parser.set_defaults(func=cmd_connect)
+
+    check_parser = subparsers.add_parser("check", help="Check whether saved connections are reachable")
+    check_parser.add_argument("profiles", nargs="*", metavar="profile",
+                              help="Saved connection names (default: all)")
+    check_parser.set_defaults(func=cmd_check)
+
+    measure_parser = subparsers.add_parser("measure", help="Measure the link to saved connections for network tuning")
+    measure_parser.add_argument("profiles", nargs="+", metavar="profile", help="Saved connection name")
+    measure_parser.set_defaults(func=cmd_measure)
+
+    history_parser = subparsers.add_parser("history", help="Show connection latency and failures per profile")
+    export_group = history_parser.add_mutually_exclusive_group()
+    export_group.add_argument("--csv", metavar="FILE", help="Export the per-profile summary as CSV")
+    export_group.add_argument("--json", metavar="FILE", help="Export the summary and every launch as JSON")
+    history_parser.set_defaults(func=cmd_history)
+
+    import_parser = subparsers.add_parser("import", help="Import .rdp, CSV and Remmina files or folders of them")
+    import_parser.add_argument("paths", nargs="+", metavar="path", help="File or folder to import")
+    import_parser.add_argument("--template", help="Make the imported profiles inherit from TEMPLATE")
+    import_parser.add_argument("--quiet", action="store_true", help="Do not report progress")
+    import_parser.add_argument("--standalone", action="store_true",
+                               help="Import from this process even when the GUI is running")
+    import_parser.set_defaults(func=cmd_import)
+
+    export_parser = subparsers.add_parser("export", help="Export saved connections")
+    export_target = export_parser.add_mutually_exclusive_group(required=True)
+    export_target.add_argument("--csv", metavar="FILE", help="Write every profile to a CSV file")
+    export_target.add_argument("--rdp", metavar="FOLDER", help="Write every profile as a .rdp file")
+    export_parser.set_defaults(func=cmd_export)
+
+    sessions_parser = subparsers.add_parser("sessions", help="List the sessions of the running GUI")
+    sessions_parser.add_argument("--json", action="store_true", help="Print the sessions as JSON")
+    sessions_parser.set_defaults(func=cmd_sessions)
+
+    monitors_parser = subparsers.add_parser("monitors", help="List local monitors and their numbers")
+    monitors_parser.set_defaults(func=cmd_monitors)
+    return parser
+
+
+def main(argv=None):
+    """Run a command line request, returning the process exit code"""
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except ProfileNotFound as e:
+        print(f"Error: no saved connection named '{e}'", file=sys.stderr)
+    except VaultError as e:
+        print(f"Error: {e}", file=sys.stderr)
+    except ControlError as e:
+        print(f"Error: the running FreeRDP GUI: {e}", file=sys.stderr)
+    except Unreachable as e:
+        print(f"Error: {e}; FreeRDP was not started (use --no-check to skip the check)", file=sys.stderr)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+    except FileNotFoundError as e:
+        print(f"Error: FreeRDP executable not found: {e.filename}", file=sys.stderr)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP Codec Selection
+Picks the graphics pipeline and codec of a session from the FreeRDP build, the local CPU and the link
+"""
+
+import os
+import platform
+import sys
+
+# Codec settings: (setting value, label shown in the Expert tab)
+CODECS = (
+    ("", "RemoteFX checkbox only"),
+    ("auto", "Best for this FreeRDP, CPU and link"),
+    ("avc444", "GFX H.264 AVC444 (full colour)"),
+    ("avc420", "GFX H.264 AVC420"),
+    ("progressive", "GFX progressive"),
+    ("rfx", "RemoteFX"),
+)
+
+# /gfx: mode names of the GFX codecs
+GFX_MODES = {'avc444': "AVC444", 'avc420': "AVC420", 'progressive': "progressive", 'rfx': "RFX"}
+
+# AVC444 decodes two H.264 streams per frame; with fewer cores AVC420 is used
+AVC444_MIN_CORES = 4
+
+# Network tiers too slow for AVC444's extra chroma stream
+SLOW_TIERS = ("satellite", "broadband-low", "modem")
+
+# CPU flags of the SIMD extensions FreeRDP's colour conversion uses
+SIMD_FLAGS = frozenset(("ssse3", "sse4_1", "avx2", "neon", "asimd"))
+
+# IsProcessorFeaturePresent feature numbers and the /proc/cpuinfo flag each matches
+WINDOWS_CPU_FEATURES = {36: "ssse3", 37: "sse4_1", 40: "avx2", 19: "neon"}
+
+# Architectures whose baseline already includes usable SIMD, for when no flags can be read
+SIMD_MACHINES = ("x86_64", "amd64", "arm64", "aarch64")
+
+
+class CPUFeatures:
+    """Local core count and the SIMD flags relevant to decoding"""
+
+    def __init__(self, cores, flags=(), machine=""):
+        self.cores = cores
+        self.flags = frozenset(flags)
+        self.machine = machine.lower()
+
+    @property
+    def simd(self):
+        """True when H.264 frames can be converted with SIMD rather than plain C"""
+        if self.flags:
+            return bool(self.flags & SIMD_FLAGS)
+        return self.machine in SIMD_MACHINES
+
+    def describe(self):
+        simd = "/".join(sorted(self.flags & SIMD_FLAGS)) or ("assumed SIMD" if self.simd else "no SIMD")
+        return f"{self.cores} cores, {simd}"
+
+
+def read_cpu_flags():
+    """Return the CPU's feature flags in /proc/cpuinfo spelling, or an empty set when they cannot be read"""
+    if sys.platform == "win32":
+        import ctypes
+        present = ctypes.windll.kernel32.IsProcessorFeaturePresent
+        return {flag for feature, flag in WINDOWS_CPU_FEATURES.items() if present(feature)}
+    try:
+        with open("/proc/cpuinfo", 'r') as f:
+            for line in f:
+                # "flags" on x86, "Features" on ARM
+                key, _, value = line.partition(":")
+                if key.strip().lower() in ("flags", "features"):
+                    return set(value.split())
+    except OSError:
+        pass
+    return set()
+
+
+_cpu = None
+
+
+def cpu_features():
+    """Return the local CPUFeatures, read once per process"""
+    global _cpu
+    if _cpu is None:
+        try:
+            flags = read_cpu_flags()
+        except Exception as e:
+            print(f"Error reading CPU features: {e}")
+            flags = set()
+        _cpu = CPUFeatures(os.cpu_count() or 1, flags, platform.machine())
+    return _cpu
+
+
+class CodecSupport:
+    """Graphics options a probed FreeRDP build offers"""
+
+    def __init__(self, info=None):
+        self.probed = bool(info and info.options)
+        self.major = info.major if info else None
+        self.gfx = not self.probed or "gfx" in info.options
+        self.h264 = self.probed and "h264" in info.features
+        # FreeRDP 3 takes progressive as a /gfx: mode; FreeRDP 2 has a separate option
+        self.progressive = self.probed and (bool(self.major and self.major >= 3) or "gfx-progressive" in info.options)
+        self.rfx = not self.probed or "rfx" in info.options
+        self.codec_cache = self.probed and "codec-cache" in info.options
+
+    def supports(self, codec):
+        if codec in ("avc444", "avc420"):
+            return self.gfx and self.h264
+        if codec == "progressive":
+            return self.gfx and self.progressive
+        if codec == "rfx":
+            return self.rfx
+        return False
+
+
+class CodecChoice:
+    """The graphics arguments picked for a session and the reasons for them"""
+
+    def __init__(self, codec, args, reasons):
+        self.codec = codec
+        self.args = args
+        self.reasons = reasons
+
+    def describe(self):
+        return "; ".join(self.reasons)
+
+
+def codec_args(codec, support):
+    """Return the FreeRDP arguments that select codec on a build with the given support"""
+    if codec == "gfx":
+        return ["/gfx"]
+    if codec == "rfx" and not support.gfx:
+        # RemoteFX surface bits without the GFX pipeline
+        return ["/rfx"] + (["/codec-cache:rfx"] if support.codec_cache else [])
+    if codec == "progressive" and support.major is not None and support.major < 3:
+        return ["/gfx-progressive"]
+    return [f"/gfx:{GFX_MODES[codec]}"]
+
+
+def choose_codec(settings, info=None, cpu=None):
+    """Pick the graphics pipeline and codec of a profile, returning a CodecChoice
+
+    A codec named in the profile is used as it is. 'auto' prefers H.264
+    when the build has it and the CPU can convert frames with SIMD,
+    AVC444 over AVC420 when there are cores and bandwidth to spare, and
+    progressive or RemoteFX otherwise. The RemoteFX checkbox asks auto for
+    RemoteFX. The network tier, if resolved, should already be in
+    settings['network_tuning'].
+    """
+    requested = settings.get('codec', 'auto')
+    if not requested:
+        return CodecChoice("", [], ["codec selection is off; the RemoteFX checkbox applies"])
+
+    if requested not in dict(CODECS):
+        raise ValueError(f"Unknown codec '{requested}'; use one of: " + ", ".join(value for value, label in CODECS[1:]))
+
+    support = CodecSupport(info)
+    if requested != "auto":
+        reasons = [f"{requested} chosen in the profile"]
+        if support.probed and not support.supports(requested):
+            reasons.append(f"this FreeRDP build does not list {GFX_MODES[requested]} support")
+        return CodecChoice(requested, codec_args(requested, support), reasons)
+
+    cpu = cpu or cpu_features()
+    tier = settings.get('network_tuning', '')
+    if not support.probed:
+        return CodecChoice("", [], ["FreeRDP has not been probed yet, so its own defaults are kept"])
+    if not support.gfx:
+        if support.rfx:
+            return CodecChoice("rfx", codec_args("rfx", support), ["this FreeRDP build has no GFX pipeline"])
+        return CodecChoice("", [], ["this FreeRDP build has neither GFX nor RemoteFX"])
+    if settings.get('remotefx', False):
+        return CodecChoice("rfx", codec_args("rfx", support), ["RemoteFX is enabled in the profile"])
+
+    if support.h264 and cpu.simd:
+        if cpu.cores < AVC444_MIN_CORES:
+            codec, why = "avc420", f"only {cpu.cores} CPU cores for AVC444's second stream"
+        elif tier in SLOW_TIERS:
+            codec, why = "avc420", f"the {tier} link is too slow for AVC444's extra colour data"
+        else:
+            codec, why = "avc444", f"full-colour H.264 with {cpu.describe()}"
+        return CodecChoice(codec, codec_args(codec, support), ["this FreeRDP build has H.264", why])
+
+    reasons = ["this FreeRDP build has no H.264" if not support.h264
+               else f"the CPU ({cpu.describe()}) would decode H.264 without SIMD"]
+    if support.progressive:
+        return CodecChoice("progressive", codec_args("progressive", support),
+                           reasons + ["progressive refines images as bandwidth allows"])
+    if support.rfx:
+        return CodecChoice("rfx", codec_args("rfx", support), reasons + ["RemoteFX over the GFX pipeline"])
+    return CodecChoice("gfx", codec_args("gfx", support), reasons + ["GFX pipeline with its default codecs"])
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP Control
+Local control API of a running GUI, so later invocations hand their requests to it instead of starting Tk
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import os
+import secrets
+import socket
+import sys
+import threading
+from pathlib import Path
+
+# Seconds a client waits to reach the running instance and for each answer
+CONTROL_TIMEOUT = 5.0
+
+# Longest request or response line, in bytes
+MAX_LINE_BYTES = 1 << 20
+
+
+def use_unix_socket():
+    """True where the API is a Unix socket; on Windows it is a loopback TCP port guarded by a token"""
+    return hasattr(socket, "AF_UNIX") and sys.platform != "win32"
+
+
+class ControlError(Exception):
+    """The running instance rejected a request or did not answer"""
+
+
+class NotRunning(ControlError):
+    """No instance is listening"""
+
+
+class ControlServer:
+    """Asyncio server of the control API, running on its own thread
+
+    Clients send one JSON object per line, such as
+    {"command": "connect", "profile": "Work Server"}, and get one line
+    back: {"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+    handlers maps command names to handler(request) functions, which
+    are run through dispatch(func) on the thread that owns the state
+    they touch (the Tk thread in the GUI) and raise ValueError for a bad
+    request. "ping" is answered by the server itself. On POSIX, path is
+    a Unix socket only the user can open; on Windows, path is a JSON
+    file holding the loopback port and the token each request must carry.
+    """
+
+    def __init__(self, path, handlers, dispatch=None):
+        self.path = Path(path)
+        self.handlers = handlers
+        self.dispatch = dispatch
+        self.token = None
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._lock_file = None
+
+    def start(self):
+        """Start listening, returning False when another instance already is or the API cannot be opened"""
+        # Held while listening, so of two instances starting at once only one replaces a stale socket
+        self._lock_file = lock_exclusive(self.path.with_name(self.path.name + ".lock"))
+        if self._lock_file is None:
+            return False
+        started = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(started,), name="freerdp-control", daemon=True)
+        self._thread.start()
+        started.wait()
+        if self._server is None:
+            self._release_lock()
+            return False
+        return True
+
+    def _release_lock(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _run(self, started):
+        loop = self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server = None
+        try:
+            server = self._server = loop.run_until_complete(self._listen())
+        except Exception as e:
+            print(f"Error starting control API: {e}")
+        finally:
+            started.set()
+        if server is None:
+            loop.close()
+            return
+        loop.run_forever()
+        server.close()
+        # Drop requests still waiting on the Tk thread, which is going away
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.close()
+
+    async def _listen(self):
+        if use_unix_socket():
+            # Left behind by an instance that did not shut down, since start() got the lock
+            if self.path.exists():
+                self.path.unlink()
+            server = await asyncio.start_unix_server(self._handle, path=str(self.path), limit=MAX_LINE_BYTES)
+            os.chmod(self.path, 0o600)
+            return server
+        server = await asyncio.start_server(self._handle, "127.0.0.1", 0, limit=MAX_LINE_BYTES)
+        self.token = secrets.token_hex(16)
+        temp_file = self.path.with_name(self.path.name + ".tmp")
+        with open(temp_file, 'w') as f:
+            json.dump({'port': server.sockets[0].getsockname()[1], 'token': self.token, 'pid': os.getpid()}, f)
+        os.replace(temp_file, self.path)
+        return server
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self._respond(line)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError, asyncio.CancelledError):
+            # The client went away, sent a line over MAX_LINE_BYTES, or the server is closing
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, line):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("a request must be a JSON object")
+            if self.token and not secrets.compare_digest(str(request.get('token', '')), self.token):
+                raise ValueError("invalid token")
+            command = request.get('command')
+            if command == "ping":
+                return {'ok': True, 'result': {'pid': os.getpid()}}
+            handler = self.handlers.get(command)
+            if handler is None:
+                raise ValueError(f"unknown command '{command}'")
+            result = await self._call(handler, request)
+        except ValueError as e:
+            return {'ok': False, 'error': str(e)}
+        except Exception as e:
+            print(f"Error handling control request: {e}")
+            return {'ok': False, 'error': str(e)}
+        return {'ok': True, 'result': result}
+
+    async def _call(self, handler, request):
+        """Run handler(request) through dispatch and wait for it without blocking the event loop"""
+        if self.dispatch is None:
+            return handler(request)
+        future = concurrent.futures.Future()
+
+        def run():
+            try:
+                future.set_result(handler(request))
+            except Exception as e:
+                future.set_exception(e)
+
+        self.dispatch(run)
+        return await asyncio.wrap_future(future)
+
+    def close(self):
+        """Stop listening and remove the socket (or port file)"""
+        if self._server is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=CONTROL_TIMEOUT)
+        self._server = None
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+        self._release_lock()
+
+
+def lock_exclusive(path):
+    """Open path and lock it without waiting, returning the open file, or None when another process holds it
+
+    The lock goes away with the file, including when the process dies.
+    """
+    lock_file = open(path, 'a+')
+    try:
+        if sys.platform == "win32":
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+async def request(path, command, timeout=CONTROL_TIMEOUT, **params):
+    """Send one request to the instance listening at path and return its result
+
+    Raises NotRunning when nothing is listening and ControlError when the
+    instance rejects the request or does not answer within timeout.
+    """
+    message = dict(params, command=command)
+    try:
+        if use_unix_socket():
+            connect = asyncio.open_unix_connection(str(path), limit=MAX_LINE_BYTES)
+        else:
+            with open(path, 'r') as f:
+                info = json.load(f)
+            message['token'] = info['token']
+            connect = asyncio.open_connection("127.0.0.1", info['port'], limit=MAX_LINE_BYTES)
+        reader, writer = await asyncio.wait_for(connect, timeout)
+    except (OSError, ValueError, KeyError, asyncio.TimeoutError) as e:
+        raise NotRunning(str(e))
+
+    try:
+        writer.write(json.dumps(message).encode() + b"\n")
+        await writer.drain()
+        line = await asyncio.wait_for(reader.readline(), timeout)
+    except (OSError, ValueError, asyncio.TimeoutError) as e:
+        raise ControlError(f"the running instance did not answer: {str(e) or 'timed out'}")
+    finally:
+        writer.close()
+    if not line:
+        raise ControlError("the running instance closed the connection")
+    try:
+        response = json.loads(line)
+        if not isinstance(response, dict):
+            raise ValueError("not a JSON object")
+    except ValueError as e:
+        raise ControlError(f"the running instance sent an unreadable answer: {e}")
+    if not response.get('ok'):
+        raise ControlError(response.get('error') or "request failed")
+    return response.get('result')
+
+
+def send_request(path, command, timeout=CONTROL_TIMEOUT, **params):
+    """Blocking form of request() for scripts and the command line"""
+    return asyncio.run(request(path, command, timeout, **params))
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP Core
+Tk-free settings model and command builder shared by the GUI and the CLI
+"""
+
+from pathlib import Path
+
+from freerdp_codecs import choose_codec
+from freerdp_display import display_args, layout_fingerprint
+from freerdp_probe import network_args, tune_settings
+
+# Files shared by the GUI and the CLI
+CONNECTIONS_FILE = Path.home() / ".freerdp_connections.db"
+LEGACY_CONNECTIONS_FILE = Path.home() / ".freerdp_connections.json"
+LAST_SETTINGS_FILE = Path.home() / ".freerdp_last_settings.json"
+DISCOVERY_CACHE_FILE = Path.home() / ".freerdp_discovery.json"
+TELEMETRY_FILE = Path.home() / ".freerdp_telemetry.jsonl"
+SESSION_LOG_DIR = Path.home() / ".freerdp_logs"
+VAULT_FILE = Path.home() / ".freerdp_vault.json"
+NETWORK_CACHE_FILE = Path.home() / ".freerdp_network.json"
+METRICS_FILE = Path.home() / ".freerdp_metrics.prom"
+# Control API of the running GUI: a Unix socket, or on Windows a file with its port and token
+CONTROL_FILE = Path.home() / ".freerdp_control"
+
+# Settings stored with a compiled argv by ConnectionStore: those its key depends on, then those a launch
+# reads besides the argv, so a valid stored argv needs no decoding of the profile
+COMPILE_FIELDS = ('server', 'port', 'gateway', 'wfreerdp_path', 'display_layout', 'network_tuning',
+                  'password', 'password_id', 'auto_reconnect', 'reconnect_retries')
+
+# Bump when build_command changes its output, so argv compiled by older versions is rebuilt
+BUILDER_VERSION = 5
+
+# Every profile setting with its default value, in form order
+DEFAULT_SETTINGS = {
+    'server': '',
+    'port': '3389',
+    'username': '',
+    'domain': '',
+    'password': '',
+    'password_id': '',
+    'width': '1920',
+    'height': '1080',
+    'fullscreen': False,
+    'display_layout': '',
+    'monitors': '',
+    'color_depth': '32',
+    'clipboard': False,
+    'drive_redirect': '',
+    'printers': False,
+    'microphone': False,
+    'compression': False,
+    'fonts': False,
+    'aero': True,
+    'themes': True,
+    'wallpaper': True,
+    'network_tuning': '',
+    'gateway': '',
+    'gateway_user': '',
+    'wfreerdp_path': '',
+    'security': '',
+    'cert_ignore': False,
+    'admin_session': False,
+    'gdi_mode': '',
+    'remotefx': False,
+    'codec': 'auto',
+    'multimon': False,
+    'custom_params': '',
+    'check_reachability': True,
+    'auto_reconnect': False,
+    'reconnect_retries': '5',
+}
+
+
+def complete_settings(settings):
+    """Return settings with every missing key filled in from DEFAULT_SETTINGS"""
+    return {**DEFAULT_SETTINGS, **settings}
+
+
+def capability_fingerprint(path, info=None):
+    """Return a key for the executable a command is built for: builder version, path and probe"""
+    if info is None:
+        return f"{BUILDER_VERSION}|{path}||"
+    return f"{BUILDER_VERSION}|{path}|{info.version or ''}|{info.mtime or ''}"
+
+
+def compile_profile(store, name, default_path, probe, get_monitors=None, tune=None):
+    """Return the command for a saved profile (see compile_launch)"""
+    return compile_launch(store, name, default_path, probe, get_monitors, tune)[0]
+
+
+def compile_launch(store, name, default_path, probe, get_monitors=None, tune=None):
+    """Return (argv, fields) for a saved profile, reusing the argv compiled into the store when still valid
+
+    probe(path) returns the FreeRDPInfo for an executable (or None),
+    get_monitors() the local monitor layout, asked for only by profiles
+    whose display layout depends on it, and tune(settings) the network tier
+    of profiles tuned automatically (see LinkCache.tier). The stored argv
+    is tied to the executable's capability fingerprint (and the monitor
+    layout and tier) and is cleared by the store whenever the profile
+    changes, so a valid stored argv needs neither rebuilding nor validation.
+    The stored argv is looked up first: its key is checked against the
+    settings it was compiled from, and the profile is only decoded when
+    it has to be built again. fields holds the profile's COMPILE_FIELDS,
+    enough to launch it.
+    """
+    argv, argv_key, fields = store.compiled_command(name)
+    settings = None
+    if fields is None:
+        settings = complete_settings(store[name])
+        fields = {field: settings[field] for field in COMPILE_FIELDS}
+    path = fields['wfreerdp_path'].strip() or default_path.strip()
+    info = probe(path) if path else None
+    monitors = get_monitors() if get_monitors and fields['display_layout'] else None
+    key = capability_fingerprint(path, info)
+    if monitors:
+        key += "|" + layout_fingerprint(monitors)
+    tier = None
+    if tune and fields['network_tuning'] == "auto":
+        tier = tune(fields)
+        key += "|net:" + tier
+    if argv is not None and argv_key == key:
+        return argv, fields
+
+    if settings is None:
+        settings = complete_settings(store[name])
+        fields = {field: settings[field] for field in COMPILE_FIELDS}
+    compiled = dict(settings, wfreerdp_path=path)
+    if tier is not None:
+        compiled['network_tuning'] = tier
+    cmd = build_command(compiled, info, monitors)
+    if not settings['password']:
+        # A plain-text password from before the vault is not copied next to the argv
+        store.save_compiled_command(name, key, cmd, fields)
+    return cmd, fields
+
+
+def stdin_credentials(cmd, password):
+    """Return what to write to FreeRDP's stdin for cmd's /from-stdin prompt
+
+    FreeRDP asks for each credential missing from the command line in
+    order: username, domain, then password. build_command always gives
+    the domain along with a username, so only a profile without either
+    needs empty answers ahead of the password. /from-stdin:force reads
+    them all before connecting; a gateway without /gu: reuses these
+    credentials, and a later gateway prompt finds stdin already closed.
+    """
+    user = next((arg for arg in cmd if arg.startswith("/u:")), None)
+    lines = [] if user else [""]
+    if not (user and "\\" in user) and not any(arg.startswith("/d:") for arg in cmd):
+        lines.append("")
+    lines.append(password)
+    return "\n".join(lines) + "\n"
+
+
+def build_command(settings, info=None, monitors=None):
+    """Build the FreeRDP command line from a settings dictionary
+
+    info is the probed FreeRDPInfo of the executable, used to pick
+    FreeRDP 2 or 3 syntax, and monitors the local monitor layout used by
+    the display layouts. Raises ValueError if a required setting is
+    missing.
+    """
+
+    # A network tier replaces the profile's colour depth, compression and desktop effects
+    settings = tune_settings(settings)
+    freerdp_path = settings.get('wfreerdp_path', '').strip()
+    server = settings.get('server', '').strip()
+
+    if not freerdp_path:
+        raise ValueError("Please specify the path to FreeRDP executable")
+
+    if not server:
+        raise ValueError("Please enter a server hostname or IP address")
+
+    # Start building command
+    cmd = [freerdp_path]
+
+    # Basic connection
+    port = str(settings.get('port', '')).strip()
+    if port and port != "3389":
+        cmd.append(f"/v:{server}:{port}")
+    else:
+        cmd.append(f"/v:{server}")
+
+    # Authentication
+    username = settings.get('username', '').strip()
+    domain = settings.get('domain', '').strip()
+    if username:
+        if domain:
+            cmd.append(f"/u:{domain}\\{username}")
+        else:
+            cmd.append(f"/u:{username}")
+    elif domain:
+        cmd.append(f"/d:{domain}")
+
+    if settings.get('password') or settings.get('password_id'):
+        # The password is written to FreeRDP's stdin, never put where process listings can see it.
+        # An explicit (possibly empty) domain keeps FreeRDP from reading the password as the domain
+        if username and not domain:
+            cmd.append("/d:")
+        cmd.append("/from-stdin:force")
+
+    # Display settings
+    cmd.extend(display_args(settings, monitors))
+
+    color_depth = str(settings.get('color_depth', '')).strip()
+    if color_depth:
+        cmd.append(f"/bpp:{color_depth}")
+
+    # Advanced options
+    if settings.get('clipboard', False):
+        cmd.append("+clipboard")
+
+    drive_redirect = settings.get('drive_redirect', '').strip()
+    if drive_redirect:
+        cmd.append(f"/drive:share,{drive_redirect}")
+
+    if settings.get('microphone', False):
+        cmd.append("/mic")
+
+    if settings.get('compression', False):
+        cmd.append("+compression")
+
+    if settings.get('fonts', False):
+        cmd.append("+fonts")
+
+    if settings.get('aero', True):
+        cmd.append("+aero")
+    else:
+        cmd.append("-aero")
+
+    if not settings.get('themes', True):
+        cmd.append("-themes")
+
+    if not settings.get('wallpaper', True):
+        cmd.append("-wallpaper")
+
+    # The codec choice sets up the GFX pipeline itself when it picks one
+    codec = choose_codec(settings, info)
+    cmd.extend(network_args(settings, gfx=not codec.args))
+
+    # Gateway
+    gateway = settings.get('gateway', '').strip()
+    if gateway:
+        cmd.append(f"/g:{gateway}")
+        gateway_user = settings.get('gateway_user', '').strip()
+        if gateway_user:
+            cmd.append(f"/gu:{gateway_user}")
+
+    # Expert options
+    security = settings.get('security', '').strip()
+    if security:
+        cmd.append(f"/sec:{security}")
+
+    if settings.get('cert_ignore', False):
+        # FreeRDP 3 replaced /cert-ignore with /cert:ignore
+        if info and info.major and info.major >= 3:
+            cmd.append("/cert:ignore")
+        else:
+            cmd.append("/cert-ignore")
+
+    if settings.get('admin_session', False):
+        cmd.append("/admin")
+
+    gdi_mode = settings.get('gdi_mode', '').strip()
+    if gdi_mode:
+        cmd.append(f"/gdi:{gdi_mode}")
+
+    if codec.args:
+        cmd.extend(codec.args)
+    elif settings.get('remotefx', False):
+        cmd.append("/rfx")
+
+    if settings.get('multimon', False) and settings.get('display_layout') != "span":
+        cmd.append("/multimon")
+
+    # Custom parameters
+    custom_params = settings.get('custom_params', '').strip()
+    if custom_params:
+        # Split custom parameters and add them
+        cmd.extend(custom_params.split())
+
+    return cmd
+
+
+def format_command(cmd):
+    """Format a command list for display, quoting arguments that contain spaces"""
+    return " ".join(f'"{arg}"' if " " in arg else arg for arg in cmd)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP Executable Discovery
+Finds the FreeRDP executable, probes its version and options, and caches both
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+# Seconds allowed for each /version or /help probe
+PROBE_TIMEOUT = 5
+
+VERSION_RE = re.compile(r"version\s+(\d+\.\d+\.\d+[\w.+-]*)", re.IGNORECASE)
+
+# Option names in /help output: "/v:<server>", "+clipboard", "-wallpaper" or "[+|-]aero"
+OPTION_RE = re.compile(r"^\s+(?:\[\+\|-\]|[/+-])([A-Za-z][\w-]*)", re.MULTILINE)
+
+# /help only offers the AVC420/AVC444 GFX modes (and FreeRDP 2's /gfx-h264) in builds with H.264
+H264_RE = re.compile(r"AVC4(?:20|44)|gfx-h264", re.IGNORECASE)
+
+# Bump when probe_executable learns something new, so cached probes are run again
+PROBE_VERSION = 2
+
+
+def candidate_paths():
+    """Return (executable names, common install paths) for this platform"""
+    if sys.platform == "win32":
+        exe_names = ["wfreerdp.exe", "xfreerdp.exe", "freerdp.exe"]
+        common_paths = [
+            "./wfreerdp.exe",
+            "./xfreerdp.exe",
+            "C:\\Program Files\\FreeRDP\\wfreerdp.exe",
+            "C:\\Program Files (x86)\\FreeRDP\\wfreerdp.exe",
+            "C:\\Program Files\\FreeRDP\\xfreerdp.exe",
+            "C:\\Program Files (x86)\\FreeRDP\\xfreerdp.exe",
+            "C:\\Program Files\\wfreerdp\\wfreerdp.exe"
+        ]
+    else:
+        # Linux/Mac - xfreerdp is most common
+        exe_names = ["xfreerdp", "freerdp", "wfreerdp"]
+        common_paths = [
+            "/usr/bin/xfreerdp",
+            "/usr/local/bin/xfreerdp",
+            "/usr/bin/freerdp",
+            "/usr/local/bin/freerdp",
+            "/opt/freerdp/bin/xfreerdp",
+            "/snap/bin/freerdp"  # Snap packages
+        ]
+    return exe_names, common_paths
+
+
+def which(program):
+    """Find executable in PATH (cross-platform)"""
+
+    def is_exe(fpath):
+        return os.path.isfile(fpath) and os.access(fpath, os.X_OK)
+
+    fpath, fname = os.path.split(program)
+    if fpath:
+        if is_exe(program):
+            return program
+    else:
+        for path in os.environ.get("PATH", "").split(os.pathsep):
+            exe_file = os.path.join(path, program)
+            if is_exe(exe_file):
+                return exe_file
+            # Also check with .exe extension on Windows
+            if sys.platform == "win32":
+                exe_file_with_ext = exe_file + ".exe"
+                if is_exe(exe_file_with_ext):
+                    return exe_file_with_ext
+    return None
+
+
+def find_executable():
+    """Walk the common install paths and PATH for a FreeRDP executable"""
+    exe_names, common_paths = candidate_paths()
+
+    # Check common paths first
+    for path in common_paths:
+        if os.path.exists(path):
+            return path
+
+    # Check PATH for any of the executable names
+    for exe_name in exe_names:
+        found_path = which(exe_name)
+        if found_path:
+            return found_path
+    return None
+
+
+def file_mtime(path):
+    """Return the modification time of path, or None if it cannot be read"""
+    try:
+        return os.stat(path).st_mtime
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+class FreeRDPInfo:
+    """A FreeRDP executable with its probed version and supported options"""
+
+    def __init__(self, path, version=None, options=(), mtime=None, features=()):
+        self.path = path
+        self.version = version
+        self.options = frozenset(options)
+        self.mtime = mtime
+        # Build features found in /help beyond option names, such as 'h264'
+        self.features = frozenset(features)
+
+    @property
+    def major(self):
+        """Major version number, or None if the version could not be probed"""
+        try:
+            return int(self.version.split(".")[0])
+        except (AttributeError, ValueError):
+            return None
+
+    def supports(self, option):
+        """Return True if /help listed option (assume yes when nothing was probed)"""
+        return not self.options or option in self.options
+
+    def describe(self):
+        if not self.version:
+            return "unknown version"
+        return f"FreeRDP {self.version} (FreeRDP {self.major} syntax)"
+
+    def to_dict(self):
+        return {'version': self.version, 'options': sorted(self.options), 'mtime': self.mtime,
+                'features': sorted(self.features), 'probe_version': PROBE_VERSION}
+
+    @classmethod
+    def from_dict(cls, path, data):
+        return cls(path, data.get('version'), data.get('options', ()), data.get('mtime'), data.get('features', ()))
+
+
+def run_probe(cmd):
+    """Run a short probe command, returning its combined output ('' on failure)"""
+    creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+    try:
+        result = subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True, text=True,
+                                errors="replace", timeout=PROBE_TIMEOUT, creationflags=creationflags)
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    return result.stdout + result.stderr
+
+
+def probe_executable(path):
+    """Ask a FreeRDP executable for its version and the options it supports"""
+    version_output = run_probe([path, "/version"])
+    help_output = run_probe([path, "/help"])
+    match = VERSION_RE.search(version_output) or VERSION_RE.search(help_output)
+    features = ["h264"] if H264_RE.search(help_output) else []
+    return FreeRDPInfo(path, match.group(1) if match else None, OPTION_RE.findall(help_output),
+                       file_mtime(path), features)
+
+
+class DiscoveryCache:
+    """Persistent cache of the discovered executable and of per-executable probes
+
+    The discovered path is reused while PATH and the executable's mtime are
+    unchanged; probes are reused while the probed file's mtime is unchanged.
+    """
+
+    def __init__(self, cache_file):
+        self.cache_file = Path(cache_file)
+        self._lock = threading.Lock()
+        self.data = self._load()
+
+    def _load(self):
+        try:
+            if self.cache_file.exists():
+                with open(self.cache_file, 'r') as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    return data
+        except Exception as e:
+            print(f"Error loading FreeRDP discovery cache: {e}")
+        return {}
+
+    def _save(self):
+        """Write the cache atomically (callers hold the lock)"""
+        try:
+            temp_file = self.cache_file.with_name(self.cache_file.name + ".tmp")
+            with open(temp_file, 'w') as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(temp_file, self.cache_file)
+        except Exception as e:
+            print(f"Error saving FreeRDP discovery cache: {e}")
+
+    def find(self):
+        """Return the FreeRDP executable, walking the filesystem only on a cache miss"""
+        path_env = os.environ.get("PATH", "")
+        with self._lock:
+            path = self.data.get('executable')
+            if (path and self.data.get('path_env') == path_env
+                    and file_mtime(path) == self.data.get('executable_mtime')):
+                return path
+
+            path = find_executable()
+            self.data.update(executable=path, path_env=path_env, executable_mtime=file_mtime(path))
+            self._save()
+            return path
+
+    def cached_probe(self, path):
+        """Return the cached FreeRDPInfo for path if it is still current, else None"""
+        with self._lock:
+            data = self.data.get('probes', {}).get(path)
+        if (data and data.get('probe_version') == PROBE_VERSION and data.get('mtime') is not None
+                and data.get('mtime') == file_mtime(path)):
+            return FreeRDPInfo.from_dict(path, data)
+        return None
+
+    def probe(self, path):
+        """Return FreeRDPInfo for path, running the probe only when the cache is stale"""
+        info = self.cached_probe(path)
+        if info is None:
+            info = probe_executable(path)
+            with self._lock:
+                self.data.setdefault('probes', {})[path] = info.to_dict()
+                self._save()
+        return info
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP Display Layout
+Local monitor detection and the FreeRDP display arguments built from it
+"""
+
+import re
+import subprocess
+import sys
+import threading
+import time
+
+# Seconds a detected monitor layout is reused before monitors are queried again
+DISPLAY_CACHE_SECONDS = 60
+
+# Seconds allowed for xrandr to answer
+XRANDR_TIMEOUT = 2.0
+
+# Display layouts: (setting value, label shown in the Basic tab)
+DISPLAY_LAYOUTS = (
+    ("", "Fixed size"),
+    ("monitor", "Fullscreen on one monitor"),
+    ("span", "Span monitors"),
+    ("smart", "Window scaled from native size"),
+)
+
+# " 0: +*DP-1 2560/597x1440/336+0+0  DP-1" from xrandr --listmonitors
+LISTMONITORS_RE = re.compile(r"^\s*(\d+):\s+[+]?(\*?)(\S+)\s+(\d+)/\d+x(\d+)/\d+([+-]\d+)([+-]\d+)")
+
+# "HDMI-1 connected primary 1920x1080+2560+0 (normal ..." from xrandr --query (xrandr before 1.5)
+QUERY_RE = re.compile(r"^(\S+) connected (primary )?(\d+)x(\d+)([+-]\d+)([+-]\d+)")
+
+
+class Monitor:
+    """One local monitor, numbered the way FreeRDP's /monitors: option counts them"""
+
+    def __init__(self, index, name, x, y, width, height, primary=False):
+        self.index = index
+        self.name = name
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.primary = primary
+
+    def describe(self):
+        return f"{self.index}: {self.name} {self.width}x{self.height}{' (primary)' if self.primary else ''}"
+
+
+def parse_listmonitors(text):
+    """Parse the output of xrandr --listmonitors into Monitors"""
+    monitors = []
+    for line in text.splitlines():
+        match = LISTMONITORS_RE.match(line)
+        if match:
+            index, primary, name, width, height, x, y = match.groups()
+            monitors.append(Monitor(int(index), name, int(x), int(y), int(width), int(height), bool(primary)))
+    return monitors
+
+
+def parse_query(text):
+    """Parse the connected outputs of xrandr --query into Monitors"""
+    monitors = []
+    for line in text.splitlines():
+        match = QUERY_RE.match(line)
+        if match:
+            name, primary, width, height, x, y = match.groups()
+            monitors.append(Monitor(len(monitors), name, int(x), int(y), int(width), int(height), bool(primary)))
+    return monitors
+
+
+def run_xrandr(*args):
+    """Return the output of xrandr, or '' when it is missing or fails"""
+    try:
+        result = subprocess.run(["xrandr", *args], capture_output=True, text=True, timeout=XRANDR_TIMEOUT)
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    return result.stdout if result.returncode == 0 else ""
+
+
+def query_xrandr(run=run_xrandr):
+    """Detect monitors with xrandr; run(*args) returns xrandr's output and can be replaced in tests"""
+    monitors = parse_listmonitors(run("--listmonitors"))
+    return monitors or parse_query(run("--query"))
+
+
+def query_windows():
+    """Detect monitors with EnumDisplayMonitors, in the order wfreerdp numbers them"""
+    import ctypes
+    from ctypes import wintypes
+
+    class MONITORINFO(ctypes.Structure):
+        _fields_ = [("cbSize", wintypes.DWORD), ("rcMonitor", wintypes.RECT), ("rcWork", wintypes.RECT),
+                    ("dwFlags", wintypes.DWORD), ("szDevice", wintypes.WCHAR * 32)]
+
+    monitors = []
+    user32 = ctypes.windll.user32
+
+    def callback(handle, hdc, rect, data):
+        info = MONITORINFO()
+        info.cbSize = ctypes.sizeof(MONITORINFO)
+        if user32.GetMonitorInfoW(handle, ctypes.byref(info)):
+            area = info.rcMonitor
+            monitors.append(Monitor(len(monitors), info.szDevice, area.left, area.top, area.right - area.left,
+                                    area.bottom - area.top, bool(info.dwFlags & 1)))
+        return True
+
+    enum_proc = ctypes.WINFUNCTYPE(ctypes.c_int, wintypes.HMONITOR, wintypes.HDC, ctypes.POINTER(wintypes.RECT),
+                                   wintypes.LPARAM)
+    user32.EnumDisplayMonitors(None, None, enum_proc(callback), 0)
+    return monitors
+
+
+def query_monitors():
+    """Detect the local monitors, or return [] where that is not supported"""
+    try:
+        if sys.platform == "win32":
+            return query_windows()
+        if sys.platform.startswith("linux") or "bsd" in sys.platform:
+            return query_xrandr()
+    except Exception as e:
+        print(f"Error detecting monitors: {e}")
+    return []
+
+
+def layout_fingerprint(monitors):
+    """Return a string that changes whenever the monitor layout does"""
+    return ";".join(f"{m.index}:{m.width}x{m.height}{m.x:+d}{m.y:+d}{'*' if m.primary else ''}" for m in monitors)
+
+
+def primary_monitor(monitors):
+    return next((monitor for monitor in monitors if monitor.primary), monitors[0] if monitors else None)
+
+
+def monitor_numbers(spec):
+    """Parse a monitor list such as "0,2" into numbers, raising ValueError for anything else"""
+    try:
+        return [int(part) for part in str(spec).replace(" ", "").split(",") if part]
+    except ValueError:
+        raise ValueError("Monitors must be monitor numbers separated by commas, such as 0,1")
+
+
+def display_args(settings, monitors=None):
+    """Return the FreeRDP display arguments for a profile
+
+    monitors is the detected local layout (None or [] when unknown); the
+    fixed-size layout does not need it. Sessions are sized to the chosen
+    monitor's native resolution so FreeRDP neither scales them nor asks
+    the server for more pixels than can be shown. Monitor numbers that
+    are not connected are dropped when the layout is known.
+    """
+    layout = settings.get('display_layout', '')
+    numbers = monitor_numbers(settings.get('monitors', ''))
+    monitors = monitors or []
+    if monitors:
+        connected = {monitor.index: monitor for monitor in monitors}
+        numbers = [number for number in numbers if number in connected]
+        chosen = connected[numbers[0]] if numbers else primary_monitor(monitors)
+    else:
+        chosen = None
+
+    if layout == "monitor":
+        if numbers or chosen:
+            return ["/f", f"/monitors:{numbers[0] if numbers else chosen.index}"]
+        return ["/f"]
+
+    if layout == "span":
+        # Without /monitors: FreeRDP spans every monitor
+        if numbers:
+            return ["/multimon", "/monitors:" + ",".join(str(number) for number in numbers)]
+        return ["/multimon"]
+
+    if layout == "smart":
+        if chosen:
+            width, height = chosen.width, chosen.height
+        else:
+            width, height = str(settings.get('width', '')).strip(), str(settings.get('height', '')).strip()
+        return ([f"/size:{width}x{height}"] if width and height else []) + ["/smart-sizing"]
+
+    if settings.get('fullscreen', False):
+        return ["/f"]
+    width = str(settings.get('width', '')).strip()
+    height = str(settings.get('height', '')).strip()
+    return [f"/size:{width}x{height}"] if width and height else []
+
+
+class DisplayLayout:
+    """Monitor layout detected on demand and reused for DISPLAY_CACHE_SECONDS
+
+    query() returns a list of Monitors and can be replaced in tests.
+    """
+
+    def __init__(self, query=query_monitors, ttl=DISPLAY_CACHE_SECONDS):
+        self.query = query
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._monitors = None
+        self._detected = 0.0
+
+    def monitors(self):
+        """Return the cached layout, detecting it again once it is older than the TTL"""
+        with self._lock:
+            if self._monitors is None or time.monotonic() - self._detected > self.ttl:
+                self._monitors = self.query()
+                self._detected = time.monotonic()
+            return self._monitors
+
+    def refresh(self):
+        """Forget the cached layout and detect it now"""
+        with self._lock:
+            self._monitors = None
+        return self.monitors()
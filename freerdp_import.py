@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP Profile Import/Export
+Streaming readers and writers for Microsoft .rdp files, CSV host lists and
+Remmina profiles, mapped onto the wrapper's settings keys
+"""
+
+import configparser
+import csv
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from itertools import chain
+from pathlib import Path
+
+from freerdp_codecs import CODECS
+from freerdp_core import DEFAULT_SETTINGS
+from freerdp_display import DISPLAY_LAYOUTS
+from freerdp_probe import NETWORK_TUNINGS
+
+# Profiles written per transaction while importing
+IMPORT_BATCH = 500
+
+# Records between progress reports
+PROGRESS_EVERY = 250
+
+# File suffixes read when a directory is imported
+IMPORT_SUFFIXES = (".rdp", ".csv", ".remmina")
+
+# Settings never exported or imported (passwords live in the vault, whose entry IDs mean nothing elsewhere)
+EXPORT_EXCLUDED = ('password', 'password_id')
+
+BOOLEAN_KEYS = {key for key, value in DEFAULT_SETTINGS.items() if isinstance(value, bool)}
+TRUE_WORDS = ("1", "true", "yes", "y", "on")
+
+# Settings keys that only take one of a fixed set of values
+ENUMERATED_KEYS = {
+    'codec': tuple(value for value, label in CODECS),
+    'display_layout': tuple(value for value, label in DISPLAY_LAYOUTS),
+    'network_tuning': NETWORK_TUNINGS,
+}
+
+# CSV headers accepted for each settings key, besides the key itself
+CSV_ALIASES = {
+    'name': ('connection', 'connection name', 'profile', 'label'),
+    'server': ('host', 'hostname', 'address', 'full address', 'computer', 'ip'),
+    'username': ('user', 'login'),
+    'gateway': ('gateway host', 'gatewayhostname', 'rd gateway'),
+    'color_depth': ('bpp', 'colour depth', 'color depth'),
+}
+
+# .rdp integer settings copied straight to a settings key
+RDP_INTEGER_KEYS = {
+    'server port': 'port',
+    'desktopwidth': 'width',
+    'desktopheight': 'height',
+    'session bpp': 'color_depth',
+}
+
+# .rdp 0/1 settings mapped to a boolean key; True inverts the value ("disable themes" -> themes)
+RDP_BOOLEAN_KEYS = {
+    'redirectclipboard': ('clipboard', False),
+    'redirectprinters': ('printers', False),
+    'compression': ('compression', False),
+    'allow font smoothing': ('fonts', False),
+    'allow desktop composition': ('aero', False),
+    'disable themes': ('themes', True),
+    'disable wallpaper': ('wallpaper', True),
+    'use multimon': ('multimon', False),
+    'administrative session': ('admin_session', False),
+}
+
+# .rdp "connection type" values and the network tuning they select
+RDP_CONNECTION_TYPES = {
+    '1': 'modem',
+    '2': 'broadband-low',
+    '3': 'satellite',
+    '4': 'broadband-high',
+    '5': 'wan',
+    '6': 'lan',
+    '7': 'auto',
+}
+
+RDP_LINE_RE = re.compile(r"^([^:]+):([isb]):(.*)$")
+
+
+class ImportStats:
+    """Running totals of an import, passed to the progress callback"""
+
+    def __init__(self):
+        self.files = 0
+        self.read = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.errors = []
+
+    def describe(self):
+        return (f"{self.imported} imported, {self.duplicates} duplicates skipped, {len(self.errors)} errors "
+                f"({self.read} records in {self.files} files)")
+
+
+def split_server(address, settings):
+    """Store "host[:port]" in settings as server and port"""
+    address = address.strip()
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and (":" not in host or host.endswith("]")):
+        settings['server'] = host.strip("[]")
+        settings['port'] = port
+    else:
+        settings['server'] = address
+
+
+def split_user(user, settings):
+    """Store "DOMAIN\\user" or plain "user" in settings as username and domain"""
+    domain, sep, username = user.strip().rpartition("\\")
+    settings['username'] = username
+    if sep:
+        settings['domain'] = domain
+
+
+def coerce(key, value):
+    """Convert a text value to the type the settings key uses"""
+    if key in BOOLEAN_KEYS:
+        return str(value).strip().lower() in TRUE_WORDS
+    if key in ENUMERATED_KEYS:
+        value = str(value).strip().lower()
+        if value not in ENUMERATED_KEYS[key]:
+            raise ValueError(f"{key} must be one of {', '.join(filter(None, ENUMERATED_KEYS[key]))}, not '{value}'")
+        return value
+    return str(value).strip()
+
+
+def open_text(path):
+    """Open a text file that may be UTF-16 (as mstsc writes .rdp files) or UTF-8"""
+    with open(path, 'rb') as f:
+        bom = f.read(2)
+    encoding = 'utf-16' if bom in (b'\xff\xfe', b'\xfe\xff') else 'utf-8-sig'
+    return open(path, 'r', encoding=encoding, errors='replace', newline='')
+
+
+def read_rdp(path):
+    """Yield the (name, settings) of one Microsoft .rdp file"""
+    settings = {}
+    gateway_used = True
+    with open_text(path) as f:
+        for line in f:
+            match = RDP_LINE_RE.match(line.strip())
+            if not match:
+                continue
+            key, value = match.group(1).strip().lower(), match.group(3).strip()
+            if key == 'full address':
+                split_server(value, settings)
+            elif key == 'username':
+                split_user(value, settings)
+            elif key == 'domain' and value:
+                settings['domain'] = value
+            elif key == 'gatewayhostname':
+                settings['gateway'] = value
+            elif key == 'gatewayusagemethod':
+                # 0 and 4 mean "do not use a gateway"
+                gateway_used = value not in ("0", "4")
+            elif key == 'screen mode id':
+                settings['fullscreen'] = value == "2"
+            elif key == 'audiocapturemode':
+                settings['microphone'] = value == "1"
+            elif key == 'authentication level':
+                # Level 0 connects even when the server cannot be authenticated
+                settings['cert_ignore'] = value == "0"
+            elif key == 'connection type' and value in RDP_CONNECTION_TYPES:
+                settings['network_tuning'] = RDP_CONNECTION_TYPES[value]
+            elif key in RDP_INTEGER_KEYS and value:
+                settings[RDP_INTEGER_KEYS[key]] = value
+            elif key in RDP_BOOLEAN_KEYS:
+                target, inverted = RDP_BOOLEAN_KEYS[key]
+                settings[target] = (value == "1") != inverted
+    if not gateway_used:
+        settings.pop('gateway', None)
+    if settings.get('server'):
+        yield Path(path).stem, settings
+
+
+def read_remmina(path):
+    """Yield the (name, settings) of one Remmina profile, if it is an RDP profile"""
+    parser = configparser.ConfigParser(interpolation=None, strict=False)
+    with open_text(path) as f:
+        parser.read_file(f)
+    if not parser.has_section('remmina'):
+        return
+    profile = parser['remmina']
+    if profile.get('protocol', 'RDP').upper() != 'RDP' or not profile.get('server'):
+        return
+
+    settings = {}
+    split_server(profile['server'], settings)
+    if profile.get('username'):
+        split_user(profile['username'], settings)
+    if profile.get('domain'):
+        settings['domain'] = profile['domain']
+    if profile.get('gateway_server'):
+        settings['gateway'] = profile['gateway_server']
+        settings['gateway_user'] = profile.get('gateway_username', '')
+    for source, target in (('resolution_width', 'width'), ('resolution_height', 'height'),
+                           ('colordepth', 'color_depth'), ('sharefolder', 'drive_redirect')):
+        if profile.get(source, '').strip() not in ('', '0'):
+            settings[target] = profile[source].strip()
+    if profile.get('security') in ('rdp', 'tls', 'nla', 'ext'):
+        settings['security'] = profile['security']
+    settings['clipboard'] = profile.get('disableclipboard', '0') != '1'
+    settings['printers'] = profile.get('shareprinter', '0') == '1'
+    settings['microphone'] = bool(profile.get('microphone', '').strip())
+    settings['cert_ignore'] = profile.get('cert_ignore', '0') == '1'
+    settings['multimon'] = profile.get('multimon', '0') == '1'
+    yield profile.get('name') or Path(path).stem, settings
+
+
+def csv_columns(header):
+    """Map CSV header cells to settings keys (or 'name'), ignoring unknown columns"""
+    # Passwords are never imported in plain text; they belong in the vault
+    lookup = {key: key for key in DEFAULT_SETTINGS if key not in EXPORT_EXCLUDED}
+    lookup['name'] = 'name'
+    for key, aliases in CSV_ALIASES.items():
+        lookup.update((alias, key) for alias in aliases)
+    return [lookup.get(cell.strip().lower().replace('_', ' '), lookup.get(cell.strip().lower()))
+            for cell in header]
+
+
+def read_csv(path, on_error=None):
+    """Yield (name, settings) for every row of a CSV host list, one row at a time
+
+    A file without a recognisable header is read as bare host names in
+    the first column. A value that is not valid for its setting is
+    skipped and reported as on_error("line N: ..."), keeping the rest of
+    the row; without on_error it raises ValueError.
+    """
+    with open_text(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = csv_columns(header)
+        if 'server' not in columns:
+            columns = ['server']
+            reader = chain([header], reader)
+        for row in reader:
+            settings = {}
+            name = ''
+            for key, value in zip(columns, row):
+                if not key or not value.strip():
+                    continue
+                if key == 'name':
+                    name = value.strip()
+                elif key == 'server':
+                    split_server(value, settings)
+                elif key == 'username':
+                    split_user(value, settings)
+                else:
+                    try:
+                        settings[key] = coerce(key, value)
+                    except ValueError as e:
+                        if on_error is None:
+                            raise ValueError(f"line {reader.line_num}: {e}")
+                        on_error(f"line {reader.line_num}: {e}")
+            if settings.get('server'):
+                yield name or settings['server'], settings
+
+
+READERS = {".rdp": read_rdp, ".csv": read_csv, ".remmina": read_remmina}
+
+
+def iter_files(paths):
+    """Yield every importable file under paths (files are yielded as given)"""
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            for folder, dirs, files in os.walk(path):
+                dirs.sort()
+                for file_name in sorted(files):
+                    if file_name.lower().endswith(IMPORT_SUFFIXES):
+                        yield Path(folder) / file_name
+        else:
+            yield path
+
+
+def connection_key(settings):
+    """Return a short digest identifying where a profile connects to, for deduplication"""
+    parts = [str(settings.get(key, DEFAULT_SETTINGS[key])).strip().lower()
+             for key in ('server', 'port', 'username', 'domain', 'gateway')]
+    return hashlib.blake2b("\0".join(parts).encode("utf-8"), digest_size=12).digest()
+
+
+class Importer:
+    """Stream profiles from files into a ConnectionStore
+
+    Files are parsed one record at a time and written in transactions of
+    ``batch_size``, so memory stays flat however large the inventory is;
+    only a 12-byte digest per connection is kept for deduplication. A
+    record is a duplicate when a saved or already imported profile
+    connects to the same server, port, user, domain and gateway. Name
+    clashes with a different connection get a " (2)" style suffix.
+
+    ``write(func, *args)`` runs store writes; the GUI passes a function that
+    runs them on the Tk thread, since the store belongs to that thread.
+    """
+
+    def __init__(self, store, template=None, on_progress=None, write=None, batch_size=IMPORT_BATCH):
+        self.store = store
+        self.template = template
+        self.on_progress = on_progress
+        self.write = write or (lambda func, *args: func(*args))
+        self.batch_size = batch_size
+        self.stats = ImportStats()
+        self._cancelled = threading.Event()
+        self._keys = None
+        self._names = set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def run(self, paths):
+        """Import every file under paths, returning the ImportStats"""
+        # Decoding every saved profile takes a while on a large store; it happens here, on the caller's thread
+        self._keys = {connection_key(settings) for name, settings in self.store.iter_settings()}
+        batch = []
+        for path in iter_files(paths):
+            if self._cancelled.is_set():
+                break
+            reader = READERS.get(path.suffix.lower())
+            if not reader:
+                self.stats.errors.append(f"{path}: unsupported file type")
+                continue
+            self.stats.files += 1
+            if reader is read_csv:
+                # One bad cell must not cost the rest of a large inventory
+                def skipped(message, path=path):
+                    self.stats.errors.append(f"{path}: {message}")
+                records = read_csv(path, on_error=skipped)
+            else:
+                records = reader(path)
+            try:
+                for name, settings in records:
+                    self.stats.read += 1
+                    key = connection_key(settings)
+                    if key in self._keys:
+                        self.stats.duplicates += 1
+                    else:
+                        self._keys.add(key)
+                        batch.append((name, settings))
+                        if len(batch) >= self.batch_size:
+                            self._flush(batch)
+                    if self.stats.read % PROGRESS_EVERY == 0:
+                        self._progress()
+                    if self._cancelled.is_set():
+                        break
+            except (OSError, ValueError, csv.Error, configparser.Error) as e:
+                self.stats.errors.append(f"{path}: {e}")
+        self._flush(batch)
+        self._progress()
+        return self.stats
+
+    def _flush(self, batch):
+        if batch:
+            try:
+                self.write(self._save, list(batch))
+            except (sqlite3.Error, ValueError) as e:
+                # The batch's transaction rolled back; later batches may still be written
+                self.stats.errors.append(f"{len(batch)} connections not saved: {e}")
+            batch.clear()
+
+    def _save(self, batch):
+        """Write one batch in a single transaction (runs wherever write() puts it)"""
+        items = [(self._unique_name(name), settings) for name, settings in batch]
+        self.store.put_many(items, template=self.template)
+        self.stats.imported += len(items)
+
+    def _unique_name(self, name):
+        candidate = name
+        number = 2
+        while candidate in self.store or candidate in self._names:
+            candidate = f"{name} ({number})"
+            number += 1
+        self._names.add(candidate)
+        return candidate
+
+    def _progress(self):
+        if self.on_progress:
+            self.on_progress(self.stats)
+
+
+def export_csv(store, path):
+    """Write every profile to a CSV file with one column per setting, returning the count"""
+    columns = ['name'] + [key for key in DEFAULT_SETTINGS if key not in EXPORT_EXCLUDED]
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for name, settings in store.iter_settings():
+            writer.writerow([name] + [settings.get(key, '') for key in columns[1:]])
+            count += 1
+    return count
+
+
+def rdp_lines(settings):
+    """Return the .rdp file lines for a profile's settings"""
+    port = str(settings.get('port', '')).strip()
+    address = f"{settings['server']}:{port}" if port and port != "3389" else settings['server']
+    user = settings.get('username', '')
+    if user and settings.get('domain'):
+        user = f"{settings['domain']}\\{user}"
+    lines = [f"full address:s:{address}", f"username:s:{user}",
+             f"screen mode id:i:{2 if settings.get('fullscreen') else 1}",
+             f"audiocapturemode:i:{1 if settings.get('microphone') else 0}",
+             f"authentication level:i:{0 if settings.get('cert_ignore') else 2}"]
+    for rdp_key, key in RDP_INTEGER_KEYS.items():
+        if key != 'port' and str(settings.get(key, '')).strip():
+            lines.append(f"{rdp_key}:i:{settings[key]}")
+    for rdp_key, (key, inverted) in RDP_BOOLEAN_KEYS.items():
+        lines.append(f"{rdp_key}:i:{1 if bool(settings.get(key)) != inverted else 0}")
+    connection_types = {tuning: value for value, tuning in RDP_CONNECTION_TYPES.items()}
+    if settings.get('network_tuning') in connection_types:
+        lines.append(f"connection type:i:{connection_types[settings['network_tuning']]}")
+    if settings.get('gateway'):
+        lines += [f"gatewayhostname:s:{settings['gateway']}", "gatewayusagemethod:i:1"]
+    return lines
+
+
+def safe_file_name(name):
+    return re.sub(r'[<>:"/\\|?*\x00-\x1f]', "_", name).strip(" .") or "profile"
+
+
+def export_rdp(store, folder):
+    """Write every profile as a .rdp file in folder, returning the count"""
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    count = 0
+    used = set()
+    for name, settings in store.iter_settings():
+        if not settings.get('server'):
+            continue
+        file_name = safe_file_name(name)
+        stem, number = file_name, 2
+        while file_name.lower() in used:
+            file_name = f"{stem} ({number})"
+            number += 1
+        used.add(file_name.lower())
+        # mstsc writes UTF-16 with a BOM; it reads UTF-8 too, but not every client does
+        with open(folder / f"{file_name}.rdp", 'w', encoding='utf-16', newline='\r\n') as f:
+            f.write("\n".join(rdp_lines(settings)) + "\n")
+        count += 1
+    return count
@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP Launch Engine
+Starts FreeRDP processes once and watches them from worker threads
+"""
+
+import itertools
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from freerdp_core import stdin_credentials
+from freerdp_logs import LogBuffer, prune_log_dir
+
+# Seconds a process has to stay alive before the connection counts as launched
+SETTLE_TIME = 10
+
+# Number of output lines per stream included in error reports
+OUTPUT_LINES = 200
+
+# Seconds to wait for a terminated process before killing it
+KILL_TIMEOUT = 3
+
+# Default batch connect limits: concurrent handshakes and seconds between starts
+BATCH_WORKERS = 4
+BATCH_STAGGER = 1.0
+
+# Automatic reconnect: backoff before retry n is RECONNECT_BASE_DELAY * 2**(n-1), capped and jittered
+RECONNECT_RETRIES = 5
+RECONNECT_BASE_DELAY = 2.0
+RECONNECT_MAX_DELAY = 120.0
+
+# A session that stayed up this many seconds starts a fresh retry budget when it drops
+RECONNECT_STABLE_TIME = 120
+
+# Reconnects across all sessions: sustained rate per minute and burst size
+RECONNECT_PER_MINUTE = 10
+RECONNECT_BURST = 3
+
+# xfreerdp exit codes after which reconnecting cannot help: success, logoff, idle timeout,
+# replaced by another connection, denied, privileges, credentials, closed by the user,
+# bad arguments, authentication and logon failures, locked account, cancelled, expired password
+FINAL_EXIT_CODES = frozenset({0, 2, 3, 5, 7, 9, 10, 11, 128, 132, 134, 135, 144, 145, 148})
+
+# Recognised log errors (see freerdp_logs) that a retry cannot fix
+FINAL_LOG_EVENTS = frozenset({"authentication", "certificate"})
+
+if hasattr(os, "sysconf"):
+    CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+else:
+    CLOCK_TICKS = PAGE_SIZE = None
+
+
+def read_proc_stats(pid):
+    """Return (rss_bytes, cpu_seconds) for pid from /proc, or None if unavailable"""
+    if CLOCK_TICKS is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # The command name may contain spaces, so split after its closing parenthesis
+    fields = data[data.rfind(b")") + 2:].split()
+    try:
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        rss_bytes = int(fields[21]) * PAGE_SIZE
+    except (IndexError, ValueError):
+        return None
+    return rss_bytes, cpu_seconds
+
+
+class Session:
+    """A single launched FreeRDP process"""
+
+    def __init__(self, name, cmd, process, timeline=None, log_path=None):
+        self.id = None
+        self.name = name
+        self.cmd = cmd
+        self.process = process
+        self.pid = process.pid
+        self.start_time = time.time()
+        # Wall-clock time of each launch event (see freerdp_telemetry.EVENTS)
+        self.timeline = dict(timeline or {})
+        self.timeline["spawned"] = self.start_time
+        self.end_time = None
+        self.returncode = None
+        self.launched = False
+        self.stopping = False
+        self.settled = threading.Event()
+        self.log = LogBuffer(spill_path=log_path)
+        self.readers = []
+        # ID of this launch's telemetry record, once the launch outcome has been logged
+        self.record_id = None
+        self.rss = None
+        self.cpu_percent = None
+        self._last_sample = None
+
+    def is_running(self):
+        """Return True while the FreeRDP process is alive"""
+        return self.returncode is None
+
+    def error_message(self):
+        """Build an error message from the captured output, led by the last recognised error"""
+        error_msg = ("\n".join(self.log.lines("stderr")[-OUTPUT_LINES:]).strip()
+                     or "\n".join(self.log.lines("stdout")[-OUTPUT_LINES:]).strip())
+        if not error_msg:
+            error_msg = f"FreeRDP exited with code {self.returncode}"
+        event = self.log.last_event()
+        if event:
+            error_msg = f"{event.summary()}\n\n{error_msg}"
+        return error_msg
+
+    def uptime(self):
+        """Seconds since launch (frozen once the process has exited)"""
+        return (self.end_time or time.time()) - self.start_time
+
+    def sample(self):
+        """Refresh rss and cpu_percent from /proc (no-op once exited)"""
+        if not self.is_running():
+            return
+        stats = read_proc_stats(self.pid)
+        if stats is None:
+            return
+        rss, cpu_seconds = stats
+        now = time.monotonic()
+        if self._last_sample:
+            last_time, last_cpu = self._last_sample
+            if now > last_time:
+                self.cpu_percent = 100.0 * (cpu_seconds - last_cpu) / (now - last_time)
+        self.rss = rss
+        self._last_sample = (now, cpu_seconds)
+
+    def terminate(self):
+        """Ask FreeRDP to exit, killing it if it does not within KILL_TIMEOUT"""
+        if not self.is_running():
+            return
+        self.stopping = True
+
+        def stop():
+            try:
+                self.process.terminate()
+                self.process.wait(timeout=KILL_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            except OSError:
+                pass
+
+        threading.Thread(target=stop, daemon=True).start()
+
+
+class SessionRegistry:
+    """Thread-safe registry of every FreeRDP process started by the wrapper"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, session):
+        with self._lock:
+            session.id = next(self._ids)
+            self._sessions[session.id] = session
+        return session.id
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def remove(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def sessions(self):
+        """Return a snapshot list of sessions in launch order"""
+        with self._lock:
+            return list(self._sessions.values())
+
+    def running(self):
+        return [session for session in self.sessions() if session.is_running()]
+
+    def sample_all(self):
+        """Refresh resource usage for all running sessions"""
+        for session in self.running():
+            session.sample()
+
+    def clear_ended(self):
+        """Forget sessions whose process has exited, returning their ids"""
+        with self._lock:
+            ended = [sid for sid, session in self._sessions.items() if not session.is_running()]
+            for sid in ended:
+                del self._sessions[sid]
+        return ended
+
+
+class LaunchEngine:
+    """Launch FreeRDP processes and report their progress through callbacks
+
+    Callbacks are invoked through ``dispatch(func, *args)`` so a GUI can
+    marshal them onto its own thread.
+    """
+
+    def __init__(self, dispatch=None, settle_time=SETTLE_TIME, registry=None, log_dir=None):
+        self.dispatch = dispatch or (lambda func, *args: func(*args))
+        self.settle_time = settle_time
+        self.registry = registry
+        # When set, every session's output is also kept in rotating files in this directory
+        self.log_dir = log_dir
+
+    def launch(self, cmd, name=None, on_launched=None, on_failed=None, on_exit=None, timeline=None, password=None):
+        """Start cmd once and watch it in the background, returning its Session
+
+        timeline holds the times of events before the launch, such as when
+        the connection was requested; the session adds its own events. A
+        password is written to FreeRDP's stdin (for /from-stdin, answering
+        its prompts in order) and the pipe closed, so it never appears on
+        the command line.
+        """
+        creationflags = subprocess.CREATE_NEW_CONSOLE if sys.platform == "win32" else 0
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE if password is not None else None,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                   errors="replace", creationflags=creationflags)
+        if password is not None:
+            try:
+                process.stdin.write(stdin_credentials(cmd, password))
+                process.stdin.close()
+            except OSError:
+                # FreeRDP exited before reading it; the watcher reports why
+                pass
+        name = name or cmd[0]
+        session = Session(name, cmd, process, timeline, self._log_path(name, process.pid))
+        if self.registry is not None:
+            self.registry.add(session)
+
+        for stream, stream_name in ((process.stdout, "stdout"), (process.stderr, "stderr")):
+            reader = threading.Thread(target=self._read_stream, args=(session, stream, stream_name), daemon=True)
+            reader.start()
+            session.readers.append(reader)
+
+        watcher = threading.Thread(target=self._watch, args=(session, on_launched, on_failed, on_exit),
+                                   daemon=True)
+        watcher.start()
+        return session
+
+    def _log_path(self, name, pid):
+        if not self.log_dir:
+            return None
+        try:
+            os.makedirs(self.log_dir, exist_ok=True)
+        except OSError as e:
+            print(f"Error creating session log directory: {e}")
+            return None
+        prune_log_dir(self.log_dir)
+        safe_name = re.sub(r"[^\w.-]+", "_", name)
+        return os.path.join(self.log_dir, f"{safe_name}-{time.strftime('%Y%m%d-%H%M%S')}-{pid}.log")
+
+    def _read_stream(self, session, stream, stream_name):
+        """Stream a pipe into the session log for its whole life so FreeRDP never blocks on output"""
+        try:
+            for line in stream:
+                session.timeline.setdefault("first_output", time.time())
+                session.log.append(stream_name, line.rstrip("\r\n"))
+        except (OSError, ValueError):
+            pass
+        finally:
+            stream.close()
+
+    def _watch(self, session, on_launched, on_failed, on_exit):
+        """Wait for the settle time, then for the process to exit"""
+        try:
+            session.process.wait(timeout=self.settle_time)
+        except subprocess.TimeoutExpired:
+            session.launched = True
+            session.timeline["launched"] = time.time()
+            session.settled.set()
+            self._notify(on_launched, session)
+            session.process.wait()
+
+        for reader in session.readers:
+            reader.join(timeout=1)
+        session.log.close()
+        session.returncode = session.process.returncode
+        session.end_time = time.time()
+        session.timeline["ended"] = session.end_time
+        session.settled.set()
+
+        if not session.launched and session.returncode != 0:
+            session.timeline["failed"] = session.end_time
+            self._notify(on_failed, session)
+        self._notify(on_exit, session)
+
+    def _notify(self, callback, session):
+        if callback:
+            self.dispatch(callback, session)
+
+
+class BatchLauncher:
+    """Launch many sessions through a bounded pool of worker threads
+
+    Each worker holds its slot until its session has settled (launched or
+    failed), so at most ``max_workers`` handshakes are in flight, and starts
+    are spaced at least ``stagger`` seconds apart across the whole batch.
+    Progress is reported as ``on_progress(index, state, detail)`` through the
+    engine's dispatch, with state one of queued, starting, launched or failed.
+    """
+
+    def __init__(self, engine, max_workers=BATCH_WORKERS, stagger=BATCH_STAGGER):
+        self.engine = engine
+        self.max_workers = max(1, int(max_workers))
+        self.stagger = max(0.0, float(stagger))
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def run(self, jobs, on_progress=None, on_launched=None, on_exit=None):
+        """Queue jobs, a list of (name, cmd, password) triples, without blocking the caller
+
+        password is None for profiles that need none; passwords are
+        decrypted by the caller before the batch starts.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="freerdp-batch")
+        for index, (name, cmd, password) in enumerate(jobs):
+            self._progress(on_progress, index, "queued", "")
+            executor.submit(self._launch_one, index, name, cmd, password, on_progress, on_launched, on_exit)
+        executor.shutdown(wait=False)
+
+    def cancel(self):
+        """Stop starting queued jobs; sessions already launched keep running"""
+        self._cancelled.set()
+
+    def _wait_for_slot(self):
+        """Sleep until this worker's staggered start time, returning False if cancelled"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.stagger
+        return not self._cancelled.wait(start - now)
+
+    def _launch_one(self, index, name, cmd, password, on_progress, on_launched, on_exit):
+        if not self._wait_for_slot():
+            self._progress(on_progress, index, "failed", "Cancelled")
+            return
+        # Stamped once the slot is ours, so startup latency leaves out the stagger and the queue wait
+        requested = time.time()
+
+        self._progress(on_progress, index, "starting", "")
+        try:
+            session = self.engine.launch(cmd, name=name, on_launched=on_launched, on_exit=on_exit,
+                                         timeline={"requested": requested}, password=password)
+        except FileNotFoundError:
+            self._progress(on_progress, index, "failed", f"FreeRDP executable not found: {cmd[0]}")
+            return
+        except Exception as e:
+            self._progress(on_progress, index, "failed", str(e))
+            return
+
+        session.settled.wait()
+        if session.launched:
+            self._progress(on_progress, index, "launched", f"PID {session.pid}")
+        elif session.returncode == 0:
+            self._progress(on_progress, index, "failed", "Ended before connecting")
+        else:
+            self._progress(on_progress, index, "failed", session.error_message())
+
+    def _progress(self, on_progress, index, state, detail):
+        if on_progress:
+            self.engine.dispatch(on_progress, index, state, detail)
+
+
+class RateLimiter:
+    """Token bucket shared by every reconnect: ``burst`` at once, then ``per_minute``"""
+
+    def __init__(self, per_minute=RECONNECT_PER_MINUTE, burst=RECONNECT_BURST):
+        self.interval = 60.0 / max(per_minute, 1e-6)
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Take a token, returning 0, or return the seconds until one is available"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) / self.interval)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) * self.interval
+
+
+class ReconnectState:
+    """Retry progress for one supervised profile"""
+
+    def __init__(self, name, cmd, max_retries):
+        self.name = name
+        self.cmd = cmd
+        self.max_retries = max_retries
+        self.attempt = 0
+        self.status = "waiting"
+        self.next_time = None
+        self.session = None
+        self.reason = ""
+        self.token = 0
+
+    def describe(self):
+        """Short text for the Sessions table, such as 'Retry 2/5 in 8s'"""
+        if self.status in ("waiting", "rate limited"):
+            seconds = max(0, int(self.next_time - time.monotonic() + 0.999))
+            prefix = "Retry" if self.status == "waiting" else "Rate limited, retry"
+            return f"{prefix} {self.attempt}/{self.max_retries} in {seconds}s"
+        if self.status == "reconnecting":
+            return f"Reconnecting {self.attempt}/{self.max_retries}"
+        if self.status == "gave up":
+            return f"Gave up after {self.max_retries}"
+        if self.status == "failed":
+            return f"Reconnect failed: {self.reason}"
+        return self.status.capitalize()
+
+
+class ReconnectSupervisor:
+    """Relaunch opted-in profiles whose FreeRDP process died abnormally
+
+    A profile is opted in with ``set_policy(name, max_retries)``. When one of
+    its sessions that had connected exits with a code outside
+    FINAL_EXIT_CODES (and was not stopped on purpose), the same command is
+    relaunched after an exponential, jittered backoff, up to max_retries
+    times. Every relaunch also needs a token from a RateLimiter shared by all
+    profiles, so many sessions dropping at once do not reconnect in a storm.
+
+    ``launch(cmd, name)`` starts the new session and is called through
+    ``dispatch(func, *args)``, like the launch engine's callbacks.
+    """
+
+    def __init__(self, launch, dispatch=None, base_delay=RECONNECT_BASE_DELAY, max_delay=RECONNECT_MAX_DELAY,
+                 stable_time=RECONNECT_STABLE_TIME, limiter=None):
+        self.launch = launch
+        self.dispatch = dispatch or (lambda func, *args: func(*args))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stable_time = stable_time
+        self.limiter = limiter or RateLimiter()
+        self._policies = {}
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def set_policy(self, name, max_retries=RECONNECT_RETRIES):
+        """Opt a profile in to automatic reconnects"""
+        with self._lock:
+            self._policies[name] = max(0, int(max_retries))
+
+    def clear_policy(self, name):
+        """Opt a profile out, cancelling any pending retry"""
+        with self._lock:
+            self._policies.pop(name, None)
+        self.cancel(name)
+
+    def state(self, name):
+        with self._lock:
+            return self._states.get(name)
+
+    def is_retrying(self, name):
+        """Return True while a retry for name is pending or being launched"""
+        state = self.state(name)
+        return state is not None and state.status in ("waiting", "rate limited", "reconnecting")
+
+    def cancel(self, name):
+        """Cancel a pending retry for name, returning True if there was one"""
+        with self._lock:
+            state = self._states.get(name)
+            if state is None or state.status not in ("waiting", "rate limited"):
+                return False
+            state.token += 1
+            state.status = "cancelled"
+            return True
+
+    def session_launched(self, session):
+        """Note that a (re)launched session got through its settle time"""
+        with self._lock:
+            state = self._states.get(session.name)
+            if state is not None and state.session is session:
+                state.status = "connected"
+
+    def session_exited(self, session):
+        """Decide whether to relaunch a session that exited, returning its ReconnectState or None"""
+        with self._lock:
+            max_retries = self._policies.get(session.name)
+            state = self._states.get(session.name)
+            if max_retries is None or not self._abnormal(session):
+                if state is not None and state.session is session:
+                    state.status = "stopped"
+                return None
+
+            # Retries of a relaunched session continue its streak unless it stayed up long enough
+            continuing = state is not None and state.session is session and session.uptime() < self.stable_time
+            if not continuing:
+                if state is not None and state.status in ("waiting", "rate limited", "reconnecting"):
+                    return None
+                if not session.launched:
+                    # A connect that never came up is a configuration problem, not a dropped session
+                    return None
+                state = self._states[session.name] = ReconnectState(session.name, session.cmd, max_retries)
+
+            state.session = session
+            state.reason = f"exit code {session.returncode}"
+            if state.attempt >= state.max_retries:
+                state.status = "gave up"
+                return state
+            state.attempt += 1
+            self._schedule(state, self.backoff(state.attempt), "waiting")
+            return state
+
+    def backoff(self, attempt):
+        """Delay before retry number attempt: exponential, capped, with equal jitter"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
+
+    def _abnormal(self, session):
+        if session.stopping or session.returncode in FINAL_EXIT_CODES:
+            return False
+        event = session.log.last_event()
+        return not (event and event.kind in FINAL_LOG_EVENTS)
+
+    def _schedule(self, state, delay, status):
+        """Arm a timer for state (callers hold the lock)"""
+        state.token += 1
+        state.status = status
+        state.next_time = time.monotonic() + delay
+        timer = threading.Timer(delay, self._fire, args=(state, state.token))
+        timer.daemon = True
+        timer.start()
+
+    def _fire(self, state, token):
+        with self._lock:
+            if state.token != token:
+                return
+            wait = self.limiter.take()
+            if wait > 0:
+                self._schedule(state, wait, "rate limited")
+                return
+            state.status = "reconnecting"
+        self.dispatch(self._relaunch, state, token)
+
+    def _relaunch(self, state, token):
+        if state.token != token:
+            return
+        try:
+            session = self.launch(state.cmd, state.name)
+        except Exception as e:
+            with self._lock:
+                state.status = "failed"
+                state.reason = str(e)
+            return
+        with self._lock:
+            state.session = session
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP Session Logs
+Memory-capped ring buffers for FreeRDP output, with optional rotating log files
+and classification of known FreeRDP error lines
+"""
+
+import os
+import re
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+# Bytes of output kept in memory per session (oldest lines are dropped first)
+LOG_BUFFER_BYTES = 256 * 1024
+
+# Rotating log files: size of each file and number of older files kept
+LOG_FILE_BYTES = 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+# Session log directory limits, enforced as each log is opened: age of the oldest file kept and total size
+LOG_DIR_MAX_AGE = 14 * 24 * 3600
+LOG_DIR_MAX_BYTES = 100 * 1024 * 1024
+
+# Classified events kept per session
+MAX_EVENTS = 100
+
+# Approximate per-line overhead of a buffered entry, counted against LOG_BUFFER_BYTES
+ENTRY_OVERHEAD = 64
+
+# FreeRDP WLog lines look like "[12:00:00:123] [1234:5678] [ERROR][com.freerdp.core] - message"
+LEVEL_RE = re.compile(r"\[(TRACE|DEBUG|INFO|WARN|ERROR|FATAL)\]")
+
+# Levels whose lines are matched against every pattern; other lines only against coded ones
+PROBLEM_LEVELS = (None, "WARN", "ERROR", "FATAL")
+
+# Known error lines: (kind, pattern, description, coded). Coded patterns capture an
+# ERRCONNECT_*/ERRINFO_* code and match at any level, since FreeRDP logs some at INFO.
+ERROR_PATTERNS = [
+    ("connect", re.compile(r"\b(ERRCONNECT_\w+)"), "Connection failed", True),
+    ("disconnect", re.compile(r"\b(ERRINFO_\w+)"), "Server ended the session", True),
+    ("certificate", re.compile(r"(?i)certificate|host key|fingerprint"), "Certificate problem", False),
+    ("authentication", re.compile(r"(?i)\bnla_|credssp|SEC_E_|STATUS_LOGON_FAILURE|STATUS_ACCOUNT_|"
+                                  r"STATUS_PASSWORD_|authentication fail"), "Authentication (NLA) failed", False),
+    ("network", re.compile(r"(?i)getaddrinfo|unable to resolve|connection refused|connection reset|"
+                           r"broken pipe|timed out"), "Network problem", False),
+]
+
+
+class LogEntry:
+    """One line of FreeRDP output"""
+
+    __slots__ = ("seq", "stream", "time", "text", "level", "event")
+
+    def __init__(self, seq, stream, text, level=None, event=None):
+        self.seq = seq
+        self.stream = stream
+        self.time = time.time()
+        self.text = text
+        self.level = level
+        self.event = event
+
+
+class LogEvent:
+    """A FreeRDP output line recognised as a known kind of error"""
+
+    __slots__ = ("kind", "code", "description", "seq", "time", "text")
+
+    def __init__(self, kind, code, description, seq, text):
+        self.kind = kind
+        self.code = code
+        self.description = description
+        self.seq = seq
+        self.time = time.time()
+        self.text = text
+
+    def summary(self):
+        return f"{self.description}: {self.code}" if self.code else self.description
+
+    def to_dict(self):
+        return {'kind': self.kind, 'code': self.code, 'description': self.description, 'time': self.time,
+                'text': self.text}
+
+
+def line_level(text):
+    """Return the WLog level of a FreeRDP output line, or None"""
+    match = LEVEL_RE.search(text)
+    return match.group(1) if match else None
+
+
+def classify(text, seq=0, level=None):
+    """Return a LogEvent if text is a known FreeRDP error line, else None"""
+    problem = level in PROBLEM_LEVELS
+    for kind, pattern, description, coded in ERROR_PATTERNS:
+        if coded or problem:
+            match = pattern.search(text)
+            if match:
+                return LogEvent(kind, match.group(1) if coded else None, description, seq, text)
+    return None
+
+
+def prune_log_dir(directory, max_age=LOG_DIR_MAX_AGE, max_bytes=LOG_DIR_MAX_BYTES):
+    """Delete session logs (and their rotated copies) older than max_age, then the oldest until under max_bytes"""
+    logs = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if ".log" in entry.name and entry.is_file():
+                    stat = entry.stat()
+                    logs.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError as e:
+        print(f"Error reading session log directory: {e}")
+        return
+    logs.sort(reverse=True)
+    cutoff = time.time() - max_age
+    total = 0
+    for mtime, size, path in logs:
+        total += size
+        if mtime >= cutoff and total <= max_bytes:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            # Still open by a running session on Windows
+            pass
+
+
+class RotatingLogFile:
+    """Append-only text file that rolls over to name.1, name.2, ... when it gets too big"""
+
+    def __init__(self, path, max_bytes=LOG_FILE_BYTES, backups=LOG_FILE_BACKUPS):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._size = self._file.tell()
+
+    def write(self, line):
+        data = line + "\n"
+        if self._size + len(data) > self.max_bytes and self._size:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+
+    def _rotate(self):
+        self._file.close()
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._size = 0
+
+    def close(self):
+        self._file.close()
+
+
+class LogBuffer:
+    """Thread-safe, memory-capped ring buffer of one session's output
+
+    Every line gets a sequence number, so a viewer can ask for just the
+    lines after the last one it showed (``since``) instead of re-reading the
+    whole buffer. Lines matching ERROR_PATTERNS are also kept as LogEvents
+    (the newest MAX_EVENTS), which outlive the eviction of their lines. With
+    a spill file every line is also written to a RotatingLogFile.
+    """
+
+    def __init__(self, max_bytes=LOG_BUFFER_BYTES, spill_path=None):
+        self.max_bytes = max_bytes
+        self.entries = deque()
+        self.events = deque(maxlen=MAX_EVENTS)
+        self.size = 0
+        self.last_seq = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._spill = None
+        if spill_path:
+            try:
+                self._spill = RotatingLogFile(spill_path)
+            except OSError as e:
+                print(f"Error opening session log file: {e}")
+        self.spill_path = spill_path if self._spill else None
+
+    def append(self, stream, text):
+        """Add one output line from stream ("stdout" or "stderr")"""
+        with self._lock:
+            self.last_seq += 1
+            level = line_level(text)
+            event = classify(text, self.last_seq, level)
+            entry = LogEntry(self.last_seq, stream, text, level, event)
+            self.entries.append(entry)
+            self.size += len(text) + ENTRY_OVERHEAD
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                old = self.entries.popleft()
+                self.size -= len(old.text) + ENTRY_OVERHEAD
+                self.dropped += 1
+            if event:
+                self.events.append(event)
+            if self._spill:
+                try:
+                    self._spill.write(f"{time.strftime('%H:%M:%S', time.localtime(entry.time))} {stream}: {text}")
+                except OSError as e:
+                    print(f"Error writing session log file: {e}")
+                    self._spill = None
+        return entry
+
+    def since(self, seq):
+        """Return the buffered entries after sequence number seq, oldest first
+
+        Costs O(new lines), not O(buffer size).
+        """
+        with self._lock:
+            count = min(self.last_seq - seq, len(self.entries))
+            if count <= 0:
+                return []
+            newest = list(islice(reversed(self.entries), count))
+        newest.reverse()
+        return newest
+
+    def tail(self, count):
+        """Return the last count entries"""
+        return self.since(self.last_seq - count)
+
+    def lines(self, stream=None):
+        """Return the buffered text, optionally only from one stream"""
+        with self._lock:
+            return [entry.text for entry in self.entries if stream is None or entry.stream == stream]
+
+    def events_since(self, seq):
+        """Return the kept events for lines after sequence number seq"""
+        with self._lock:
+            return [event for event in self.events if event.seq > seq]
+
+    def last_event(self):
+        with self._lock:
+            return self.events[-1] if self.events else None
+
+    def close(self):
+        with self._lock:
+            if self._spill:
+                self._spill.close()
+                self._spill = None
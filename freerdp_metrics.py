@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP Metrics
+Opt-in timing, counters and profiles of GUI actions, written as a Prometheus textfile
+"""
+
+import cProfile
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+# Set to "1" to record metrics; "profile" and/or "memory" (comma separated) also take snapshots
+METRICS_ENV = "FREERDP_GUI_METRICS"
+
+# Seconds between writes of the metrics file while metrics change
+METRICS_WRITE_SECONDS = 5.0
+
+# Upper bounds in seconds of the action duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Allocation sites listed in each memory snapshot
+MEMORY_TOP = 25
+
+PREFIX = "freerdp_gui"
+
+
+def parse_metrics_env(value):
+    """Return (enabled, profile, memory) for a FREERDP_GUI_METRICS value"""
+    words = {word.strip().lower() for word in (value or "").split(",") if word.strip()}
+    words.discard("0")
+    return bool(words), "profile" in words, "memory" in words
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class ActionStats:
+    """Duration histogram and outcome counts of one action"""
+
+    def __init__(self):
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.last = 0.0
+        self.peak_memory = None
+
+    def observe(self, seconds, error=False):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.errors += error
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+
+class Metrics:
+    """Wall time, error counts and counters of GUI actions, with optional profiles
+
+    Recording is off until ``enable``; while off, ``measure`` only checks a
+    flag. The metrics file is rewritten atomically by a background thread
+    at most every METRICS_WRITE_SECONDS, and by ``close``, so a node
+    exporter textfile collector can scrape it. With profiling on, the
+    outermost action of each call runs under cProfile and its stats are
+    saved as <action>.prof in profile_dir; with memory on, its peak
+    traced memory is recorded and the top allocation sites are saved as
+    <action>.memory.txt.
+    """
+
+    def __init__(self, path, profile_dir=None, interval=METRICS_WRITE_SECONDS):
+        self.path = Path(path)
+        self.profile_dir = Path(profile_dir) if profile_dir else self.path.with_suffix(".profiles")
+        self.interval = interval
+        self.enabled = False
+        self.profile = False
+        self.memory = False
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._actions = defaultdict(ActionStats)
+        self._counters = defaultdict(int)
+        self._gauges = {}
+        self._local = threading.local()
+        self._dirty = threading.Event()
+        self._closed = False
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, path, profile_dir=None, value=None):
+        """Create metrics enabled according to FREERDP_GUI_METRICS (or value)"""
+        metrics = cls(path, profile_dir)
+        enabled, profile, memory = parse_metrics_env(os.environ.get(METRICS_ENV) if value is None else value)
+        if enabled:
+            metrics.enable(profile, memory)
+        return metrics
+
+    def enable(self, profile=False, memory=False):
+        self.enabled = True
+        self.profile = profile
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if (profile or memory) and not self.profile_dir.exists():
+            self.profile_dir.mkdir(parents=True)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="freerdp-metrics", daemon=True)
+            self._thread.start()
+
+    def disable(self):
+        """Stop recording; what was recorded stays in the metrics file"""
+        self.enabled = False
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.memory = False
+
+    def gauge(self, name, read):
+        """Report read() as gauge freerdp_gui_<name> each time the file is written"""
+        self._gauges[name] = read
+
+    def count(self, name, value=1):
+        """Add value to counter freerdp_gui_<name>_total"""
+        if self.enabled:
+            with self._lock:
+                self._counters[name] += value
+            self._dirty.set()
+
+    def observe(self, action, seconds, error=False):
+        """Record one run of action that took seconds"""
+        if self.enabled:
+            with self._lock:
+                self._actions[action].observe(seconds, error)
+            self._dirty.set()
+
+    @contextmanager
+    def measure(self, action):
+        """Time the block as one run of action; an exception counts as an error and is re-raised"""
+        if not self.enabled:
+            yield
+            return
+        depth = getattr(self._local, "depth", 0)
+        # Profilers cannot nest, so only the outermost action is profiled
+        profiler = cProfile.Profile() if self.profile and depth == 0 else None
+        snapshot = self.memory and depth == 0 and tracemalloc.is_tracing()
+        if snapshot:
+            tracemalloc.reset_peak()
+        self._local.depth = depth + 1
+        error = False
+        start = time.perf_counter()
+        try:
+            if profiler:
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # Another profiler (a debugger, say) is already active
+                    profiler = None
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+            self.observe(action, time.perf_counter() - start, error)
+            self._local.depth = depth
+            if profiler:
+                self._save_profile(action, profiler)
+            if snapshot:
+                self._save_memory(action)
+
+    def instrument(self, action, func):
+        """Return func wrapped so that each call is measured as action"""
+
+        @functools.wraps(func)
+        def measured(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            with self.measure(action):
+                return func(*args, **kwargs)
+
+        return measured
+
+    def _save_profile(self, action, profiler):
+        try:
+            profiler.dump_stats(self.profile_dir / f"{action}.prof")
+        except Exception as e:
+            print(f"Error saving profile of {action}: {e}")
+
+    def _save_memory(self, action):
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            self._actions[action].peak_memory = peak
+        try:
+            stats = tracemalloc.take_snapshot().statistics("lineno")[:MEMORY_TOP]
+            with open(self.profile_dir / f"{action}.memory.txt", 'w') as f:
+                f.write(f"{action}: peak {peak} bytes, {current} bytes traced after it\n")
+                f.writelines(f"{stat}\n" for stat in stats)
+        except Exception as e:
+            print(f"Error saving memory snapshot of {action}: {e}")
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format"""
+        with self._lock:
+            actions = sorted(self._actions.items())
+            counters = sorted(self._counters.items())
+        lines = [f"# HELP {PREFIX}_action_duration_seconds Wall time of GUI actions",
+                 f"# TYPE {PREFIX}_action_duration_seconds histogram"]
+        for action, stats in actions:
+            label = f'action="{escape_label(action)}"'
+            for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                lines.append(f'{PREFIX}_action_duration_seconds_bucket{{{label},le="{bound:g}"}} {count}')
+            lines.append(f'{PREFIX}_action_duration_seconds_bucket{{{label},le="+Inf"}} {stats.count}')
+            lines.append(f"{PREFIX}_action_duration_seconds_sum{{{label}}} {stats.total:.6f}")
+            lines.append(f"{PREFIX}_action_duration_seconds_count{{{label}}} {stats.count}")
+        lines += [f"# HELP {PREFIX}_action_errors_total GUI actions that raised an exception",
+                  f"# TYPE {PREFIX}_action_errors_total counter"]
+        lines += [f'{PREFIX}_action_errors_total{{action="{escape_label(action)}"}} {stats.errors}'
+                  for action, stats in actions]
+        lines += [f"# HELP {PREFIX}_action_last_seconds Wall time of the latest run of each GUI action",
+                  f"# TYPE {PREFIX}_action_last_seconds gauge"]
+        lines += [f'{PREFIX}_action_last_seconds{{action="{escape_label(action)}"}} {stats.last:.6f}'
+                  for action, stats in actions]
+        peaks = [(action, stats.peak_memory) for action, stats in actions if stats.peak_memory is not None]
+        if peaks:
+            lines += [f"# HELP {PREFIX}_action_peak_memory_bytes Peak traced memory during the latest run",
+                      f"# TYPE {PREFIX}_action_peak_memory_bytes gauge"]
+            lines += [f'{PREFIX}_action_peak_memory_bytes{{action="{escape_label(action)}"}} {peak}'
+                      for action, peak in peaks]
+        for name, value in counters:
+            lines += [f"# TYPE {PREFIX}_{name}_total counter", f"{PREFIX}_{name}_total {value}"]
+        for name, read in sorted(self._gauges.items()):
+            try:
+                value = read()
+            except Exception:
+                continue
+            lines += [f"# TYPE {PREFIX}_{name} gauge", f"{PREFIX}_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        """Write the metrics file now (atomically)"""
+        with self._write_lock:
+            self._dirty.clear()
+            try:
+                temp_file = self.path.with_name(self.path.name + ".tmp")
+                with open(temp_file, 'w') as f:
+                    f.write(self.render())
+                os.replace(temp_file, self.path)
+            except Exception as e:
+                print(f"Error saving metrics: {e}")
+
+    def _run(self):
+        while not self._closed:
+            self._dirty.wait()
+            if self._closed:
+                return
+            self.flush()
+            time.sleep(self.interval)
+
+    def close(self):
+        """Write what was recorded and stop the writer thread"""
+        if self._thread is not None:
+            self._closed = True
+            self._dirty.set()
+            self.flush()
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP Reachability Probe
+Checks that a profile's server and gateway answer before FreeRDP is started,
+and measures the link to them to tune FreeRDP's bandwidth options
+"""
+
+import json
+import os
+import socket
+import ssl
+import statistics
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Seconds allowed for each TCP connect, negotiation or TLS handshake
+CONNECT_TIMEOUT = 3.0
+
+# Concurrent probes when checking every saved profile
+PROBE_WORKERS = 16
+
+RDP_PORT = 3389
+GATEWAY_PORT = 443
+
+# RDP_NEG_REQ protocols offered in the X.224 Connection Request: TLS, CredSSP and CredSSP with early auth
+PROTOCOL_SSL = 0x01
+PROTOCOL_HYBRID = 0x02
+PROTOCOL_HYBRID_EX = 0x08
+PROTOCOL_NAMES = {0x00: "RDP", PROTOCOL_SSL: "TLS", PROTOCOL_HYBRID: "NLA", PROTOCOL_HYBRID_EX: "NLA-EX"}
+
+# TCP connects timed for the round-trip time of a link measurement
+LINK_SAMPLES = 5
+
+# Seconds a link measurement is reused, and a failed one before it is retried
+LINK_CACHE_SECONDS = 6 * 60 * 60
+LINK_RETRY_SECONDS = 5 * 60
+
+# Network tiers, best first: (FreeRDP /network: type, highest RTT in ms or None, lowest kbit/s,
+# colour depth, /compression-level: or None for no compression, desktop effects, GFX pipeline).
+# A link gets the first tier whose RTT and throughput limits it meets.
+NETWORK_TIERS = (
+    ("lan", 10, 100000, "32", None, True, False),
+    ("broadband-high", 50, 10000, "32", 0, True, True),
+    ("wan", 150, 2000, "24", 1, False, True),
+    ("satellite", None, 2000, "24", 2, False, True),
+    ("broadband-low", None, 512, "16", 2, False, True),
+    ("modem", None, 0, "16", 2, False, True),
+)
+
+# Values of the network tuning setting: off, measured, or one tier chosen by hand
+NETWORK_TUNINGS = ("", "auto") + tuple(tier[0] for tier in NETWORK_TIERS)
+
+NEGOTIATION_FAILURES = {
+    0x01: "server requires TLS",
+    0x02: "server does not allow TLS",
+    0x03: "server has no TLS certificate",
+    0x04: "inconsistent security flags",
+    0x05: "server requires NLA (CredSSP)",
+    0x06: "server requires TLS with user authentication",
+}
+
+
+def connection_request(protocols=PROTOCOL_SSL | PROTOCOL_HYBRID | PROTOCOL_HYBRID_EX):
+    """Build a TPKT-wrapped X.224 Connection Request carrying an RDP_NEG_REQ"""
+    negotiation = struct.pack("<BBHI", 0x01, 0x00, 8, protocols)
+    x224 = struct.pack("!BBHHB", 6 + len(negotiation), 0xE0, 0, 0, 0) + negotiation
+    return struct.pack("!BBH", 3, 0, 4 + len(x224)) + x224
+
+
+def parse_connection_confirm(data):
+    """Return (ok, detail) for the server's reply to connection_request()"""
+    if len(data) < 11 or data[0] != 3:
+        return False, "not an RDP server (no TPKT reply)"
+    if data[5] & 0xF0 != 0xD0:
+        return False, "not an RDP server (no X.224 Connection Confirm)"
+    if len(data) < 19:
+        # Old servers confirm without a negotiation response: standard RDP security
+        return True, PROTOCOL_NAMES[0x00]
+    kind, code = data[11], struct.unpack("<I", data[15:19])[0]
+    if kind == 0x02:
+        return True, PROTOCOL_NAMES.get(code, f"protocol 0x{code:x}")
+    if kind == 0x03:
+        # The server is up and speaks RDP; FreeRDP may still connect with other /sec settings
+        return True, "RDP, " + NEGOTIATION_FAILURES.get(code, f"negotiation failed (code {code})")
+    return False, "unexpected negotiation response"
+
+
+def split_host_port(address, default_port):
+    """Split "host", "host:port" or "[v6]:port" into (host, port)"""
+    address = address.strip()
+    if address.startswith("["):
+        host, _, rest = address[1:].partition("]")
+        port = rest[1:] if rest.startswith(":") else ""
+    elif address.count(":") == 1:
+        host, port = address.split(":")
+    else:
+        host, port = address, ""
+    try:
+        return host, int(port) if port else default_port
+    except ValueError:
+        return host, default_port
+
+
+class ProbeResult:
+    """Outcome of probing one host:port"""
+
+    def __init__(self, role, host, port, ok, detail, elapsed):
+        self.role = role
+        self.host = host
+        self.port = port
+        self.ok = ok
+        self.detail = detail
+        self.elapsed = elapsed
+
+    def describe(self):
+        state = "reachable" if self.ok else "unreachable"
+        return f"{self.role} {self.host}:{self.port} {state} ({self.detail}, {self.elapsed * 1000:.0f} ms)"
+
+
+def probe_address(role, host, port, timeout=CONNECT_TIMEOUT, negotiate=None, tls=False):
+    """Connect to host:port and optionally run an X.224 negotiation or TLS handshake
+
+    The connect happens in the calling thread with a socket timeout, so
+    callers that must not block run this on a worker (see ReachabilityProber).
+    """
+    start = time.monotonic()
+
+    def result(ok, detail):
+        return ProbeResult(role, host, port, ok, detail, time.monotonic() - start)
+
+    try:
+        sock = socket.create_connection((host, port), timeout=timeout)
+    except socket.gaierror as e:
+        return result(False, f"cannot resolve host: {e.strerror or e}")
+    except socket.timeout:
+        return result(False, f"no answer within {timeout:g} s")
+    except OSError as e:
+        return result(False, e.strerror or str(e))
+
+    with sock:
+        try:
+            if negotiate:
+                sock.sendall(connection_request())
+                ok, detail = parse_connection_confirm(sock.recv(64))
+                return result(ok, detail)
+            if tls:
+                context = ssl.create_default_context()
+                # Only reachability is checked here; FreeRDP does the real certificate validation
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+                with context.wrap_socket(sock, server_hostname=host) as tls_sock:
+                    return result(True, tls_sock.version() or "TLS")
+        except socket.timeout:
+            return result(False, f"connected but no reply within {timeout:g} s")
+        except (OSError, ssl.SSLError) as e:
+            return result(False, f"connected but handshake failed: {e}")
+    return result(True, "TCP connect")
+
+
+def probe_target(settings):
+    """Return the (role, host, port) a profile connects to first: its gateway when one is set, else its server"""
+    gateway = str(settings.get('gateway', '')).strip()
+    if gateway:
+        return ("Gateway",) + split_host_port(gateway, GATEWAY_PORT)
+
+    server = str(settings.get('server', '')).strip()
+    try:
+        port = int(str(settings.get('port', '')).strip() or RDP_PORT)
+    except ValueError:
+        port = RDP_PORT
+    return ("Server",) + split_host_port(server, port)
+
+
+def probe_settings(settings, timeout=CONNECT_TIMEOUT, negotiate=True):
+    """Probe a profile's server, or its gateway when one is set, returning a list of ProbeResult
+
+    Behind a gateway the server is usually only reachable through it, so
+    the gateway is probed instead, with a TLS handshake.
+    """
+    role, host, port = probe_target(settings)
+    if role == "Gateway":
+        return [probe_address(role, host, port, timeout, tls=True)]
+    return [probe_address(role, host, port, timeout, negotiate=negotiate)]
+
+
+def first_failure(results):
+    """Return the first failed ProbeResult, or None when everything answered"""
+    return next((result for result in results if not result.ok), None)
+
+
+class LinkQuality:
+    """Measured round-trip time and throughput of the link to one host:port
+
+    kbps is None when the handshake arrived too fast to time, which only
+    happens on links faster than any tier needs.
+    """
+
+    def __init__(self, role, host, port, ok, detail, rtt_ms=None, jitter_ms=None, kbps=None, measured=None):
+        self.role = role
+        self.host = host
+        self.port = port
+        self.ok = ok
+        self.detail = detail
+        self.rtt_ms = rtt_ms
+        self.jitter_ms = jitter_ms
+        self.kbps = kbps
+        self.measured = time.time() if measured is None else measured
+
+    @property
+    def tier(self):
+        """FreeRDP /network: type for this link, or '' when it could not be measured"""
+        return classify_link(self.rtt_ms, self.kbps) if self.ok else ""
+
+    def describe(self):
+        if not self.ok:
+            return f"{self.role} {self.host}:{self.port} not measured ({self.detail})"
+        throughput = "too fast to time" if self.kbps is None else f"~{self.kbps / 1000:.1f} Mbit/s"
+        return (f"{self.role} {self.host}:{self.port}: RTT {self.rtt_ms:.0f} ms (±{self.jitter_ms:.0f}), "
+                f"{throughput} -> {self.tier}")
+
+    def to_dict(self):
+        return {'role': self.role, 'ok': self.ok, 'detail': self.detail, 'rtt_ms': self.rtt_ms,
+                'jitter_ms': self.jitter_ms, 'kbps': self.kbps, 'measured': self.measured}
+
+    @classmethod
+    def from_dict(cls, host, port, data):
+        return cls(data.get('role', "Server"), host, port, data.get('ok', False), data.get('detail', ""),
+                   data.get('rtt_ms'), data.get('jitter_ms'), data.get('kbps'), data.get('measured', 0))
+
+
+def classify_link(rtt_ms, kbps):
+    """Return the first NETWORK_TIERS type whose RTT and throughput limits the link meets"""
+    for name, max_rtt, min_kbps, *options in NETWORK_TIERS:
+        if (max_rtt is None or rtt_ms <= max_rtt) and (kbps is None or kbps >= min_kbps):
+            return name
+    return NETWORK_TIERS[-1][0]
+
+
+def handshake_throughput(sock, host):
+    """Run a TLS handshake over sock and estimate the link's throughput in kbit/s from it
+
+    The server sends its certificates as one burst, so the time between the
+    first and the last packet of that burst is how long the link took to
+    carry the rest of it (packet-train dispersion). Server think time and
+    the round trip fall before the first packet and do not count. Returns
+    None when the burst arrived in a single read.
+    """
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    incoming, outgoing = ssl.MemoryBIO(), ssl.MemoryBIO()
+    tls = context.wrap_bio(incoming, outgoing, server_hostname=host)
+    try:
+        tls.do_handshake()
+    except ssl.SSLWantReadError:
+        pass
+    sock.sendall(outgoing.read())
+
+    first = last = None
+    first_size = received = 0
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            raise ConnectionError("connection closed during the TLS handshake")
+        now = time.monotonic()
+        if first is None:
+            first, first_size = now, len(data)
+        else:
+            last = now
+        received += len(data)
+        incoming.write(data)
+        try:
+            tls.do_handshake()
+            break
+        except ssl.SSLWantReadError:
+            # TLS 1.2: once the client has something to send, the server's flight is complete
+            if outgoing.pending:
+                break
+    if last is None or last <= first or received <= first_size:
+        return None
+    return (received - first_size) * 8 / 1000 / (last - first)
+
+
+def measure_link(settings, samples=LINK_SAMPLES, timeout=CONNECT_TIMEOUT):
+    """Measure the link to a profile's gateway or server, returning a LinkQuality
+
+    The round-trip time is the median of several TCP connects (each takes
+    one round trip), and the throughput is estimated from one TLS handshake
+    (after an RDP negotiation that selects TLS, for a server).
+    """
+    role, host, port = probe_target(settings)
+
+    def failed(detail):
+        return LinkQuality(role, host, port, False, detail)
+
+    rtts = []
+    try:
+        for i in range(samples):
+            start = time.monotonic()
+            socket.create_connection((host, port), timeout=timeout).close()
+            rtts.append((time.monotonic() - start) * 1000)
+    except socket.gaierror as e:
+        return failed(f"cannot resolve host: {e.strerror or e}")
+    except socket.timeout:
+        return failed(f"no answer within {timeout:g} s")
+    except OSError as e:
+        return failed(e.strerror or str(e))
+    except ValueError as e:
+        # Such as a host name IDNA cannot encode ("a..b")
+        return failed(f"invalid host: {e}")
+
+    rtt_ms = statistics.median(rtts)
+    jitter_ms = statistics.pstdev(rtts)
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            if role == "Server":
+                sock.sendall(connection_request())
+                ok, detail = parse_connection_confirm(sock.recv(64))
+                if not ok or detail.startswith(PROTOCOL_NAMES[0x00]):
+                    # No TLS to time: the round-trip time alone decides the tier
+                    return LinkQuality(role, host, port, True, detail, rtt_ms, jitter_ms)
+            kbps = handshake_throughput(sock, host)
+    except (OSError, ssl.SSLError) as e:
+        return LinkQuality(role, host, port, True, f"throughput not measured: {e}", rtt_ms, jitter_ms)
+    return LinkQuality(role, host, port, True, "measured", rtt_ms, jitter_ms, kbps)
+
+
+def tier_options(name):
+    """Return the NETWORK_TIERS entry for a /network: type, or None"""
+    return next((tier for tier in NETWORK_TIERS if tier[0] == name), None)
+
+
+def tune_settings(settings):
+    """Return settings with the colour depth, compression and desktop effects of its network tier
+
+    Profiles without tuning, or whose measurement is still pending ('auto'),
+    keep their own values.
+    """
+    tier = tier_options(settings.get('network_tuning', ''))
+    if tier is None:
+        return settings
+    name, max_rtt, min_kbps, color_depth, compression_level, effects, gfx = tier
+    return {**settings, 'color_depth': color_depth, 'compression': compression_level is not None,
+            'fonts': effects, 'aero': effects, 'themes': effects, 'wallpaper': effects}
+
+
+def network_args(settings, gfx=True):
+    """Return the /network:, /compression-level: and /gfx arguments of a profile's network tuning
+
+    gfx=False leaves out /gfx, for commands whose codec choice already enables the GFX pipeline.
+    """
+    tuning = settings.get('network_tuning', '')
+    if tuning == "auto":
+        # Not measured yet: let FreeRDP detect the connection type itself
+        return ["/network:auto"]
+    tier = tier_options(tuning)
+    if tier is None:
+        return []
+    name, max_rtt, min_kbps, color_depth, compression_level, effects, tier_gfx = tier
+    args = [f"/network:{name}"]
+    if compression_level is not None:
+        args.append(f"/compression-level:{compression_level}")
+    if gfx and tier_gfx:
+        args.append("/gfx")
+    return args
+
+
+class LinkCache:
+    """Persistent per-host cache of link measurements
+
+    A measurement is reused for LINK_CACHE_SECONDS (a failed one for
+    LINK_RETRY_SECONDS), so only the first launch of a host after that
+    pays for measuring it.
+    """
+
+    def __init__(self, cache_file, ttl=LINK_CACHE_SECONDS, retry=LINK_RETRY_SECONDS, measure=measure_link):
+        self.cache_file = Path(cache_file)
+        self.ttl = ttl
+        self.retry = retry
+        self.measure_settings = measure
+        self._lock = threading.Lock()
+        self.data = self._load()
+
+    def _load(self):
+        try:
+            if self.cache_file.exists():
+                with open(self.cache_file, 'r') as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    return data
+        except Exception as e:
+            print(f"Error loading link measurements: {e}")
+        return {}
+
+    def _save(self):
+        """Write the cache atomically (callers hold the lock)"""
+        try:
+            temp_file = self.cache_file.with_name(self.cache_file.name + ".tmp")
+            with open(temp_file, 'w') as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(temp_file, self.cache_file)
+        except Exception as e:
+            print(f"Error saving link measurements: {e}")
+
+    def cached(self, settings):
+        """Return the fresh LinkQuality for a profile's target, or None"""
+        role, host, port = probe_target(settings)
+        with self._lock:
+            data = self.data.get(f"{host}:{port}")
+        if not data:
+            return None
+        quality = LinkQuality.from_dict(host, port, data)
+        if time.time() - quality.measured > (self.ttl if quality.ok else self.retry):
+            return None
+        return quality
+
+    def needs_measure(self, settings):
+        """Return True when a profile tunes automatically and its target has no fresh measurement"""
+        return settings.get('network_tuning', '') == "auto" and self.cached(settings) is None
+
+    def measure(self, settings):
+        """Measure a profile's target now (blocking) and cache the result, failures included"""
+        try:
+            quality = self.measure_settings(settings)
+        except Exception as e:
+            # Cached like any other failure, so the target is not measured again until the retry interval
+            role, host, port = probe_target(settings)
+            quality = LinkQuality(role, host, port, False, str(e))
+        with self._lock:
+            self.data[f"{quality.host}:{quality.port}"] = quality.to_dict()
+            self._save()
+        return quality
+
+    def tier(self, settings):
+        """Resolve a profile's network tuning: its own tier, the measured one for 'auto', or 'auto' if unmeasured"""
+        tuning = settings.get('network_tuning', '')
+        if tuning != "auto":
+            return tuning
+        quality = self.cached(settings)
+        return quality.tier if quality and quality.ok else "auto"
+
+
+class ReachabilityProber:
+    """Run reachability probes on a shared pool of worker threads
+
+    Results are reported through ``dispatch(func, *args)`` like the launch
+    engine, so a GUI can marshal them onto its own thread.
+    """
+
+    def __init__(self, dispatch=None, max_workers=PROBE_WORKERS, timeout=CONNECT_TIMEOUT):
+        self.dispatch = dispatch or (lambda func, *args: func(*args))
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="freerdp-probe")
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def probe(self, settings, on_result):
+        """Probe one profile in the background, calling on_result(results)"""
+        self._executor.submit(self._run, settings, on_result, (), None)
+
+    def measure(self, settings, links, on_result=None):
+        """Measure a profile's link in the background through links (a LinkCache), calling on_result(quality)"""
+        self._executor.submit(self._measure, settings, links, on_result)
+
+    def _measure(self, settings, links, on_result):
+        try:
+            quality = links.measure(settings)
+        except Exception as e:
+            role, host, port = probe_target(settings)
+            quality = LinkQuality(role, host, port, False, str(e))
+        if on_result:
+            self.dispatch(on_result, quality)
+
+    def probe_many(self, jobs, on_result):
+        """Probe many (key, settings) pairs concurrently, calling on_result(key, results) for each
+
+        Starting a new sweep drops the results of any sweep still running.
+        """
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        for key, settings in jobs:
+            self._executor.submit(self._run, settings, on_result, (key,), generation)
+
+    def _run(self, settings, on_result, prefix, generation):
+        if generation is not None and generation != self._generation:
+            return
+        try:
+            results = probe_settings(settings, self.timeout)
+        except Exception as e:
+            results = [ProbeResult("Server", str(settings.get('server', '')), None, False, str(e), 0.0)]
+        if generation is None or generation == self._generation:
+            self.dispatch(on_result, *prefix, results)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -4,18 +4,86 @@ FreeRDP GUI Wrapper
 A user-friendly cross-platform interface for FreeRDP with connection management
 """
 
+import sys
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Subcommands (list, show-command, connect, ...) run headless: dispatch before Tk and the GUI modules load,
+    # so they work without python3-tk and skip its startup cost
+    from freerdp_cli import main as cli_main
+    sys.exit(cli_main(sys.argv[1:]))
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
 from tkinter import LEFT, RIGHT, TOP, BOTTOM, BOTH, X, Y, W, E, NORMAL, DISABLED
 import json
 import os
-import subprocess
-import sys
-from pathlib import Path
+import queue
+import sqlite3
+import threading
+import time
+
+from freerdp_autosave import JSONAutosaver
+from freerdp_core import (CONNECTIONS_FILE, CONTROL_FILE, DEFAULT_SETTINGS, DISCOVERY_CACHE_FILE, LAST_SETTINGS_FILE,
+                          LEGACY_CONNECTIONS_FILE, METRICS_FILE, NETWORK_CACHE_FILE, SESSION_LOG_DIR, TELEMETRY_FILE,
+                          VAULT_FILE, build_command, compile_launch, compile_profile, complete_settings,
+                          format_command)
+from freerdp_codecs import CODECS, choose_codec
+from freerdp_control import ControlError, ControlServer, NotRunning, send_request
+from freerdp_discovery import DiscoveryCache, file_mtime
+from freerdp_display import DISPLAY_LAYOUTS, DisplayLayout, monitor_numbers, primary_monitor
+from freerdp_import import Importer, export_csv, export_rdp
+from freerdp_launcher import (BATCH_STAGGER, BATCH_WORKERS, RECONNECT_RETRIES, BatchLauncher, LaunchEngine,
+                               ReconnectSupervisor, SessionRegistry)
+from freerdp_metrics import Metrics
+from freerdp_probe import NETWORK_TUNINGS, LinkCache, ReachabilityProber, first_failure
+from freerdp_store import ConnectionStore
+from freerdp_telemetry import TelemetryLog, make_record, session_outcome
+from freerdp_vault import Vault, VaultError, profile_password, vault_available
+from freerdp_widgets import VirtualTreeview
+
+# Interval for draining worker-thread callbacks onto the Tk thread (~60 fps)
+UI_POLL_MS = 16
+
+# Quiet time after the last form edit before the last used settings are saved
+AUTOSAVE_DELAY_MS = 500
+
+# Interval for refreshing the Sessions tab process table
+SESSION_REFRESH_MS = 1000
+
+# Live log viewer: poll interval and the most lines kept in the window
+LOG_VIEW_MS = 250
+LOG_VIEW_LINES = 5000
+
+# Connection list badges for the last reachability check, and their sort order
+REACHABILITY_BADGES = {None: "…", True: "● Up", False: "○ Down"}
+REACHABILITY_ORDER = {True: 0, None: 1, False: 2}
+
+# Set to print startup timings (including time to first window) to stderr
+STARTUP_TRACE_ENV = "FREERDP_GUI_STARTUP_TRACE"
+
+# Actions timed when metrics are on (FREERDP_GUI_METRICS or the Expert tab)
+INSTRUMENTED_ACTIONS = ("connect", "connect_selected", "connect_profile", "save_connection", "load_connection",
+                        "delete_connection", "rename_connection", "show_command")
+
+
+class StartupTrace:
+    """Milestones of GUI startup in milliseconds since the trace was created"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, (time.perf_counter() - self.start) * 1000))
+
+    def report(self):
+        if self.enabled:
+            print("Startup: " + ", ".join(f"{name} {ms:.1f} ms" for name, ms in self.marks), file=sys.stderr)
 
 
 class FreeRDPGUI:
-    def __init__(self, root):
+    def __init__(self, root, trace=None):
         self.password_var = None
         self.domain_var = None
         self.username_var = None
@@ -23,26 +91,97 @@ class FreeRDPGUI:
         self.server_var = None
         self.freerdp_path_var = None
         self.notebook = None
+        self.connection_list = None
+        self.sessions_tree = None
+        self.history_tree = None
         self.root = root
         self.root.title("FreeRDP GUI Wrapper")
         self.root.geometry("700x600")
         self.root.resizable(True, True)
-
-        # Configuration file for saved connections
-        self.config_file = Path.home() / ".freerdp_connections.json"
+        self.trace = trace or StartupTrace()
+
+        # Opt-in metrics; the actions are wrapped before any widget binds them
+        self.metrics = Metrics.from_env(METRICS_FILE)
+        for action in INSTRUMENTED_ACTIONS:
+            setattr(self, action, self.metrics.instrument(action, getattr(self, action)))
+
+        # Callbacks from worker threads are queued and run on the Tk thread
+        self.ui_queue = queue.Queue()
+        self.sessions = SessionRegistry()
+        self.launcher = LaunchEngine(dispatch=self.call_in_ui, registry=self.sessions)
+        # Local monitor layout, detected when a display layout first needs it
+        self.display = DisplayLayout()
+        self.prober = ReachabilityProber(dispatch=self.call_in_ui)
+        # Per-host link measurements behind the automatic network tuning
+        self.links = LinkCache(NETWORK_CACHE_FILE)
+        self.supervisor = ReconnectSupervisor(self.relaunch_session, dispatch=self.call_in_ui)
+        # Last reachability check by profile ID: True, False, or None while a check is running
+        self.reachability = {}
+        self.check_counts = None
+        self.telemetry = TelemetryLog(TELEMETRY_FILE)
+        # Passwords are kept encrypted here; the key is cached only while the vault is unlocked
+        self.vault = Vault(VAULT_FILE)
+        # How to get the password of each launched profile again when it reconnects
+        self.credentials = {}
+        # Passwords of stopped sessions to launch again once their old process has exited, by session ID
+        self.pending_reconnects = {}
+
+        # Configuration files for saved connections (the JSON file is imported once)
+        self.config_file = CONNECTIONS_FILE
+        self.legacy_config_file = LEGACY_CONNECTIONS_FILE
         self.connections = self.load_connections()
+        self.trace.mark("store opened")
+        self.metrics.gauge("profiles", lambda: len(self.connections))
 
         # Variables for form fields
         self.setup_variables()
 
         # Create the GUI
         self.create_widgets()
+        self.trace.mark("widgets built")
 
-        # Find FreeRDP executable
+        # Find FreeRDP executable (cached between runs)
+        self.discovery = DiscoveryCache(DISCOVERY_CACHE_FILE)
+        self.probing = set()
         self.find_freerdp()
 
-        # Load last used settings
+        # Load last used settings, then save them again whenever the form changes
+        self.autosaver = JSONAutosaver(LAST_SETTINGS_FILE)
+        self.autosave_job = None
         self.load_last_settings()
+        for var in self.settings_vars.values():
+            var.trace_add("write", self.schedule_autosave)
+        self.get_freerdp_info(self.freerdp_path_var.get().strip())
+        self.trace.mark("settings loaded")
+
+        self.process_ui_queue()
+        self.refresh_sessions()
+
+        # Later invocations hand their requests to this window instead of starting another one
+        self.control = ControlServer(CONTROL_FILE, {
+            "show": self.control_show,
+            "connect": self.control_connect,
+            "sessions": self.control_sessions,
+            "import": self.control_import,
+        }, dispatch=self.call_in_ui)
+        self.control.start()
+
+    def call_in_ui(self, func, *args):
+        """Schedule func(*args) to run on the Tk thread (safe from any thread)"""
+        self.ui_queue.put((func, args))
+
+    def process_ui_queue(self):
+        """Run queued callbacks, then reschedule so the mainloop stays responsive"""
+        try:
+            while True:
+                func, args = self.ui_queue.get_nowait()
+                try:
+                    func(*args)
+                except Exception as e:
+                    print(f"Error in UI callback: {e}")
+        except queue.Empty:
+            pass
+        self.root.after(UI_POLL_MS, self.process_ui_queue)
 
     def setup_variables(self):
         """Initialize all tkinter variables"""
@@ -52,9 +191,12 @@ class FreeRDPGUI:
         self.username_var = tk.StringVar()
         self.domain_var = tk.StringVar()
         self.password_var = tk.StringVar()
+        self.password_id_var = tk.StringVar()
         self.width_var = tk.StringVar(value="1920")
         self.height_var = tk.StringVar(value="1080")
         self.fullscreen_var = tk.BooleanVar()
+        self.display_layout_var = tk.StringVar()
+        self.monitors_var = tk.StringVar()
         self.color_depth_var = tk.StringVar(value="32")
 
         # Advanced tab variables
@@ -67,8 +209,11 @@ class FreeRDPGUI:
         self.aero_var = tk.BooleanVar(value=True)
         self.themes_var = tk.BooleanVar(value=True)
         self.wallpaper_var = tk.BooleanVar(value=True)
+        self.network_tuning_var = tk.StringVar()
         self.gateway_var = tk.StringVar()
         self.gateway_user_var = tk.StringVar()
+        self.auto_reconnect_var = tk.BooleanVar()
+        self.reconnect_retries_var = tk.StringVar(value=str(RECONNECT_RETRIES))
 
         # Expert tab variables
         self.freerdp_path_var = tk.StringVar()
@@ -77,13 +222,67 @@ class FreeRDPGUI:
         self.admin_session_var = tk.BooleanVar()
         self.gdi_mode_var = tk.StringVar()
         self.remotefx_var = tk.BooleanVar()
+        self.codec_var = tk.StringVar(value="auto")
         self.multimon_var = tk.BooleanVar()
         self.custom_params_var = tk.StringVar()
+        self.check_reachability_var = tk.BooleanVar(value=True)
+        self.freerdp_version_var = tk.StringVar(value="Version: not probed yet")
+
+        # Form variables by settings key (see DEFAULT_SETTINGS)
+        self.settings_vars = {
+            'server': self.server_var,
+            'port': self.port_var,
+            'username': self.username_var,
+            'domain': self.domain_var,
+            'password': self.password_var,
+            'password_id': self.password_id_var,
+            'width': self.width_var,
+            'height': self.height_var,
+            'fullscreen': self.fullscreen_var,
+            'display_layout': self.display_layout_var,
+            'monitors': self.monitors_var,
+            'color_depth': self.color_depth_var,
+            'clipboard': self.clipboard_var,
+            'drive_redirect': self.drive_redirect_var,
+            'printers': self.printers_var,
+            'microphone': self.microphone_var,
+            'compression': self.compression_var,
+            'fonts': self.fonts_var,
+            'aero': self.aero_var,
+            'themes': self.themes_var,
+            'wallpaper': self.wallpaper_var,
+            'network_tuning': self.network_tuning_var,
+            'gateway': self.gateway_var,
+            'gateway_user': self.gateway_user_var,
+            'auto_reconnect': self.auto_reconnect_var,
+            'reconnect_retries': self.reconnect_retries_var,
+            'wfreerdp_path': self.freerdp_path_var,
+            'security': self.security_var,
+            'cert_ignore': self.cert_ignore_var,
+            'admin_session': self.admin_session_var,
+            'gdi_mode': self.gdi_mode_var,
+            'remotefx': self.remotefx_var,
+            'codec': self.codec_var,
+            'multimon': self.multimon_var,
+            'custom_params': self.custom_params_var,
+            'check_reachability': self.check_reachability_var,
+        }
 
         # Connection management variables
         self.connection_name_var = tk.StringVar()
+        self.template_var = tk.StringVar()
+        self.search_var = tk.StringVar()
         self.quick_server_var = tk.StringVar()
         self.quick_user_var = tk.StringVar()
+        self.batch_workers_var = tk.StringVar(value=str(BATCH_WORKERS))
+        self.batch_stagger_var = tk.StringVar(value=str(BATCH_STAGGER))
+        self.session_logs_var = tk.BooleanVar()
+        self.session_logs_var.trace_add("write", lambda *args: self.toggle_session_logs())
+        self.metrics_var = tk.BooleanVar(value=self.metrics.enabled)
+        self.metrics_profile_var = tk.BooleanVar(value=self.metrics.profile)
+        self.metrics_memory_var = tk.BooleanVar(value=self.metrics.memory)
+        for var in (self.metrics_var, self.metrics_profile_var, self.metrics_memory_var):
+            var.trace_add("write", lambda *args: self.toggle_metrics())
 
     def create_widgets(self):
         """Create the main GUI widgets"""
@@ -91,39 +290,54 @@ class FreeRDPGUI:
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill="both", expand=True, padx=10, pady=10)
 
-        # Create tabs
-        self.create_basic_tab()
-        self.create_advanced_tab()
-        self.create_expert_tab()
-        self.create_connections_tab()
+        # Tabs start as empty frames and are filled in the first time they are shown
+        self.tab_builders = {}
+        for text, builder in (("Basic", self.create_basic_tab), ("Advanced", self.create_advanced_tab),
+                              ("Expert", self.create_expert_tab), ("Connections", self.create_connections_tab),
+                              ("Sessions", self.create_sessions_tab), ("History", self.create_history_tab)):
+            frame = ttk.Frame(self.notebook)
+            self.notebook.add(frame, text=text)
+            self.tab_builders[str(frame)] = (builder, frame)
+            if text == "Sessions":
+                self.sessions_frame = frame
+        self.notebook.bind("<<NotebookTabChanged>>", lambda event: self.build_tab(self.notebook.select()))
+        self.build_tab(self.notebook.select())
 
         # Create bottom button frame
         self.create_bottom_buttons()
 
-    def create_connections_tab(self):
-        """Create the connections management tab"""
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text="Connections")
+    def build_tab(self, tab_id):
+        """Fill in a notebook tab the first time it is selected"""
+        builder = self.tab_builders.pop(tab_id, None)
+        if builder:
+            create_tab, frame = builder
+            create_tab(frame)
 
+    def create_connections_tab(self, frame):
+        """Create the connections management tab"""
         # Saved connections section
         connections_frame = ttk.LabelFrame(frame, text="Saved Connections", padding=10)
         connections_frame.pack(fill=BOTH, expand=True, padx=10, pady=5)
 
+        # Search box, filtering by name, server, username, domain and gateway as you type
+        search_frame = ttk.Frame(connections_frame)
+        search_frame.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(search_frame, text="Search:").pack(side=tk.LEFT)
+        ttk.Entry(search_frame, textvariable=self.search_var, width=30).pack(side=tk.LEFT, padx=(10, 0))
+        self.search_var.trace_add("write", lambda *args: self.filter_connection_list())
+
         # Connection list and buttons
         list_frame = ttk.Frame(connections_frame)
         list_frame.pack(fill=BOTH, expand=True)
 
-        # Listbox with scrollbar
-        list_container = ttk.Frame(list_frame)
-        list_container.pack(side=tk.LEFT, fill=BOTH, expand=True)
-
-        self.connection_listbox = tk.Listbox(list_container, height=8, font=("Courier", 10))
-        self.connection_listbox.pack(side=tk.LEFT, fill=BOTH, expand=True)
-        self.connection_listbox.bind('<<ListboxSelect>>', self.on_connection_select)
-
-        scrollbar = ttk.Scrollbar(list_container, orient=tk.VERTICAL, command=self.connection_listbox.yview)
-        scrollbar.pack(side="right", fill=tk.Y)
-        self.connection_listbox.config(yscrollcommand=scrollbar.set)
+        # Virtual list: only the visible rows exist as widgets, keyed by profile ID
+        columns = (("name", "Name", 140), ("server", "Server", 120), ("username", "User", 80),
+                   ("last_used", "Last Used", 110), ("status", "Status", 60))
+        self.connection_list = VirtualTreeview(list_frame, columns, self.connection_row_values,
+                                               sort_value=self.connection_sort_value, height=8)
+        self.connection_list.pack(side=tk.LEFT, fill=BOTH, expand=True)
+        self.connection_list.bind('<<SelectionChanged>>', self.on_connection_select)
+        self.connection_list.bind('<<RowActivate>>', lambda event: self.load_connection())
 
         # Buttons frame
         buttons_frame = ttk.Frame(list_frame)
@@ -140,12 +354,49 @@ class FreeRDPGUI:
         self.rename_btn = ttk.Button(buttons_frame, text="Rename", command=self.rename_connection, state=tk.DISABLED)
         self.rename_btn.pack(fill=tk.X, pady=2)
 
+        self.connect_selected_btn = ttk.Button(buttons_frame, text="Connect Selected",
+                                               command=self.connect_selected, state=tk.DISABLED)
+        self.connect_selected_btn.pack(fill=tk.X, pady=(10, 2))
+
+        ttk.Button(buttons_frame, text="Check All", command=self.check_connections).pack(fill=tk.X, pady=2)
+
         # Connection name entry
         name_frame = ttk.Frame(connections_frame)
         name_frame.pack(fill=tk.X, pady=(10, 0))
         ttk.Label(name_frame, text="Connection Name:").pack(side=tk.LEFT)
         ttk.Entry(name_frame, textvariable=self.connection_name_var, width=30).pack(side=tk.LEFT, padx=(10, 0))
 
+        # Template the saved connection inherits from; only its differences are stored
+        template_frame = ttk.Frame(connections_frame)
+        template_frame.pack(fill=tk.X, pady=(5, 0))
+        ttk.Label(template_frame, text="Template:").pack(side=tk.LEFT)
+        self.template_combo = ttk.Combobox(template_frame, textvariable=self.template_var, state="readonly",
+                                           width=20, values=[""] + self.connections.template_names())
+        self.template_combo.pack(side=tk.LEFT, padx=(10, 10))
+        ttk.Button(template_frame, text="Load Template", command=self.load_template).pack(side=tk.LEFT, padx=2)
+        ttk.Button(template_frame, text="Save Template...", command=self.save_template).pack(side=tk.LEFT, padx=2)
+        ttk.Button(template_frame, text="Delete Template", command=self.delete_template).pack(side=tk.LEFT, padx=2)
+
+        # Bulk import of .rdp, CSV and Remmina files, and export
+        transfer_frame = ttk.Frame(connections_frame)
+        transfer_frame.pack(fill=tk.X, pady=(5, 0))
+        ttk.Button(transfer_frame, text="Import Files...", command=self.import_files).pack(side=tk.LEFT, padx=(0, 2))
+        ttk.Button(transfer_frame, text="Import Folder...", command=self.import_folder).pack(side=tk.LEFT, padx=2)
+        ttk.Button(transfer_frame, text="Export CSV...", command=self.export_connections_csv).pack(
+            side=tk.LEFT, padx=(10, 2))
+        ttk.Button(transfer_frame, text="Export .rdp...", command=self.export_connections_rdp).pack(
+            side=tk.LEFT, padx=2)
+
+        # Batch connect limits
+        batch_frame = ttk.Frame(connections_frame)
+        batch_frame.pack(fill=tk.X, pady=(5, 0))
+        ttk.Label(batch_frame, text="Parallel connects:").pack(side=tk.LEFT)
+        ttk.Spinbox(batch_frame, textvariable=self.batch_workers_var, from_=1, to=64, width=5).pack(
+            side=tk.LEFT, padx=(5, 20))
+        ttk.Label(batch_frame, text="Stagger (s):").pack(side=tk.LEFT)
+        ttk.Spinbox(batch_frame, textvariable=self.batch_stagger_var, from_=0, to=60, increment=0.5,
+                    width=5).pack(side=tk.LEFT, padx=(5, 0))
+
         # Quick connect section
         quick_frame = ttk.LabelFrame(frame, text="Quick Connect", padding=10)
         quick_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -165,13 +416,84 @@ class FreeRDPGUI:
         ttk.Button(quick_buttons, text="Quick Connect", command=self.quick_connect).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(quick_buttons, text="Save & Connect", command=self.save_and_connect).pack(side=tk.LEFT)
 
-        self.update_connection_list()
+        # Fill the list once the empty tab has been drawn
+        self.root.after_idle(self.update_connection_list)
 
-    def create_basic_tab(self):
-        """Create the basic settings tab"""
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text="Basic")
+    def create_sessions_tab(self, frame):
+        """Create the running sessions tab"""
+        sessions_frame = ttk.LabelFrame(frame, text="Launched Sessions", padding=10)
+        sessions_frame.pack(fill=BOTH, expand=True, padx=10, pady=5)
+
+        table_frame = ttk.Frame(sessions_frame)
+        table_frame.pack(fill=BOTH, expand=True)
+
+        columns = ("name", "pid", "started", "uptime", "status", "rss", "cpu", "error")
+        self.sessions_tree = ttk.Treeview(table_frame, columns=columns, show="headings", height=10)
+        for column, heading, width in (("name", "Profile", 120), ("pid", "PID", 55), ("started", "Started", 65),
+                                       ("uptime", "Uptime", 60), ("status", "Status", 80),
+                                       ("rss", "RSS (MB)", 65), ("cpu", "CPU %", 50), ("error", "Last Error", 160)):
+            self.sessions_tree.heading(column, text=heading)
+            self.sessions_tree.column(column, width=width, anchor=tk.W if column in ("name", "error") else tk.E)
+        self.sessions_tree.pack(side=tk.LEFT, fill=BOTH, expand=True)
+        self.sessions_tree.bind("<Double-1>", lambda event: self.view_session_logs())
+
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.sessions_tree.yview)
+        scrollbar.pack(side="right", fill=tk.Y)
+        self.sessions_tree.config(yscrollcommand=scrollbar.set)
+
+        buttons_frame = ttk.Frame(sessions_frame)
+        buttons_frame.pack(fill=tk.X, pady=(10, 0))
+
+        ttk.Button(buttons_frame, text="Kill", command=self.kill_sessions).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(buttons_frame, text="Reconnect", command=self.reconnect_sessions).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="Clear Ended", command=self.clear_ended_sessions).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="View Log", command=self.view_session_logs).pack(side=tk.LEFT, padx=5)
+
+        ttk.Checkbutton(sessions_frame, text=f"Also save session logs to {SESSION_LOG_DIR} (rotated)",
+                        variable=self.session_logs_var).pack(anchor=tk.W, pady=(5, 0))
+
+        for session in self.sessions.sessions():
+            self.update_session_row(session)
+
+    def create_history_tab(self, frame):
+        """Create the connection history tab with per-profile latency percentiles"""
+        history_frame = ttk.LabelFrame(frame, text="Connection History (slowest startup first)", padding=10)
+        history_frame.pack(fill=BOTH, expand=True, padx=10, pady=5)
+
+        table_frame = ttk.Frame(history_frame)
+        table_frame.pack(fill=BOTH, expand=True)
+
+        columns = (("profile", "Profile", 130), ("server", "Server", 110), ("attempts", "Tries", 45),
+                   ("failure_rate", "Fail %", 50), ("startup_p50_ms", "Start p50", 65),
+                   ("startup_p95_ms", "Start p95", 65), ("probe_p50_ms", "Probe p50", 65),
+                   ("first_output_p50_ms", "Output p50", 70), ("last_outcome", "Last", 75))
+        self.history_tree = ttk.Treeview(table_frame, columns=[column for column, heading, width in columns],
+                                         show="headings", height=10)
+        for column, heading, width in columns:
+            self.history_tree.heading(column, text=heading)
+            self.history_tree.column(column, width=width, anchor=tk.W if column in ("profile", "server") else tk.E)
+        self.history_tree.pack(side=tk.LEFT, fill=BOTH, expand=True)
+
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.history_tree.yview)
+        scrollbar.pack(side="right", fill=tk.Y)
+        self.history_tree.config(yscrollcommand=scrollbar.set)
+
+        ttk.Label(history_frame, text="Times in milliseconds. Start: connect request to FreeRDP running; "
+                                      "Probe: reachability check; Output: FreeRDP's first log line.").pack(
+            anchor=tk.W, pady=(5, 0))
 
+        buttons_frame = ttk.Frame(history_frame)
+        buttons_frame.pack(fill=tk.X, pady=(10, 0))
+        ttk.Button(buttons_frame, text="Refresh", command=self.update_history).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(buttons_frame, text="Export CSV...", command=lambda: self.export_history("csv")).pack(
+            side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="Export JSON...", command=lambda: self.export_history("json")).pack(
+            side=tk.LEFT, padx=5)
+
+        self.root.after_idle(self.update_history)
+
+    def create_basic_tab(self, frame):
+        """Create the basic settings tab"""
         # Connection details
         conn_frame = ttk.LabelFrame(frame, text="Connection Details", padding=10)
         conn_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -197,6 +519,16 @@ class FreeRDPGUI:
         pass_frame.pack(fill=tk.X, pady=2)
         ttk.Label(pass_frame, text="Password:").pack(side=tk.LEFT)
         ttk.Entry(pass_frame, textvariable=self.password_var, width=30, show="*").pack(side=tk.LEFT, padx=(10, 0))
+        vault_label = ttk.Label(pass_frame, foreground="gray")
+        vault_label.pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Button(pass_frame, text="Forget", command=self.forget_password).pack(side=tk.LEFT, padx=5)
+        ttk.Button(pass_frame, text="Lock Vault", command=self.lock_vault).pack(side=tk.LEFT)
+
+        def show_vault_state(*args):
+            vault_label.config(text="Saved in vault" if self.password_id_var.get() else "")
+
+        self.password_id_var.trace_add("write", show_vault_state)
+        show_vault_state()
 
         # Display settings
         display_frame = ttk.LabelFrame(frame, text="Display Settings", padding=10)
@@ -212,6 +544,31 @@ class FreeRDPGUI:
 
         ttk.Checkbutton(res_frame, text="Fullscreen", variable=self.fullscreen_var).pack(side=tk.LEFT, padx=(20, 0))
 
+        # Monitor layout: sessions sized from the detected monitors instead of the fixed size above
+        layout_frame = ttk.Frame(display_frame)
+        layout_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(layout_frame, text="Layout:").pack(side=tk.LEFT)
+        layout_combo = ttk.Combobox(layout_frame, textvariable=self.display_layout_var, width=10, state="readonly")
+        layout_combo['values'] = tuple(value for value, label in DISPLAY_LAYOUTS)
+        layout_combo.pack(side=tk.LEFT, padx=(5, 5))
+        layout_label = ttk.Label(layout_frame, foreground="gray", width=28)
+        layout_label.pack(side=tk.LEFT)
+        ttk.Label(layout_frame, text="Monitors:").pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Entry(layout_frame, textvariable=self.monitors_var, width=8).pack(side=tk.LEFT, padx=(5, 0))
+
+        def show_layout(*args):
+            layout_label.config(text=dict(DISPLAY_LAYOUTS).get(self.display_layout_var.get(), ""))
+
+        self.display_layout_var.trace_add("write", show_layout)
+        show_layout()
+
+        monitors_frame = ttk.Frame(display_frame)
+        monitors_frame.pack(fill=tk.X, pady=2)
+        ttk.Button(monitors_frame, text="Detect Monitors", command=self.detect_monitors).pack(side=tk.LEFT)
+        ttk.Button(monitors_frame, text="Native Size", command=self.use_native_size).pack(side=tk.LEFT, padx=5)
+        self.monitors_label = ttk.Label(monitors_frame, foreground="gray")
+        self.monitors_label.pack(side=tk.LEFT, padx=(5, 0))
+
         # Color depth
         color_frame = ttk.Frame(display_frame)
         color_frame.pack(fill=tk.X, pady=2)
@@ -220,11 +577,30 @@ class FreeRDPGUI:
         color_combo['values'] = ("32", "24", "16", "15", "8")
         color_combo.pack(side=tk.LEFT, padx=(5, 0))
 
-    def create_advanced_tab(self):
-        """Create the advanced settings tab"""
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text="Advanced")
+    def detect_monitors(self):
+        """Detect the local monitors again and list them next to the button"""
+        monitors = self.display.refresh()
+        text = ", ".join(monitor.describe() for monitor in monitors) if monitors else "No monitors detected"
+        self.monitors_label.config(text=text)
+        return monitors
 
+    def use_native_size(self):
+        """Set width and height to the native resolution of the chosen (or primary) monitor"""
+        monitors = self.display.monitors()
+        try:
+            numbers = monitor_numbers(self.monitors_var.get())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        monitor = next((m for m in monitors if m.index in numbers), None) or primary_monitor(monitors)
+        if monitor:
+            self.width_var.set(str(monitor.width))
+            self.height_var.set(str(monitor.height))
+        else:
+            self.monitors_label.config(text="No monitors detected")
+
+    def create_advanced_tab(self, frame):
+        """Create the advanced settings tab"""
         # Redirection options
         redirect_frame = ttk.LabelFrame(frame, text="Redirection Options", padding=10)
         redirect_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -252,6 +628,17 @@ class FreeRDPGUI:
         ttk.Checkbutton(perf_frame, text="Enable themes", variable=self.themes_var).pack(anchor=tk.W, pady=2)
         ttk.Checkbutton(perf_frame, text="Show wallpaper", variable=self.wallpaper_var).pack(anchor=tk.W, pady=2)
 
+        # Network tuning: a measured or chosen tier replaces the colour depth, compression and effects above
+        network_frame = ttk.Frame(perf_frame)
+        network_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(network_frame, text="Network tuning:").pack(side=tk.LEFT)
+        network_combo = ttk.Combobox(network_frame, textvariable=self.network_tuning_var, width=15, state="readonly")
+        network_combo['values'] = NETWORK_TUNINGS
+        network_combo.pack(side=tk.LEFT, padx=(5, 5))
+        ttk.Button(network_frame, text="Measure Link", command=self.measure_link).pack(side=tk.LEFT)
+        self.link_label = ttk.Label(network_frame, foreground="gray")
+        self.link_label.pack(side=tk.LEFT, padx=(5, 0))
+
         # Gateway settings
         gateway_frame = ttk.LabelFrame(frame, text="Gateway Settings", padding=10)
         gateway_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -263,11 +650,31 @@ class FreeRDPGUI:
         ttk.Label(gw_fields, text="Gateway User:").pack(side=tk.LEFT)
         ttk.Entry(gw_fields, textvariable=self.gateway_user_var, width=20).pack(side=tk.LEFT, padx=(5, 0))
 
-    def create_expert_tab(self):
-        """Create the expert settings tab"""
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text="Expert")
+        # Automatic reconnect
+        reconnect_frame = ttk.LabelFrame(frame, text="Automatic Reconnect", padding=10)
+        reconnect_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Checkbutton(reconnect_frame, text="Reconnect if the session drops", variable=self.auto_reconnect_var).pack(
+            side=tk.LEFT)
+        ttk.Label(reconnect_frame, text="Max retries:").pack(side=tk.LEFT, padx=(20, 5))
+        ttk.Spinbox(reconnect_frame, textvariable=self.reconnect_retries_var, from_=1, to=50, width=5).pack(
+            side=tk.LEFT)
 
+    def measure_link(self):
+        """Measure the link to the form's server (or gateway) on a worker and show the tier it maps to"""
+        settings = self.get_current_settings()
+        if not settings['server'].strip() and not settings['gateway'].strip():
+            messagebox.showerror("Error", "Please enter a server hostname or IP address")
+            return
+        self.link_label.config(text="Measuring...", foreground="blue")
+        self.prober.measure(settings, self.links, self.on_link_measured)
+
+    def on_link_measured(self, quality):
+        """Called on the Tk thread with a finished link measurement"""
+        self.link_label.config(text=quality.describe(), foreground="green" if quality.ok else "red")
+
+    def create_expert_tab(self, frame):
+        """Create the expert settings tab"""
         # FreeRDP executable
         exe_frame = ttk.LabelFrame(frame, text="FreeRDP Executable", padding=10)
         exe_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -278,6 +685,9 @@ class FreeRDPGUI:
         ttk.Entry(path_frame, textvariable=self.freerdp_path_var, width=50).pack(side=tk.LEFT, padx=(5, 5))
         ttk.Button(path_frame, text="Browse", command=self.browse_freerdp).pack(side=tk.LEFT)
 
+        self.freerdp_version_label = ttk.Label(exe_frame, textvariable=self.freerdp_version_var)
+        self.freerdp_version_label.pack(anchor=tk.W, pady=(5, 0))
+
         # Security & Protocol
         security_frame = ttk.LabelFrame(frame, text="Security & Protocol", padding=10)
         security_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -293,6 +703,8 @@ class FreeRDPGUI:
             anchor=tk.W, pady=2)
         ttk.Checkbutton(security_frame, text="Admin/Console session", variable=self.admin_session_var).pack(anchor=tk.W,
                                                                                                             pady=2)
+        ttk.Checkbutton(security_frame, text="Check server is reachable before connecting",
+                        variable=self.check_reachability_var).pack(anchor=tk.W, pady=2)
 
         # Advanced Graphics
         graphics_frame = ttk.LabelFrame(frame, text="Advanced Graphics", padding=10)
@@ -305,6 +717,21 @@ class FreeRDPGUI:
         gdi_combo['values'] = ("", "sw", "hw")
         gdi_combo.pack(side=tk.LEFT, padx=(5, 0))
 
+        codec_frame = ttk.Frame(graphics_frame)
+        codec_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(codec_frame, text="Codec:").pack(side=tk.LEFT)
+        codec_combo = ttk.Combobox(codec_frame, textvariable=self.codec_var, width=15, state="readonly")
+        codec_combo['values'] = tuple(value for value, label in CODECS)
+        codec_combo.pack(side=tk.LEFT, padx=(5, 5))
+        codec_label = ttk.Label(codec_frame, foreground="gray")
+        codec_label.pack(side=tk.LEFT)
+
+        def show_codec(*args):
+            codec_label.config(text=dict(CODECS).get(self.codec_var.get(), ""))
+
+        self.codec_var.trace_add("write", show_codec)
+        show_codec()
+
         ttk.Checkbutton(graphics_frame, text="Enable RemoteFX", variable=self.remotefx_var).pack(anchor=tk.W, pady=2)
         ttk.Checkbutton(graphics_frame, text="Multi-monitor support", variable=self.multimon_var).pack(anchor=tk.W,
                                                                                                        pady=2)
@@ -316,6 +743,24 @@ class FreeRDPGUI:
         ttk.Label(custom_frame, text="Additional Parameters:").pack(anchor=tk.W)
         ttk.Entry(custom_frame, textvariable=self.custom_params_var, width=60).pack(fill=tk.X, pady=(5, 0))
 
+        # Diagnostics
+        metrics_frame = ttk.LabelFrame(frame, text="Diagnostics", padding=10)
+        metrics_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Checkbutton(metrics_frame, text=f"Record action timings to {METRICS_FILE.name}",
+                        variable=self.metrics_var).pack(anchor=tk.W, pady=2)
+        ttk.Checkbutton(metrics_frame, text="Profile each action (cProfile)", variable=self.metrics_profile_var).pack(
+            side=tk.LEFT, padx=(20, 0))
+        ttk.Checkbutton(metrics_frame, text="Track memory (tracemalloc)", variable=self.metrics_memory_var).pack(
+            side=tk.LEFT, padx=(10, 0))
+
+    def toggle_metrics(self):
+        """Start or stop recording action metrics with the profiling chosen in the Expert tab"""
+        if self.metrics_var.get():
+            self.metrics.enable(self.metrics_profile_var.get(), self.metrics_memory_var.get())
+        else:
+            self.metrics.disable()
+
     def create_bottom_buttons(self):
         """Create the bottom button frame"""
         button_frame = ttk.Frame(self.root)
@@ -329,65 +774,31 @@ class FreeRDPGUI:
         self.status_label.pack(side=tk.LEFT)
 
     def find_freerdp(self):
-        """Try to find FreeRDP executable automatically (cross-platform)"""
-        # Platform-specific executable names and paths
-        if sys.platform == "win32":
-            exe_names = ["wfreerdp.exe", "xfreerdp.exe", "freerdp.exe"]
-            common_paths = [
-                "./wfreerdp.exe",
-                "./xfreerdp.exe",
-                "C:\\Program Files\\FreeRDP\\wfreerdp.exe",
-                "C:\\Program Files (x86)\\FreeRDP\\wfreerdp.exe",
-                "C:\\Program Files\\FreeRDP\\xfreerdp.exe",
-                "C:\\Program Files (x86)\\FreeRDP\\xfreerdp.exe",
-                "C:\\Program Files\\wfreerdp\\wfreerdp.exe"
-            ]
-        else:
-            # Linux/Mac - xfreerdp is most common
-            exe_names = ["xfreerdp", "freerdp", "wfreerdp"]
-            common_paths = [
-                "/usr/bin/xfreerdp",
-                "/usr/local/bin/xfreerdp",
-                "/usr/bin/freerdp",
-                "/usr/local/bin/freerdp",
-                "/opt/freerdp/bin/xfreerdp",
-                "/snap/bin/freerdp"  # Snap packages
-            ]
-
-        # Check common paths first
-        for path in common_paths:
-            if os.path.exists(path):
-                self.freerdp_path_var.set(path)
-                return
-
-        # Check PATH for any of the executable names
-        for exe_name in exe_names:
-            found_path = self.which(exe_name)
-            if found_path:
-                self.freerdp_path_var.set(found_path)
-                return
-
-    def which(self, program):
-        """Find executable in PATH (cross-platform)"""
-
-        def is_exe(fpath):
-            return os.path.isfile(fpath) and os.access(fpath, os.X_OK)
-
-        fpath, fname = os.path.split(program)
-        if fpath:
-            if is_exe(program):
-                return program
-        else:
-            for path in os.environ["PATH"].split(os.pathsep):
-                exe_file = os.path.join(path, program)
-                if is_exe(exe_file):
-                    return exe_file
-                # Also check with .exe extension on Windows
-                if sys.platform == "win32":
-                    exe_file_with_ext = exe_file + ".exe"
-                    if is_exe(exe_file_with_ext):
-                        return exe_file_with_ext
-        return None
+        """Find the FreeRDP executable, walking the filesystem only when the cache is stale"""
+        found_path = self.discovery.find()
+        if found_path:
+            self.freerdp_path_var.set(found_path)
+
+    def get_freerdp_info(self, path):
+        """Return probed version and options for path, probing in the background on first use"""
+        info = self.discovery.cached_probe(path)
+        if info:
+            self.freerdp_version_var.set(f"Version: {info.describe()}")
+        elif path and path not in self.probing and file_mtime(path) is not None:
+            self.probing.add(path)
+            self.freerdp_version_var.set("Version: probing...")
+            threading.Thread(target=self.probe_freerdp, args=(path,), daemon=True).start()
+        return info
+
+    def probe_freerdp(self, path):
+        """Worker thread: run the version/help probe and report back to the Tk thread"""
+        info = self.discovery.probe(path)
+        self.call_in_ui(self.on_freerdp_probed, info)
+
+    def on_freerdp_probed(self, info):
+        self.probing.discard(info.path)
+        if info.path == self.freerdp_path_var.get().strip():
+            self.freerdp_version_var.set(f"Version: {info.describe()}")
 
     def browse_freerdp(self):
         """Browse for FreeRDP executable (cross-platform)"""
@@ -405,6 +816,7 @@ class FreeRDPGUI:
         filename = filedialog.askopenfilename(title=title, filetypes=filetypes)
         if filename:
             self.freerdp_path_var.set(filename)
+            self.get_freerdp_info(filename)
 
     def browse_drive(self):
         """Browse for drive/folder to redirect"""
@@ -413,111 +825,78 @@ class FreeRDPGUI:
             self.drive_redirect_var.set(folder)
 
     def load_connections(self):
-        """Load saved connections from file"""
-        try:
-            if self.config_file.exists():
-                with open(self.config_file, 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"Error loading connections: {e}")
-        return {}
-
-    def save_connections(self):
-        """Save connections to file"""
+        """Open the saved connections store (profiles are decoded lazily), exiting if it cannot be opened"""
         try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.connections, f, indent=2)
+            return ConnectionStore(self.config_file, legacy_json=self.legacy_config_file)
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to save connections: {e}")
+            # An empty stand-in would look like lost connections, and anything saved to it would be discarded
+            messagebox.showerror("Error", f"Cannot open the saved connections in {self.config_file}: {e}\n\n"
+                                          "Fix or move the file, then start the FreeRDP GUI again.")
+            self.root.destroy()
+            sys.exit(1)
 
     def update_connection_list(self):
-        """Update the connection listbox"""
-        self.connection_listbox.delete(0, tk.END)
-        for name, conn in self.connections.items():
-            server = conn.get('server', 'No server')
-            self.connection_listbox.insert(tk.END, f"{name} ({server})")
+        """Rebuild the connection list from the profile index"""
+        if not self.connection_list:
+            # Not built yet; the Connections tab fills it from the index when first shown
+            return
+        self.connection_list.set_rows(record.id for record in self.connections.index.records())
+        self.filter_connection_list()
+
+    def filter_connection_list(self):
+        """Narrow the connection list to profiles matching the search box"""
+        if not self.connection_list:
+            return
+        query = self.search_var.get().strip()
+        self.connection_list.set_filter(self.connections.search(query) if query else None)
+
+    def connection_row_values(self, profile_id):
+        """Return the column values shown for a profile in the connection list"""
+        record = self.connections.index.by_id(profile_id)
+        last_used = time.strftime("%Y-%m-%d %H:%M", time.localtime(record.last_used)) if record.last_used else ""
+        status = REACHABILITY_BADGES[self.reachability[profile_id]] if profile_id in self.reachability else ""
+        return record.name, record.server or "No server", record.username, last_used, status
+
+    def connection_sort_value(self, profile_id, column):
+        """Return the sort key of a profile for a connection list column"""
+        record = self.connections.index.by_id(profile_id)
+        if column == "last_used":
+            return record.last_used or 0
+        if column == "status":
+            return REACHABILITY_ORDER[self.reachability[profile_id]] if profile_id in self.reachability else 3
+        return getattr(record, column).lower()
+
+    def selected_connections(self):
+        """Return the profile records selected in the connection list"""
+        return [self.connections.index.by_id(profile_id) for profile_id in self.connection_list.selection()]
 
     def on_connection_select(self, event):
         """Handle connection selection"""
-        selection = event.widget.curselection()
+        selection = self.selected_connections()
         if selection:
             # Enable buttons
             self.load_btn.config(state=tk.NORMAL)
             self.delete_btn.config(state=tk.NORMAL)
             self.rename_btn.config(state=tk.NORMAL)
+            self.connect_selected_btn.config(state=tk.NORMAL)
 
             # Set connection name
-            conn_name = list(self.connections.keys())[selection[0]]
-            self.connection_name_var.set(conn_name)
+            self.connection_name_var.set(selection[0].name)
         else:
             # Disable buttons
             self.load_btn.config(state=tk.DISABLED)
             self.delete_btn.config(state=tk.DISABLED)
             self.rename_btn.config(state=tk.DISABLED)
+            self.connect_selected_btn.config(state=tk.DISABLED)
 
     def get_current_settings(self):
         """Get all current form settings as a dictionary"""
-        return {
-            'server': self.server_var.get(),
-            'port': self.port_var.get(),
-            'username': self.username_var.get(),
-            'domain': self.domain_var.get(),
-            'password': self.password_var.get(),
-            'width': self.width_var.get(),
-            'height': self.height_var.get(),
-            'fullscreen': self.fullscreen_var.get(),
-            'color_depth': self.color_depth_var.get(),
-            'clipboard': self.clipboard_var.get(),
-            'drive_redirect': self.drive_redirect_var.get(),
-            'printers': self.printers_var.get(),
-            'microphone': self.microphone_var.get(),
-            'compression': self.compression_var.get(),
-            'fonts': self.fonts_var.get(),
-            'aero': self.aero_var.get(),
-            'themes': self.themes_var.get(),
-            'wallpaper': self.wallpaper_var.get(),
-            'gateway': self.gateway_var.get(),
-            'gateway_user': self.gateway_user_var.get(),
-            'wfreerdp_path': self.freerdp_path_var.get(),
-            'security': self.security_var.get(),
-            'cert_ignore': self.cert_ignore_var.get(),
-            'admin_session': self.admin_session_var.get(),
-            'gdi_mode': self.gdi_mode_var.get(),
-            'remotefx': self.remotefx_var.get(),
-            'multimon': self.multimon_var.get(),
-            'custom_params': self.custom_params_var.get(),
-        }
+        return {key: var.get() for key, var in self.settings_vars.items()}
 
     def load_settings(self, settings):
         """Load settings into the form"""
-        self.server_var.set(settings.get('server', ''))
-        self.port_var.set(settings.get('port', '3389'))
-        self.username_var.set(settings.get('username', ''))
-        self.domain_var.set(settings.get('domain', ''))
-        self.password_var.set(settings.get('password', ''))
-        self.width_var.set(settings.get('width', '1920'))
-        self.height_var.set(settings.get('height', '1080'))
-        self.fullscreen_var.set(settings.get('fullscreen', False))
-        self.color_depth_var.set(settings.get('color_depth', '32'))
-        self.clipboard_var.set(settings.get('clipboard', False))
-        self.drive_redirect_var.set(settings.get('drive_redirect', ''))
-        self.printers_var.set(settings.get('printers', False))
-        self.microphone_var.set(settings.get('microphone', False))
-        self.compression_var.set(settings.get('compression', False))
-        self.fonts_var.set(settings.get('fonts', False))
-        self.aero_var.set(settings.get('aero', True))
-        self.themes_var.set(settings.get('themes', True))
-        self.wallpaper_var.set(settings.get('wallpaper', True))
-        self.gateway_var.set(settings.get('gateway', ''))
-        self.gateway_user_var.set(settings.get('gateway_user', ''))
-        self.freerdp_path_var.set(settings.get('wfreerdp_path', ''))
-        self.security_var.set(settings.get('security', ''))
-        self.cert_ignore_var.set(settings.get('cert_ignore', False))
-        self.admin_session_var.set(settings.get('admin_session', False))
-        self.gdi_mode_var.set(settings.get('gdi_mode', ''))
-        self.remotefx_var.set(settings.get('remotefx', False))
-        self.multimon_var.set(settings.get('multimon', False))
-        self.custom_params_var.set(settings.get('custom_params', ''))
+        for key, var in self.settings_vars.items():
+            var.set(settings.get(key, DEFAULT_SETTINGS[key]))
 
     def save_connection(self):
         """Save current settings as a new connection"""
@@ -535,54 +914,324 @@ class FreeRDPGUI:
             if not messagebox.askyesno("Confirm", f"Connection '{name}' already exists. Overwrite?"):
                 return
 
-        self.connections[name] = self.get_current_settings()
-        self.save_connections()
-        self.update_connection_list()
+        settings = self.secure_password(self.get_current_settings())
+        if settings is None:
+            return
+
+        is_new = name not in self.connections
+        old_password_id = '' if is_new else self.connections[name]['password_id']
+        try:
+            record = self.connections.put(name, settings, template=self.template_var.get() or None)
+        except sqlite3.Error as e:
+            messagebox.showerror("Error", f"Failed to save connections: {e}")
+            return
+        if old_password_id != settings['password_id']:
+            self.release_password(old_password_id)
+        if is_new:
+            self.connection_list.insert(record.id)
+        else:
+            self.connection_list.refresh_row(record.id)
+        if self.search_var.get().strip():
+            self.filter_connection_list()
         self.status_label.config(text=f"Connection '{name}' saved", foreground="green")
 
     def load_connection(self):
         """Load selected connection"""
-        selection = self.connection_listbox.curselection()
+        selection = self.selected_connections()
         if not selection:
             messagebox.showerror("Error", "Please select a connection to load")
             return
 
-        conn_name = list(self.connections.keys())[selection[0]]
+        conn_name = selection[0].name
         settings = self.connections[conn_name]
         self.load_settings(settings)
+        self.template_var.set(selection[0].template or "")
         self.notebook.select(0)  # Switch to Basic tab
         self.status_label.config(text=f"Connection '{conn_name}' loaded", foreground="green")
 
+    def load_template(self):
+        """Load the selected template's settings into the form for editing"""
+        template = self.template_var.get()
+        if not template:
+            messagebox.showerror("Error", "Please select a template to load")
+            return
+
+        self.load_settings(self.connections.base_settings(template))
+        self.status_label.config(text=f"Template '{template}' loaded", foreground="green")
+
+    def unlock_vault(self):
+        """Make sure the password vault is unlocked, asking for its master password (or a new one)"""
+        if self.vault.is_unlocked():
+            return True
+        if not vault_available():
+            messagebox.showerror("Error", "Saved passwords need the 'cryptography' package.\n\n"
+                                          "Install it with: pip install cryptography")
+            return False
+
+        try:
+            if self.vault.exists():
+                master = simpledialog.askstring("Unlock Password Vault", "Master password:", show="*")
+                if not master:
+                    return False
+                self.vault.unlock(master)
+            else:
+                master = simpledialog.askstring("Create Password Vault",
+                                                "Choose a master password for saved passwords:", show="*")
+                if not master:
+                    return False
+                if simpledialog.askstring("Create Password Vault", "Repeat the master password:", show="*") != master:
+                    messagebox.showerror("Error", "The master passwords do not match")
+                    return False
+                self.vault.create(master)
+        except (VaultError, OSError) as e:
+            messagebox.showerror("Error", str(e))
+            return False
+        self.migrate_plaintext_passwords()
+        return True
+
+    def lock_vault(self):
+        self.vault.lock()
+        self.status_label.config(text="Password vault locked", foreground="green")
+
+    def migrate_plaintext_passwords(self):
+        """Move passwords saved in plain text by older versions into the unlocked vault"""
+        names = self.connections.plaintext_passwords()
+        if not names:
+            return
+        try:
+            settings = [dict(self.connections[name]) for name in names]
+            password_ids = self.vault.store_many([profile['password'] for profile in settings])
+            self.connections.put_many((name, dict(profile, password='', password_id=password_id))
+                                      for name, profile, password_id in zip(names, settings, password_ids))
+        except (VaultError, OSError, sqlite3.Error) as e:
+            print(f"Error moving saved passwords into the vault: {e}")
+            return
+        self.status_label.config(text=f"Moved {len(names)} saved passwords into the vault", foreground="green")
+
+    def secure_password(self, settings):
+        """Return settings to save with a typed password moved into the vault (None if cancelled)"""
+        if not settings['password']:
+            return settings
+        if not self.unlock_vault():
+            if messagebox.askyesno("Confirm", "The password can only be saved in the password vault. "
+                                              "Save without the password?"):
+                return dict(settings, password='')
+            return None
+        try:
+            password_id = self.vault.store(settings['password'])
+        except (VaultError, OSError) as e:
+            messagebox.showerror("Error", f"Failed to save the password: {e}")
+            return None
+        self.password_id_var.set(password_id)
+        return dict(settings, password='', password_id=password_id)
+
+    def release_password(self, password_id):
+        """Delete a vault entry once no saved profile or template refers to it"""
+        if not password_id or self.connections.uses_password(password_id):
+            return
+        try:
+            self.vault.delete(password_id)
+        except (VaultError, OSError) as e:
+            print(f"Error deleting saved password: {e}")
+
+    def forget_password(self):
+        """Drop the form's saved password; a saved profile still using it lets go when saved again"""
+        password_id = self.password_id_var.get()
+        self.password_id_var.set("")
+        self.release_password(password_id)
+
+    def connection_password(self, settings):
+        """Return (ok, password) to send FreeRDP for settings, unlocking the vault if needed"""
+        if settings.get('password_id') and not settings.get('password') and not self.unlock_vault():
+            return False, None
+        try:
+            return True, profile_password(settings, self.vault)
+        except VaultError as e:
+            messagebox.showerror("Error", str(e))
+            return False, None
+
+    def save_template(self):
+        """Save the form as a template; profiles inheriting from it pick up the changes at once"""
+        current = self.template_var.get()
+        name = simpledialog.askstring("Save Template", "Template name:", initialvalue=current)
+        if not name or not name.strip():
+            return
+        name = name.strip()
+
+        if name in self.connections.templates:
+            if not messagebox.askyesno("Confirm", f"Template '{name}' already exists. Overwrite it and update "
+                                                  f"every connection that inherits from it?"):
+                return
+            parent = self.connections.templates[name][0]
+        else:
+            parent = current or None
+
+        # The server is what tells connections apart, so templates never set it
+        settings = self.secure_password(dict(self.get_current_settings(), server=DEFAULT_SETTINGS['server']))
+        if settings is None:
+            return
+        existing = name in self.connections.templates
+        old_password_id = self.connections.base_settings(name)['password_id'] if existing else ''
+        try:
+            updated = self.connections.save_template(name, settings, parent)
+        except (ValueError, sqlite3.Error) as e:
+            messagebox.showerror("Error", f"Failed to save template: {e}")
+            return
+        if old_password_id != settings['password_id']:
+            self.release_password(old_password_id)
+        self.template_combo.config(values=[""] + self.connections.template_names())
+        self.template_var.set(name)
+        if updated:
+            self.update_connection_list()
+        self.status_label.config(text=f"Template '{name}' saved ({updated} connections updated)", foreground="green")
+
+    def delete_template(self):
+        """Delete the selected template if nothing inherits from it"""
+        template = self.template_var.get()
+        if not template:
+            messagebox.showerror("Error", "Please select a template to delete")
+            return
+
+        if messagebox.askyesno("Confirm", f"Delete template '{template}'?"):
+            password_id = self.connections.templates[template][1].get('password_id', '')
+            try:
+                self.connections.delete_template(template)
+            except (ValueError, sqlite3.Error) as e:
+                messagebox.showerror("Error", f"Failed to delete template: {e}")
+                return
+            self.release_password(password_id)
+            self.template_combo.config(values=[""] + self.connections.template_names())
+            self.template_var.set("")
+            self.status_label.config(text=f"Template '{template}' deleted", foreground="green")
+
+    def call_in_ui_and_wait(self, func, *args):
+        """Run func(*args) on the Tk thread and block the calling worker thread until it is done
+
+        An exception raised by func is raised again in the worker.
+        """
+        done = threading.Event()
+        failure = []
+
+        def run():
+            try:
+                func(*args)
+            except Exception as e:
+                failure.append(e)
+            finally:
+                done.set()
+
+        self.call_in_ui(run)
+        done.wait()
+        if failure:
+            raise failure[0]
+
+    def import_files(self):
+        """Import connections from chosen .rdp, CSV and Remmina files"""
+        paths = filedialog.askopenfilenames(title="Import Connections", filetypes=[
+            ("Connection files", "*.rdp *.csv *.remmina"), ("All files", "*.*")])
+        if paths:
+            self.import_connections(paths)
+
+    def import_folder(self):
+        """Import every .rdp, CSV and Remmina file under a folder"""
+        folder = filedialog.askdirectory(title="Import Connections from Folder")
+        if folder:
+            self.import_connections([folder])
+
+    def import_connections(self, paths, template=None):
+        """Stream profiles from paths into the store on a worker thread, with a progress window
+
+        Reading the saved profiles for deduplication and parsing run on the
+        worker; each batch is written on the Tk thread, which owns the
+        store, while the worker waits.
+        """
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title("Import Connections")
+        progress_window.geometry("460x120")
+        progress_label = ttk.Label(progress_window, text="Reading...")
+        progress_label.pack(fill=tk.X, padx=10, pady=10)
+
+        importer = Importer(self.connections, template=template or self.template_var.get() or None,
+                            on_progress=lambda stats: self.call_in_ui(show_progress, stats),
+                            write=self.call_in_ui_and_wait)
+
+        def show_progress(stats):
+            if progress_label.winfo_exists():
+                progress_label.config(text=stats.describe())
+
+        def finished(stats):
+            show_progress(stats)
+            if stats.imported:
+                self.update_connection_list()
+            self.status_label.config(text=f"Import finished: {stats.describe()}", foreground="green")
+            if stats.errors:
+                messagebox.showerror("Error", "Some files could not be imported:\n\n" + "\n".join(stats.errors[:20]))
+
+        def run():
+            try:
+                stats = importer.run(paths)
+            except Exception as e:
+                importer.stats.errors.append(str(e))
+                stats = importer.stats
+            self.call_in_ui(finished, stats)
+
+        button_frame = ttk.Frame(progress_window)
+        button_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        ttk.Button(button_frame, text="Cancel", command=importer.cancel).pack(side=tk.LEFT)
+        ttk.Button(button_frame, text="Close", command=progress_window.destroy).pack(side=tk.RIGHT)
+        threading.Thread(target=run, daemon=True).start()
+
+    def export_connections_csv(self):
+        """Export every connection to a CSV file"""
+        filename = filedialog.asksaveasfilename(title="Export Connections", defaultextension=".csv",
+                                                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if filename:
+            self.run_export(export_csv, filename)
+
+    def export_connections_rdp(self):
+        """Export every connection as a .rdp file into a folder"""
+        folder = filedialog.askdirectory(title="Export Connections as .rdp Files")
+        if folder:
+            self.run_export(export_rdp, folder)
+
+    def run_export(self, exporter, target):
+        try:
+            count = exporter(self.connections, target)
+        except (OSError, sqlite3.Error) as e:
+            messagebox.showerror("Error", f"Failed to export connections: {e}")
+            return
+        self.status_label.config(text=f"Exported {count} connections to {target}", foreground="green")
+
     def delete_connection(self):
         """Delete selected connection"""
-        selection = self.connection_listbox.curselection()
+        selection = self.selected_connections()
         if not selection:
             messagebox.showerror("Error", "Please select a connection to delete")
             return
 
-        conn_name = list(self.connections.keys())[selection[0]]
+        conn_name = selection[0].name
         if messagebox.askyesno("Confirm", f"Delete connection '{conn_name}'?"):
-            del self.connections[conn_name]
-            self.save_connections()
-            self.update_connection_list()
+            password_id = self.connections[conn_name]['password_id']
+            try:
+                del self.connections[conn_name]
+            except sqlite3.Error as e:
+                messagebox.showerror("Error", f"Failed to save connections: {e}")
+                return
+            self.release_password(password_id)
+            self.connection_list.delete(selection[0].id)
+            self.reachability.pop(selection[0].id, None)
+            self.on_connection_select(None)
             self.connection_name_var.set("")
             self.status_label.config(text=f"Connection '{conn_name}' deleted", foreground="green")
 
     def rename_connection(self):
         """Rename selected connection"""
-        selection = self.connection_listbox.curselection()
-        if not selection:
-            messagebox.showerror("Error", "Please select a connection to rename")
-            return
-
-    def rename_connection(self):
-        """Rename selected connection"""
-        selection = self.connection_listbox.curselection()
+        selection = self.selected_connections()
         if not selection:
             messagebox.showerror("Error", "Please select a connection to rename")
             return
 
-        old_name = list(self.connections.keys())[selection[0]]
+        old_name = selection[0].name
         new_name = simpledialog.askstring("Rename Connection", f"Enter new name for '{old_name}':",
                                           initialvalue=old_name)
 
@@ -592,12 +1241,126 @@ class FreeRDPGUI:
                 messagebox.showerror("Error", f"Connection '{new_name}' already exists")
                 return
 
-            self.connections[new_name] = self.connections.pop(old_name)
-            self.save_connections()
-            self.update_connection_list()
+            try:
+                self.connections.rename(old_name, new_name)
+            except sqlite3.Error as e:
+                messagebox.showerror("Error", f"Failed to save connections: {e}")
+                return
+            self.connection_list.refresh_row(selection[0].id)
+            if self.search_var.get().strip():
+                self.filter_connection_list()
             self.connection_name_var.set(new_name)
             self.status_label.config(text=f"Connection renamed to '{new_name}'", foreground="green")
 
+    def connect_selected(self):
+        """Launch all selected connections through the bounded batch launcher"""
+        selection = self.selected_connections()
+        if not selection:
+            messagebox.showerror("Error", "Please select one or more connections to connect")
+            return
+
+        try:
+            workers = int(self.batch_workers_var.get())
+            stagger = float(self.batch_stagger_var.get())
+        except ValueError:
+            messagebox.showerror("Error", "Parallel connects and stagger must be numbers")
+            return
+
+        compiled = []
+        errors = {}
+        default_path = self.freerdp_path_var.get()
+        for record in selection:
+            try:
+                # Reuses the argv compiled into the store unless the profile or executable changed; the fields
+                # stored with it are all a launch needs, so valid profiles are never decoded
+                cmd, fields = compile_launch(self.connections, record.name, default_path, self.get_freerdp_info,
+                                             self.display.monitors, self.links.tier)
+                compiled.append((record.name, cmd, fields))
+            except ValueError as e:
+                errors[record.name] = str(e)
+        # Unlock once up front, so decrypting each password is cheap and no launch waits for the master password
+        if any(fields['password_id'] for name, cmd, fields in compiled) and not self.unlock_vault():
+            return
+
+        jobs = []
+        for name, cmd, fields in compiled:
+            try:
+                if self.links.needs_measure(fields):
+                    # Starts with /network:auto this time; measured in the background for the next launch
+                    self.prober.measure(fields, self.links)
+                password = profile_password(fields, self.vault)
+                jobs.append((name, cmd, password))
+                self.apply_reconnect_policy(name, fields, password)
+            except (ValueError, VaultError) as e:
+                errors[name] = str(e)
+
+        launcher = BatchLauncher(self.launcher, max_workers=workers, stagger=stagger)
+        batch = {
+            "names": [name for name, cmd, password in jobs],
+            "launched": 0,
+            "failed": len(errors),
+            "total": len(selection),
+            "table": self.show_batch_progress([name for name, cmd, password in jobs] + list(errors), launcher),
+        }
+        for name, error in errors.items():
+            batch["table"].item(name, values=(name, "failed", error))
+
+        def on_progress(index, state, detail):
+            self.on_batch_progress(batch, index, state, detail)
+
+        launcher.run(jobs, on_progress=on_progress, on_launched=self.on_session_launched, on_exit=self.on_session_exit)
+        for name, cmd, password in jobs:
+            self.mark_connection_used(name)
+        self.update_batch_status(batch)
+
+    def show_batch_progress(self, names, launcher):
+        """Open a window listing per-profile batch progress and return its table"""
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title("Connect Selected")
+        progress_window.geometry("600x350")
+
+        table_frame = ttk.Frame(progress_window)
+        table_frame.pack(fill=BOTH, expand=True, padx=10, pady=10)
+
+        table = ttk.Treeview(table_frame, columns=("name", "state", "detail"), show="headings")
+        table.heading("name", text="Profile")
+        table.heading("state", text="Status")
+        table.heading("detail", text="Details")
+        table.column("name", width=150)
+        table.column("state", width=80)
+        table.column("detail", width=330)
+        table.pack(side=tk.LEFT, fill=BOTH, expand=True)
+
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=table.yview)
+        scrollbar.pack(side="right", fill=tk.Y)
+        table.config(yscrollcommand=scrollbar.set)
+
+        for name in names:
+            table.insert("", tk.END, iid=name, values=(name, "queued", ""))
+
+        button_frame = ttk.Frame(progress_window)
+        button_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        ttk.Button(button_frame, text="Cancel Remaining", command=launcher.cancel).pack(side=tk.LEFT)
+        ttk.Button(button_frame, text="Close", command=progress_window.destroy).pack(side=tk.RIGHT)
+        return table
+
+    def on_batch_progress(self, batch, index, state, detail):
+        """Called on the Tk thread as each batch job changes state"""
+        name = batch["names"][index]
+        if state in ("launched", "failed"):
+            batch[state] += 1
+        if batch["table"].winfo_exists():
+            batch["table"].item(name, values=(name, state, detail.splitlines()[-1] if detail else ""))
+        self.update_batch_status(batch)
+
+    def update_batch_status(self, batch):
+        """Summarize batch progress in the status bar"""
+        text = f"Batch: {batch['launched']}/{batch['total']} launched, {batch['failed']} failed"
+        if batch["launched"] + batch["failed"] < batch["total"]:
+            self.status_label.config(text=text, foreground="blue")
+        else:
+            self.status_label.config(text=text, foreground="red" if batch["failed"] else "green")
+
     def quick_connect(self):
         """Quick connect using minimal settings"""
         server = self.quick_server_var.get().strip()
@@ -637,127 +1400,29 @@ class FreeRDPGUI:
         self.connect()
 
     def build_command(self):
-        """Build the FreeRDP command line (cross-platform)"""
-        freerdp_path = self.freerdp_path_var.get().strip()
-        server = self.server_var.get().strip()
-
-        if not freerdp_path:
-            messagebox.showerror("Error", "Please specify the path to FreeRDP executable")
-            return None
-
-        if not server:
-            messagebox.showerror("Error", "Please enter a server hostname or IP address")
+        """Build the FreeRDP command line from the form (cross-platform)"""
+        settings = self.get_current_settings()
+        try:
+            info = self.get_freerdp_info(settings['wfreerdp_path'].strip())
+            monitors = self.display.monitors() if settings['display_layout'] else None
+            settings['network_tuning'] = self.links.tier(settings)
+            return build_command(settings, info, monitors)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
             return None
 
-        # Start building command
-        cmd = [freerdp_path]
-
-        # Basic connection
-        port = self.port_var.get().strip()
-        if port and port != "3389":
-            cmd.append(f"/v:{server}:{port}")
-        else:
-            cmd.append(f"/v:{server}")
-
-        # Authentication
-        username = self.username_var.get().strip()
-        domain = self.domain_var.get().strip()
-        password = self.password_var.get().strip()
-
-        if username:
-            if domain:
-                cmd.append(f"/u:{domain}\\{username}")
-            else:
-                cmd.append(f"/u:{username}")
-        elif domain:
-            cmd.append(f"/d:{domain}")
-
-        if password:
-            cmd.append(f"/p:{password}")
-
-        # Display settings
-        if self.fullscreen_var.get():
-            cmd.append("/f")
-        else:
-            width = self.width_var.get().strip()
-            height = self.height_var.get().strip()
-            if width and height:
-                cmd.append(f"/size:{width}x{height}")
-
-        color_depth = self.color_depth_var.get().strip()
-        if color_depth:
-            cmd.append(f"/bpp:{color_depth}")
-
-        # Advanced options
-        if self.clipboard_var.get():
-            cmd.append("+clipboard")
-
-        drive_redirect = self.drive_redirect_var.get().strip()
-        if drive_redirect:
-            cmd.append(f"/drive:share,{drive_redirect}")
-
-        if self.microphone_var.get():
-            cmd.append("/mic")
-
-        if self.compression_var.get():
-            cmd.append("+compression")
-
-        if self.fonts_var.get():
-            cmd.append("+fonts")
-
-        if self.aero_var.get():
-            cmd.append("+aero")
-        else:
-            cmd.append("-aero")
-
-        if not self.themes_var.get():
-            cmd.append("-themes")
-
-        if not self.wallpaper_var.get():
-            cmd.append("-wallpaper")
-
-        # Gateway
-        gateway = self.gateway_var.get().strip()
-        if gateway:
-            cmd.append(f"/g:{gateway}")
-            gateway_user = self.gateway_user_var.get().strip()
-            if gateway_user:
-                cmd.append(f"/gu:{gateway_user}")
-
-        # Expert options
-        security = self.security_var.get().strip()
-        if security:
-            cmd.append(f"/sec:{security}")
-
-        if self.cert_ignore_var.get():
-            cmd.append("/cert-ignore")
-
-        if self.admin_session_var.get():
-            cmd.append("/admin")
-
-        gdi_mode = self.gdi_mode_var.get().strip()
-        if gdi_mode:
-            cmd.append(f"/gdi:{gdi_mode}")
-
-        if self.remotefx_var.get():
-            cmd.append("/rfx")
-
-        if self.multimon_var.get():
-            cmd.append("/multimon")
-
-        # Custom parameters
-        custom_params = self.custom_params_var.get().strip()
-        if custom_params:
-            # Split custom parameters and add them
-            cmd.extend(custom_params.split())
-
-        return cmd
+    def explain_codec(self):
+        """Return the codec the form's settings select and why"""
+        settings = self.get_current_settings()
+        settings['network_tuning'] = self.links.tier(settings)
+        return choose_codec(settings, self.get_freerdp_info(settings['wfreerdp_path'].strip()))
 
     def show_command(self):
         """Display the generated command"""
         cmd = self.build_command()
         if cmd:
-            command_str = " ".join(f'"{arg}"' if " " in arg else arg for arg in cmd)
+            command_str = format_command(cmd)
+            codec = self.explain_codec()
 
             # Create a new window to show the command
             cmd_window = tk.Toplevel(self.root)
@@ -782,6 +1447,9 @@ class FreeRDPGUI:
             text_widget.insert(tk.END, command_str)
             text_widget.config(state=tk.DISABLED)
 
+            codec_text = f"Graphics: {codec.codec or 'default'} ({codec.describe()})"
+            ttk.Label(cmd_window, text=codec_text, wraplength=760, foreground="gray").pack(anchor=tk.W, padx=10)
+
             # Copy button
             button_frame = ttk.Frame(cmd_window)
             button_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
@@ -797,59 +1465,437 @@ class FreeRDPGUI:
 
             self.status_label.config(text="Command generated successfully", foreground="green")
 
-    def connect(self):
-        """Execute the FreeRDP command"""
+    def connect(self, measured=False):
+        """Launch FreeRDP in the background and report the outcome asynchronously"""
+        timeline = {"requested": time.time()}
         cmd = self.build_command()
+        form_settings = self.get_current_settings()
+        if cmd and not measured and self.links.needs_measure(form_settings):
+            # Measure the link once (cached per host), then connect again with the tuned options, whatever the outcome
+            self.status_label.config(text=f"Measuring link to {form_settings['server']}...", foreground="blue")
+            self.prober.measure(form_settings, self.links, lambda quality: self.connect(measured=True))
+            return
         if cmd:
+            timeline["built"] = time.time()
+            # Save current settings as last used
+            self.save_last_settings()
+
+            settings = self.get_current_settings()
+            ok, password = self.connection_password(settings)
+            if not ok:
+                return
+            name = self.connection_name_var.get().strip() or self.server_var.get().strip()
+            self.apply_reconnect_policy(name, settings, password)
+            if settings['check_reachability']:
+                # Probe on a worker first so an unreachable host fails in seconds, not at FreeRDP's timeout
+                self.status_label.config(text=f"Checking {settings['server']}...", foreground="blue")
+                self.prober.probe(settings, lambda results: self.on_precheck(cmd, name, timeline, results, password))
+            else:
+                self.start_connection(cmd, name, timeline, password)
+
+    def connect_profile(self, name, check=True):
+        """Launch one saved profile as Connect would, without loading it into the form"""
+        timeline = {"requested": time.time()}
+        settings = complete_settings(self.connections[name])
+        if settings['password_id'] and not self.unlock_vault():
+            return
+        try:
+            cmd = compile_profile(self.connections, name, self.freerdp_path_var.get(), self.get_freerdp_info,
+                                  self.display.monitors, self.links.tier)
+            password = profile_password(settings, self.vault)
+        except (ValueError, VaultError) as e:
+            messagebox.showerror("Error", f"Cannot connect '{name}': {e}")
+            return
+        timeline["built"] = time.time()
+        if self.links.needs_measure(settings):
+            # Starts with /network:auto this time; measured in the background for the next launch
+            self.prober.measure(settings, self.links)
+        self.apply_reconnect_policy(name, settings, password)
+        if check and settings['check_reachability']:
+            self.status_label.config(text=f"Checking {settings['server']}...", foreground="blue")
+            self.prober.probe(settings, lambda results: self.on_precheck(cmd, name, timeline, results, password))
+        else:
+            self.start_connection(cmd, name, timeline, password)
+
+    def on_precheck(self, cmd, name, timeline, results, password=None):
+        """Called on the Tk thread with the pre-connect reachability results"""
+        timeline["checked"] = time.time()
+        failure = first_failure(results)
+        record = self.connections.index.get(name)
+        if record:
+            self.set_reachability(record.id, failure is None)
+        if failure:
+            self.record_attempt(name, timeline, "unreachable", detail=failure.describe())
+            self.show_connection_error(f"{failure.describe()}.\n\nFreeRDP was not started. "
+                                       f"The check can be turned off in the Expert tab.")
+            self.status_label.config(text=f"{failure.role} unreachable", foreground="red")
+        else:
+            self.start_connection(cmd, name, timeline, password)
+
+    def start_connection(self, cmd, name, timeline, password=None):
+        """Start the FreeRDP process once; the launcher watches its output on worker threads"""
+        try:
+            self.status_label.config(text="Connecting...", foreground="blue")
+            self.launch_session(cmd, name, timeline, password)
+            self.mark_connection_used(name)
+
+        except FileNotFoundError:
+            self.record_attempt(name, timeline, "error", detail=f"FreeRDP executable not found: {cmd[0]}")
+            error_msg = f"FreeRDP executable not found: {cmd[0]}\n\nPlease check the Expert tab and verify the executable path."
+            self.show_connection_error(error_msg)
+            self.status_label.config(text="Executable not found", foreground="red")
+        except Exception as e:
+            self.record_attempt(name, timeline, "error", detail=str(e))
+            self.show_connection_error(f"Failed to launch connection: {str(e)}")
+            self.status_label.config(text="Connection failed", foreground="red")
+
+    def record_attempt(self, name, timeline, outcome, returncode=None, detail=""):
+        """Append one launch timeline to the telemetry log, returning the record's ID"""
+        record = self.connections.index.get(name)
+        server, gateway = (record.server, record.gateway) if record else (name, "")
+        telemetry_record = make_record(name, timeline, outcome, server, gateway, returncode, detail)
+        self.telemetry.append(telemetry_record)
+        if self.history_tree:
+            self.update_history()
+        return telemetry_record['id']
+
+    def update_history(self):
+        """Refill the History tab from the telemetry log"""
+        self.history_tree.delete(*self.history_tree.get_children())
+        for stats in self.telemetry.summary():
+            data = stats.to_dict()
+            data['failure_rate'] = f"{data['failure_rate'] * 100:.0f}"
+            self.history_tree.insert("", tk.END, values=[data[column] if data[column] is not None else ""
+                                                         for column in self.history_tree["columns"]])
+
+    def export_history(self, file_format):
+        """Save the connection history as CSV (per-profile summary) or JSON (summary and every launch)"""
+        filename = filedialog.asksaveasfilename(title="Export Connection History", defaultextension=f".{file_format}",
+                                                filetypes=[(f"{file_format.upper()} files", f"*.{file_format}"),
+                                                           ("All files", "*")])
+        if not filename:
+            return
+        try:
+            if file_format == "csv":
+                self.telemetry.export_csv(filename)
+            else:
+                self.telemetry.export_json(filename)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to export history: {e}")
+            return
+        self.status_label.config(text=f"History exported to {filename}", foreground="green")
+
+    def check_connections(self):
+        """Probe every saved connection concurrently and badge the list with the results"""
+        records = self.connections.index.records()
+        if not records:
+            return
+        jobs = [(record.id, complete_settings(self.connections[record.name])) for record in records]
+        for record in records:
+            self.reachability[record.id] = None
+        self.update_connection_list()
+        self.check_counts = {"up": 0, "down": 0, "pending": len(jobs)}
+        self.status_label.config(text=f"Checking {len(jobs)} connection(s)...", foreground="blue")
+        self.prober.probe_many(jobs, self.on_connection_checked)
+
+    def on_connection_checked(self, profile_id, results):
+        """Called on the Tk thread as each connection check finishes"""
+        reachable = first_failure(results) is None
+        self.set_reachability(profile_id, reachable)
+        counts = self.check_counts
+        counts["up" if reachable else "down"] += 1
+        counts["pending"] -= 1
+        if not counts["pending"]:
+            self.status_label.config(text=f"Checked connections: {counts['up']} up, {counts['down']} down",
+                                     foreground="red" if counts["down"] else "green")
+
+    def set_reachability(self, profile_id, reachable):
+        """Record a reachability result and refresh the profile's badge"""
+        if self.connections.index.by_id(profile_id) is None:
+            return
+        self.reachability[profile_id] = reachable
+        if self.connection_list:
+            self.connection_list.refresh_row(profile_id)
+
+    def mark_connection_used(self, name):
+        """Update the Last Used column of a saved connection"""
+        if name not in self.connections:
+            return
+        try:
+            record = self.connections.touch(name)
+        except sqlite3.Error as e:
+            print(f"Error saving last used time: {e}")
+            return
+        if self.connection_list:
+            self.connection_list.refresh_row(record.id)
+
+    def launch_session(self, cmd, name, timeline=None, password=None):
+        """Start a FreeRDP session and track it in the Sessions tab"""
+        session = self.launcher.launch(cmd, name=name, on_launched=self.on_session_launched,
+                                       on_failed=self.on_session_failed, on_exit=self.on_session_exit,
+                                       timeline=timeline or {"requested": time.time()}, password=password)
+        self.update_session_row(session)
+        return session
+
+    def apply_reconnect_policy(self, name, settings, password=None):
+        """Opt a profile in or out of automatic reconnects and remember how to get its password again"""
+        # Supervised profiles keep the password they launched with, so an unattended reconnect never needs the vault
+        kept = password if settings['auto_reconnect'] else settings['password']
+        self.credentials[name] = {'password': kept or '', 'password_id': settings['password_id']}
+        if settings['auto_reconnect']:
             try:
-                self.status_label.config(text="Connecting...", foreground="blue")
-                self.root.update()
-
-                # Save current settings as last used
-                self.save_last_settings()
-
-                # Execute the command and capture output
-                if sys.platform == "win32":
-                    # On Windows, capture stderr to get error details
-                    result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-                    if result.returncode != 0:
-                        # Connection failed, show error details
-                        error_msg = result.stderr.strip() if result.stderr else result.stdout.strip()
-                        if not error_msg:
-                            error_msg = f"FreeRDP exited with code {result.returncode}"
-
-                        self.show_connection_error(error_msg)
-                        self.status_label.config(text="Connection failed", foreground="red")
-                    else:
-                        # Success case - launch in background for ongoing connection
-                        subprocess.Popen(cmd, creationflags=subprocess.CREATE_NEW_CONSOLE)
-                        self.status_label.config(text="Connection launched", foreground="green")
-                else:
-                    # On Linux/Mac, also capture output
-                    result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-                    if result.returncode != 0:
-                        error_msg = result.stderr.strip() if result.stderr else result.stdout.strip()
-                        if not error_msg:
-                            error_msg = f"FreeRDP exited with code {result.returncode}"
-
-                        self.show_connection_error(error_msg)
-                        self.status_label.config(text="Connection failed", foreground="red")
-                    else:
-                        # Launch in background for ongoing connection
-                        subprocess.Popen(cmd)
-                        self.status_label.config(text="Connection launched", foreground="green")
-
-            except subprocess.TimeoutExpired:
-                # If it takes longer than 10 seconds, assume it's connecting successfully
-                subprocess.Popen(cmd, creationflags=subprocess.CREATE_NEW_CONSOLE if sys.platform == "win32" else 0)
-                self.status_label.config(text="Connection launched", foreground="green")
-            except FileNotFoundError:
-                error_msg = f"FreeRDP executable not found: {cmd[0]}\n\nPlease check the Expert tab and verify the executable path."
-                self.show_connection_error(error_msg)
-                self.status_label.config(text="Executable not found", foreground="red")
-            except Exception as e:
-                self.show_connection_error(f"Failed to launch connection: {str(e)}")
-                self.status_label.config(text="Connection failed", foreground="red")
+                retries = int(settings['reconnect_retries'])
+            except ValueError:
+                retries = RECONNECT_RETRIES
+            self.supervisor.set_policy(name, retries)
+        else:
+            self.supervisor.clear_policy(name)
+
+    def relaunch_session(self, cmd, name):
+        """Called on the Tk thread by the reconnect supervisor to start a dropped session again"""
+        state = self.supervisor.state(name)
+        self.status_label.config(text=f"Reconnecting '{name}' (attempt {state.attempt}/{state.max_retries})...",
+                                 foreground="blue")
+        # Never prompts: nobody may be at the screen. A locked vault fails the retry (see the Sessions tab)
+        password = profile_password(self.credentials.get(name, {}), self.vault)
+        return self.launch_session(cmd, name, password=password)
+
+    def on_session_launched(self, session):
+        """Called on the Tk thread once a session survived the settle time"""
+        # Logged now so sessions still open when the window closes are counted; the end is added on exit
+        session.record_id = self.record_attempt(session.name, session.timeline, "launched")
+        self.supervisor.session_launched(session)
+        self.metrics.count("sessions_launched")
+        self.status_label.config(text=f"Connection '{session.name}' launched", foreground="green")
+
+    def on_session_failed(self, session):
+        """Called on the Tk thread when FreeRDP exits early with an error"""
+        self.metrics.count("sessions_failed")
+        if not self.supervisor.is_retrying(session.name):
+            # Failed automatic reconnects are reported in the Sessions tab instead of a popup each
+            self.show_connection_error(session.error_message())
+        self.status_label.config(text=f"Connection '{session.name}' failed", foreground="red")
+
+    def on_session_exit(self, session):
+        """Called on the Tk thread when a FreeRDP process has exited"""
+        outcome = session_outcome(session)
+        event = session.log.last_event()
+        if event:
+            detail = event.summary()
+        else:
+            detail = session.error_message().splitlines()[-1][:200] if outcome == "failed" else ""
+        if session.record_id:
+            self.telemetry.update(session.record_id, session.timeline, returncode=session.returncode, detail=detail)
+            if self.history_tree:
+                self.update_history()
+        else:
+            self.record_attempt(session.name, session.timeline, outcome, session.returncode, detail)
+        if session.launched and session.returncode and not session.stopping:
+            # A session that was up has dropped; say why when FreeRDP logged a known error
+            reason = f": {event.summary()}" if event else f" (exit code {session.returncode})"
+            self.status_label.config(text=f"Session '{session.name}' ended{reason}", foreground="red")
+        elif outcome == "exited" and not session.stopping:
+            # Closed cleanly before the settle time (e.g. a cancelled login), so neither launched nor failed
+            self.status_label.config(text=f"Connection '{session.name}' ended before connecting",
+                                     foreground="orange")
+
+        state = self.supervisor.session_exited(session)
+        if state and state.status == "waiting":
+            self.status_label.config(text=f"Session '{session.name}' dropped; {state.describe().lower()}",
+                                     foreground="orange")
+        elif state and state.status == "gave up":
+            self.status_label.config(text=f"Gave up reconnecting '{session.name}' after {state.max_retries} tries",
+                                     foreground="red")
+        self.update_session_row(session)
+        if session.id in self.pending_reconnects:
+            self.restart_session(session, self.pending_reconnects.pop(session.id))
+
+    def session_status(self, session):
+        """Describe a session for the Sessions table: running, reconnecting, or how it exited"""
+        state = self.supervisor.state(session.name)
+        if session.is_running():
+            return "Running" if session.launched else "Starting"
+        if state and state.session is session and state.status not in ("connected", "stopped"):
+            return state.describe()
+        return f"Exited ({session.returncode})"
+
+    def update_session_row(self, session):
+        """Insert or refresh one row of the Sessions table (once the tab has been built)"""
+        if self.sessions_tree is None:
+            return
+        iid = str(session.id)
+        status = self.session_status(session)
+        uptime = int(session.uptime())
+        event = session.log.last_event()
+        values = (
+            session.name,
+            session.pid,
+            time.strftime("%H:%M:%S", time.localtime(session.start_time)),
+            f"{uptime // 3600}:{uptime // 60 % 60:02d}:{uptime % 60:02d}",
+            status,
+            f"{session.rss / 1048576:.1f}" if session.rss is not None else "",
+            f"{session.cpu_percent:.1f}" if session.cpu_percent is not None else "",
+            event.summary() if event else "",
+        )
+        if self.sessions_tree.exists(iid):
+            self.sessions_tree.item(iid, values=values)
+        else:
+            self.sessions_tree.insert("", tk.END, iid=iid, values=values)
+
+    def refresh_sessions(self):
+        """Periodically sample running sessions while the Sessions tab is visible"""
+        if self.notebook.select() == str(self.sessions_frame):
+            for session in self.sessions.sessions():
+                session.sample()
+                self.update_session_row(session)
+        self.root.after(SESSION_REFRESH_MS, self.refresh_sessions)
+
+    def selected_sessions(self):
+        """Return the sessions selected in the Sessions table"""
+        sessions = [self.sessions.get(int(iid)) for iid in self.sessions_tree.selection()]
+        return [session for session in sessions if session]
+
+    def kill_sessions(self):
+        """Terminate the selected sessions and cancel their pending automatic reconnects"""
+        selected = self.selected_sessions()
+        cancelled = [session for session in selected if self.supervisor.cancel(session.name)]
+        sessions = [session for session in selected if session.is_running()]
+        if not sessions and not cancelled:
+            messagebox.showerror("Error", "Please select a running session to kill")
+            return
+        for session in sessions:
+            session.terminate()
+        for session in cancelled:
+            self.update_session_row(session)
+        self.status_label.config(text=f"Terminating {len(sessions)} session(s), cancelled {len(cancelled)} "
+                                      f"reconnect(s)", foreground="blue")
+
+    def reconnect_sessions(self):
+        """Stop the selected sessions and launch them again with the same command"""
+        sessions = self.selected_sessions()
+        if not sessions:
+            messagebox.showerror("Error", "Please select a session to reconnect")
+            return
+        for session in sessions:
+            ok, password = self.connection_password(self.credentials.get(session.name, {}))
+            if not ok:
+                return
+            if session.is_running():
+                # Relaunched by on_session_exit, so the old and new connection never overlap
+                self.pending_reconnects[session.id] = password
+                session.terminate()
+            elif not self.restart_session(session, password):
+                return
+        self.status_label.config(text=f"Reconnecting {len(sessions)} session(s)...", foreground="blue")
+
+    def restart_session(self, session, password):
+        """Launch an exited session again with the same command, returning False if that failed"""
+        try:
+            self.launch_session(session.cmd, session.name, password=password)
+        except Exception as e:
+            self.show_connection_error(f"Failed to reconnect '{session.name}': {str(e)}")
+            return False
+        return True
+
+    def clear_ended_sessions(self):
+        """Remove exited sessions from the table"""
+        for session_id in self.sessions.clear_ended():
+            self.sessions_tree.delete(str(session_id))
+
+    def toggle_session_logs(self):
+        """Start or stop saving the output of newly launched sessions to rotating files"""
+        self.launcher.log_dir = SESSION_LOG_DIR if self.session_logs_var.get() else None
+
+    def view_session_logs(self):
+        """Open a live log viewer for each selected session"""
+        sessions = self.selected_sessions()
+        if not sessions:
+            messagebox.showerror("Error", "Please select a session to view its log")
+            return
+        for session in sessions:
+            self.show_session_log(session)
+
+    def show_session_log(self, session):
+        """Tail a session's log buffer in a window, fetching only lines not shown yet"""
+        log_window = tk.Toplevel(self.root)
+        log_window.title(f"Log - {session.name} (PID {session.pid})")
+        log_window.geometry("800x500")
+
+        main_frame = ttk.Frame(log_window)
+        main_frame.pack(fill=BOTH, expand=True, padx=10, pady=10)
+
+        # Recognised errors
+        events_frame = ttk.LabelFrame(main_frame, text="Recognised Errors", padding=5)
+        events_frame.pack(fill=tk.X)
+        events_tree = ttk.Treeview(events_frame, columns=("time", "kind", "summary"), show="headings", height=4)
+        for column, heading, width in (("time", "Time", 70), ("kind", "Kind", 100), ("summary", "Summary", 560)):
+            events_tree.heading(column, text=heading)
+            events_tree.column(column, width=width, anchor=tk.W)
+        events_tree.pack(fill=tk.X)
+
+        # Output
+        text_frame = ttk.Frame(main_frame)
+        text_frame.pack(fill=BOTH, expand=True, pady=(10, 0))
+        text_widget = tk.Text(text_frame, wrap=tk.NONE, font=("TkFixedFont", 9), state=tk.DISABLED)
+        text_widget.tag_configure("ERROR", foreground="red")
+        text_widget.tag_configure("FATAL", foreground="red")
+        text_widget.tag_configure("WARN", foreground="darkorange")
+        text_widget.tag_configure("event", background="#ffecec")
+        text_widget.tag_configure("gap", foreground="gray")
+        scrollbar = ttk.Scrollbar(text_frame, orient=tk.VERTICAL, command=text_widget.yview)
+        text_widget.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill=tk.Y)
+        text_widget.pack(side=tk.LEFT, fill=BOTH, expand=True)
+
+        bottom_frame = ttk.Frame(main_frame)
+        bottom_frame.pack(fill=tk.X, pady=(10, 0))
+        follow_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(bottom_frame, text="Follow output", variable=follow_var).pack(side=tk.LEFT)
+        info_label = ttk.Label(bottom_frame, text=f"Saved to {session.log.spill_path}" if session.log.spill_path
+                               else "")
+        info_label.pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Button(bottom_frame, text="Close", command=log_window.destroy).pack(side=tk.RIGHT)
+
+        shown = {"seq": 0, "event_seq": 0}
+
+        def poll():
+            if not log_window.winfo_exists():
+                return
+            entries = session.log.since(shown["seq"])
+            if entries:
+                text_widget.config(state=tk.NORMAL)
+                if entries[0].seq > shown["seq"] + 1:
+                    text_widget.insert(tk.END, f"... {entries[0].seq - shown['seq'] - 1} older lines dropped ...\n",
+                                       "gap")
+                # Insert runs of lines sharing the same tags in one call
+                run, run_tags = [], ()
+                for entry in entries:
+                    tags = tuple(tag for tag in (entry.level if entry.level in ("WARN", "ERROR", "FATAL") else None,
+                                                 "event" if entry.event else None) if tag)
+                    if tags != run_tags and run:
+                        text_widget.insert(tk.END, "".join(run), run_tags)
+                        run = []
+                    run.append(entry.text + "\n")
+                    run_tags = tags
+                text_widget.insert(tk.END, "".join(run), run_tags)
+                shown["seq"] = entries[-1].seq
+
+                lines = int(text_widget.index("end-1c").split(".")[0])
+                if lines > LOG_VIEW_LINES:
+                    text_widget.delete("1.0", f"{lines - LOG_VIEW_LINES}.0")
+                text_widget.config(state=tk.DISABLED)
+                if follow_var.get():
+                    text_widget.see(tk.END)
+
+            for event in session.log.events_since(shown["event_seq"]):
+                events_tree.insert("", tk.END, values=(time.strftime("%H:%M:%S", time.localtime(event.time)),
+                                                       event.kind, event.summary()))
+                shown["event_seq"] = event.seq
+
+            if session.is_running() or entries:
+                log_window.after(LOG_VIEW_MS, poll)
+
+        poll()
 
     def show_connection_error(self, error_message):
         """Display connection error details in a popup window"""
@@ -913,32 +1959,90 @@ class FreeRDPGUI:
 
         ttk.Button(button_frame, text="Close", command=error_window.destroy).pack(side=tk.RIGHT)
 
+    def schedule_autosave(self, *args):
+        """Save the last used settings once the form has been left alone for AUTOSAVE_DELAY_MS"""
+        if self.autosave_job:
+            self.root.after_cancel(self.autosave_job)
+        self.autosave_job = self.root.after(AUTOSAVE_DELAY_MS, self.save_last_settings)
+
     def save_last_settings(self):
-        """Save current settings as last used"""
-        settings = self.get_current_settings()
-        try:
-            last_settings_file = Path.home() / ".freerdp_last_settings.json"
-            with open(last_settings_file, 'w') as f:
-                json.dump(settings, f, indent=2)
-        except Exception as e:
-            print(f"Error saving last settings: {e}")
+        """Hand the current settings to the background autosaver (a typed password is never written to disk)"""
+        if self.autosave_job:
+            self.root.after_cancel(self.autosave_job)
+            self.autosave_job = None
+        self.autosaver.submit(dict(self.get_current_settings(), password=''))
+
+    def control_show(self, request):
+        """Bring the window to the front (what a second start of the GUI asks for)"""
+        self.root.deiconify()
+        self.root.lift()
+        self.root.focus_force()
+        return {'pid': os.getpid()}
+
+    def control_connect(self, request):
+        """Accept a control API request to launch a saved profile; the launch is reported in the window"""
+        name = request.get('profile')
+        if name not in self.connections:
+            raise ValueError(f"no saved connection named '{name}'")
+        self.call_in_ui(self.connect_profile, name, request.get('check', True))
+        return {'profile': name}
+
+    def control_sessions(self, request):
+        """List the sessions of the Sessions tab for a control API client"""
+        return [{'id': session.id, 'name': session.name, 'pid': session.pid, 'started': session.start_time,
+                 'running': session.is_running(), 'returncode': session.returncode,
+                 'status': self.session_status(session)}
+                for session in self.sessions.sessions()]
+
+    def control_import(self, request):
+        """Import the files or folders of a control API request, with the usual progress window"""
+        paths = request.get('paths')
+        template = request.get('template')
+        if not paths or not isinstance(paths, list):
+            raise ValueError("import needs a list of paths")
+        if template and template not in self.connections.templates:
+            raise ValueError(f"no template named '{template}'")
+        self.import_connections(paths, template)
+        return {'paths': len(paths)}
+
+    def on_close(self):
+        """Save the last used settings before the window goes away"""
+        self.save_last_settings()
+        self.autosaver.close()
+        self.metrics.close()
+        self.control.close()
+        self.root.destroy()
 
     def load_last_settings(self):
         """Load last used settings"""
         try:
-            last_settings_file = Path.home() / ".freerdp_last_settings.json"
+            last_settings_file = LAST_SETTINGS_FILE
             if last_settings_file.exists():
                 with open(last_settings_file, 'r') as f:
                     settings = json.load(f)
                     self.load_settings(settings)
+            else:
+                # First run: start at the primary monitor's resolution rather than a fixed 1920x1080
+                self.use_native_size()
         except Exception as e:
             print(f"Error loading last settings: {e}")
 
 
 def main():
-    """Main function to run the application"""
+    """Main function to run the application (subcommands are dispatched before Tk is imported, above)"""
+    # A second start brings the running window to the front instead of opening another one
+    try:
+        send_request(CONTROL_FILE, "show")
+        return
+    except NotRunning:
+        pass
+    except ControlError as e:
+        print(f"Error reaching the running FreeRDP GUI: {e}")
+
+    trace = StartupTrace(enabled=bool(os.environ.get(STARTUP_TRACE_ENV)))
     root = tk.Tk()
-    app = FreeRDPGUI(root)
+    trace.mark("Tk started")
+    app = FreeRDPGUI(root, trace=trace)
 
     # Set window icon if available
     try:
@@ -953,6 +2057,15 @@ def main():
     y = (root.winfo_screenheight() // 2) - (root.winfo_height() // 2)
     root.geometry(f"+{x}+{y}")
 
+    def on_first_map(event):
+        if event.widget is root:
+            root.unbind("<Map>", map_binding)
+            trace.mark("first window")
+            trace.report()
+            app.metrics.observe("startup", time.perf_counter() - trace.start)
+
+    map_binding = root.bind("<Map>", on_first_map)
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
     root.mainloop()
 
 
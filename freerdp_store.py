@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP Connection Store
+Saved connection profiles kept in SQLite, one row per profile
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from collections.abc import MutableMapping
+from pathlib import Path
+
+from freerdp_core import DEFAULT_SETTINGS
+
+# Settings copied into their own columns so the list and search never decode profiles
+SUMMARY_FIELDS = ('server', 'username', 'domain', 'gateway')
+
+# Profile fields matched by the connection search box
+SEARCH_FIELDS = ('name',) + SUMMARY_FIELDS
+
+# Marks "leave the profile's template as it is" in ConnectionStore.put
+KEEP_TEMPLATE = object()
+
+
+def overrides_of(settings, base):
+    """Return the settings that differ from base (the values a profile or template must store)"""
+    return {key: value for key, value in settings.items() if key not in base or base[key] != value}
+
+
+class ProfileRecord:
+    """Summary of one saved profile as shown in the connection list"""
+
+    __slots__ = ("id", "name", "last_used", "template", "position") + SUMMARY_FIELDS
+
+    def __init__(self, profile_id, name, server="", username="", domain="", gateway="", last_used=None,
+                 template=None):
+        self.id = profile_id
+        self.name = name
+        self.server = server
+        self.username = username
+        self.domain = domain
+        self.gateway = gateway
+        self.last_used = last_used
+        self.template = template
+        self.position = None
+
+
+class ProfileIndex:
+    """Index of profile records by stable ID, name and list position
+
+    Lookups by ID, name or position are constant time. The list order
+    defined here is the order used to fill the connection list, so a
+    listbox index maps straight back to its record.
+    """
+
+    def __init__(self, records=()):
+        self._by_id = {}
+        self._by_name = {}
+        self._order = []
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        """Append a record to the end of the list, returning its position"""
+        record.position = len(self._order)
+        self._order.append(record)
+        self._by_id[record.id] = record
+        self._by_name[record.name] = record
+        return record.position
+
+    def remove(self, name):
+        """Remove a record by name, returning it"""
+        record = self._by_name.pop(name)
+        del self._by_id[record.id]
+        del self._order[record.position]
+        for position in range(record.position, len(self._order)):
+            self._order[position].position = position
+        return record
+
+    def rename(self, old_name, new_name):
+        """Rename a record in place, keeping its ID and position"""
+        record = self._by_name.pop(old_name)
+        record.name = new_name
+        self._by_name[new_name] = record
+        return record
+
+    def at(self, position):
+        """Return the record shown at a list position"""
+        return self._order[position]
+
+    def get(self, name):
+        """Return the record for a profile name, or None"""
+        return self._by_name.get(name)
+
+    def by_id(self, profile_id):
+        """Return the record with a stable ID, or None"""
+        return self._by_id.get(profile_id)
+
+    def records(self):
+        """Return all records in list order"""
+        return list(self._order)
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def __iter__(self):
+        return (record.name for record in self._order)
+
+    def __len__(self):
+        return len(self._order)
+
+
+def trigrams(text):
+    """Return the set of three-character substrings of text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """Trigram index for case-insensitive substring search over profile records
+
+    Query terms of three or more characters are narrowed down through the
+    trigram sets, smallest first, and the survivors are verified against
+    the indexed text. Shorter terms fall back to scanning that text.
+    """
+
+    def __init__(self, records=()):
+        self._grams = defaultdict(set)
+        self._text = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        text = "\n".join(getattr(record, field) or '' for field in SEARCH_FIELDS).lower()
+        self._text[record.id] = text
+        for gram in trigrams(text):
+            self._grams[gram].add(record.id)
+
+    def remove(self, record_id):
+        text = self._text.pop(record_id, None)
+        if text is None:
+            return
+        for gram in trigrams(text):
+            ids = self._grams[gram]
+            ids.discard(record_id)
+            if not ids:
+                del self._grams[gram]
+
+    def update(self, record):
+        self.remove(record.id)
+        self.add(record)
+
+    def search(self, query):
+        """Return the set of record IDs whose text contains every term of query"""
+        terms = query.lower().split()
+        grams = set()
+        for term in terms:
+            grams |= trigrams(term)
+
+        candidates = None
+        for gram in sorted(grams, key=lambda g: len(self._grams.get(g, ()))):
+            ids = self._grams.get(gram)
+            if not ids:
+                return set()
+            candidates = set(ids) if candidates is None else candidates & ids
+
+        texts = self._text
+        matched = set(texts) if candidates is None else candidates
+        for term in terms:
+            matched = {record_id for record_id in matched if term in texts[record_id]}
+        return matched
+
+
+class ConnectionStore(MutableMapping):
+    """Dictionary of saved connections that writes through to SQLite
+
+    Only the summary columns are read at startup, into a ProfileIndex keyed
+    by the row ID; full settings are decoded on first access. Every change,
+    including a batch import or a template edit that touches many rows, is
+    one transaction, so a crash can never leave the store half written. A
+    legacy JSON store is imported automatically the first time the database
+    is created.
+
+    Profiles may inherit from a template, and templates from a parent
+    template. Each row stores only the settings that differ from what it
+    inherits (DEFAULT_SETTINGS at the root), and reads return the resolved
+    settings. Editing a template is one write however many profiles use
+    it; the summary columns of inheriting profiles are updated in SQL.
+    """
+
+    def __init__(self, path, legacy_json=None):
+        self.path = path
+        self.db = sqlite3.connect(str(path))
+        # The connection belongs to the thread that opened the store
+        self._owner = threading.get_ident()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.execute("CREATE TABLE IF NOT EXISTS profiles ("
+                            "id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, server TEXT NOT NULL DEFAULT '', "
+                            "data TEXT NOT NULL)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS templates ("
+                            "id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, parent TEXT, data TEXT NOT NULL)")
+            self._migrate()
+
+        self._cache = {}
+        self._overrides = {}
+        self._search = None
+        self._resolved = {}
+        self.templates = {name: (parent, json.loads(data))
+                          for name, parent, data in self.db.execute("SELECT name, parent, data FROM templates")}
+        self.index = ProfileIndex(ProfileRecord(*row) for row in self.db.execute(
+            f"SELECT id, name, {', '.join(SUMMARY_FIELDS)}, last_used, template FROM profiles ORDER BY id"))
+
+        if not self.index and legacy_json and Path(legacy_json).exists():
+            self.import_json(legacy_json)
+
+    def _migrate(self):
+        """Add summary columns missing from stores created by older versions"""
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(profiles)")}
+        missing = [field for field in SUMMARY_FIELDS if field not in columns]
+        for field in missing:
+            self.db.execute(f"ALTER TABLE profiles ADD COLUMN {field} TEXT NOT NULL DEFAULT ''")
+        if missing:
+            assignments = ", ".join(f"{field} = ?" for field in missing)
+            rows = []
+            for profile_id, data in self.db.execute("SELECT id, data FROM profiles"):
+                settings = json.loads(data)
+                rows.append([settings.get(field, '') for field in missing] + [profile_id])
+            self.db.executemany(f"UPDATE profiles SET {assignments} WHERE id = ?", rows)
+        if "last_used" not in columns:
+            self.db.execute("ALTER TABLE profiles ADD COLUMN last_used REAL")
+        if "argv" not in columns:
+            self.db.execute("ALTER TABLE profiles ADD COLUMN argv TEXT")
+            self.db.execute("ALTER TABLE profiles ADD COLUMN argv_key TEXT")
+        if "argv_fields" not in columns:
+            # Argv compiled without its key fields is rebuilt once
+            self.db.execute("ALTER TABLE profiles ADD COLUMN argv_fields TEXT")
+            self.db.execute("UPDATE profiles SET argv = NULL, argv_key = NULL")
+        if "template" not in columns:
+            # Older rows hold every setting; keep only what differs from the defaults
+            self.db.execute("ALTER TABLE profiles ADD COLUMN template TEXT")
+            rows = [(json.dumps(overrides_of(json.loads(data), DEFAULT_SETTINGS)), profile_id)
+                    for profile_id, data in self.db.execute("SELECT id, data FROM profiles")]
+            self.db.executemany("UPDATE profiles SET data = ? WHERE id = ?", rows)
+        if self.db.execute("PRAGMA user_version").fetchone()[0] < 1:
+            # Commands compiled before the password vault could carry a /p: password
+            self.db.execute("UPDATE profiles SET argv = NULL, argv_key = NULL")
+            self.db.execute("PRAGMA user_version = 1")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] < 2:
+            # Argv stored with fewer fields than a launch now reads from them is rebuilt once
+            self.db.execute("UPDATE profiles SET argv = NULL, argv_key = NULL, argv_fields = NULL")
+            self.db.execute("PRAGMA user_version = 2")
+
+    def import_json(self, json_file):
+        """Import every profile from a JSON file in the original format"""
+        with open(json_file, 'r') as f:
+            connections = json.load(f)
+        pending = {}
+        with self.db:
+            changes = [self._write(name, settings, pending=pending) for name, settings in connections.items()]
+        for change in changes:
+            self._apply(change)
+        return len(connections)
+
+    def search(self, query):
+        """Return the IDs of profiles matching every term of query
+
+        The trigram index is built on first use and kept up to date by
+        every later save, delete and rename.
+        """
+        if self._search is None:
+            self._search = SearchIndex(self.index.records())
+        return self._search.search(query)
+
+    def rename(self, old_name, new_name):
+        """Rename a profile in one transaction, keeping its ID and list position"""
+        if new_name in self.index:
+            raise KeyError(new_name)
+        with self.db:
+            self.db.execute("UPDATE profiles SET name = ? WHERE name = ?", (new_name, old_name))
+        record = self.index.rename(old_name, new_name)
+        if self._search is not None:
+            self._search.update(record)
+        if old_name in self._cache:
+            self._cache[new_name] = self._cache.pop(old_name)
+        if old_name in self._overrides:
+            self._overrides[new_name] = self._overrides.pop(old_name)
+
+    # Templates
+
+    def base_settings(self, template):
+        """Return the resolved settings a profile using template inherits (defaults for None)"""
+        if not template:
+            return DEFAULT_SETTINGS
+        resolved = self._resolved.get(template)
+        if resolved is None:
+            chain = []
+            name = template
+            while name in self.templates and name not in chain:
+                chain.append(name)
+                name = self.templates[name][0]
+            resolved = dict(DEFAULT_SETTINGS)
+            for name in reversed(chain):
+                resolved.update(self.templates[name][1])
+            self._resolved[template] = resolved
+        return resolved
+
+    def template_names(self):
+        return sorted(self.templates)
+
+    def template_children(self, name):
+        """Return name and every template that inherits from it, directly or not"""
+        found = [name]
+        for template in found:
+            found.extend(child for child, (parent, data) in self.templates.items()
+                         if parent == template and child not in found)
+        return found
+
+    def save_template(self, name, settings, parent=None):
+        """Create or replace a template from full settings, returning the number of profiles affected
+
+        Only the settings that differ from the parent are stored. Profiles
+        that inherit a changed summary field get their summary column
+        updated by one UPDATE per template and field, and their compiled
+        argv is cleared.
+        """
+        if parent and parent in self.template_children(name):
+            raise ValueError(f"Template '{parent}' inherits from '{name}'")
+        affected = self.template_children(name)
+        before = {template: dict(self.base_settings(template)) for template in affected}
+        data = overrides_of(settings, self.base_settings(parent))
+
+        placeholders = ", ".join("?" for template in affected)
+
+        previous = self.templates.get(name)
+        try:
+            with self.db:
+                self.db.execute("INSERT INTO templates (name, parent, data) VALUES (?, ?, ?) "
+                                "ON CONFLICT(name) DO UPDATE SET parent = excluded.parent, data = excluded.data",
+                                (name, parent or None, json.dumps(data)))
+                # Resolving the new summary values below needs the new template in place already
+                self.templates[name] = (parent or None, data)
+                self._resolved.clear()
+                for template in affected:
+                    after = self.base_settings(template)
+                    for field in SUMMARY_FIELDS:
+                        if after.get(field, '') != before[template].get(field, ''):
+                            self.db.execute(f"UPDATE profiles SET {field} = ? WHERE template = ? "
+                                            f"AND json_type(data, '$.{field}') IS NULL",
+                                            (after.get(field, ''), template))
+                self.db.execute(f"UPDATE profiles SET argv = NULL, argv_key = NULL "
+                                f"WHERE template IN ({placeholders})", affected)
+                rows = self.db.execute(f"SELECT id, {', '.join(SUMMARY_FIELDS)} FROM profiles "
+                                       f"WHERE template IN ({placeholders})", affected).fetchall()
+        except Exception:
+            # Rolled back: so is the template
+            if previous is None:
+                self.templates.pop(name, None)
+            else:
+                self.templates[name] = previous
+            self._resolved.clear()
+            raise
+
+        self._cache.clear()
+        for profile_id, *summary in rows:
+            record = self.index.by_id(profile_id)
+            for field, value in zip(SUMMARY_FIELDS, summary):
+                setattr(record, field, value)
+            if self._search is not None:
+                self._search.update(record)
+        return len(rows)
+
+    def delete_template(self, name):
+        """Delete a template that no profile or other template inherits from"""
+        users = self.db.execute("SELECT COUNT(*) FROM profiles WHERE template = ?", (name,)).fetchone()[0]
+        children = len(self.template_children(name)) - 1
+        if users or children:
+            raise ValueError(f"Template '{name}' is used by {users} profile(s) and {children} template(s)")
+        with self.db:
+            self.db.execute("DELETE FROM templates WHERE name = ?", (name,))
+        del self.templates[name]
+        self._resolved.clear()
+
+    def overrides(self, name):
+        """Return only the settings a profile stores itself"""
+        if name not in self.index:
+            raise KeyError(name)
+        if name not in self._overrides:
+            row = self.db.execute("SELECT data FROM profiles WHERE name = ?", (name,)).fetchone()
+            self._overrides[name] = json.loads(row[0])
+        return self._overrides[name]
+
+    def plaintext_passwords(self):
+        """Return the names of profiles that still store a password in plain text"""
+        return [name for name, in self.db.execute(
+            "SELECT name FROM profiles WHERE COALESCE(json_extract(data, '$.password'), '') != ''")]
+
+    def uses_password(self, entry_id):
+        """Return True if a profile or template still refers to a vault entry"""
+        if any(data.get('password_id') == entry_id for parent, data in self.templates.values()):
+            return True
+        return self.db.execute("SELECT 1 FROM profiles WHERE json_extract(data, '$.password_id') = ? LIMIT 1",
+                               (entry_id,)).fetchone() is not None
+
+    def compiled_command(self, name):
+        """Return (argv, argv_key, fields) compiled for a profile, or (None, None, None) when there is none
+
+        fields holds the COMPILE_FIELDS the argv was compiled from, so the
+        caller can check the key without decoding the profile's settings.
+        """
+        record = self.index.get(name)
+        if record is None:
+            raise KeyError(name)
+        row = self.db.execute("SELECT argv, argv_key, argv_fields FROM profiles WHERE id = ?", (record.id,)).fetchone()
+        if not row or not row[0] or not row[2]:
+            return None, None, None
+        return json.loads(row[0]), row[1], json.loads(row[2])
+
+    def save_compiled_command(self, name, key, argv, fields):
+        """Store the argv compiled for a profile from fields (cleared again by the next change to the profile)"""
+        try:
+            with self.db:
+                self.db.execute("UPDATE profiles SET argv = ?, argv_key = ?, argv_fields = ? WHERE name = ?",
+                                (json.dumps(argv), key, json.dumps(fields), name))
+        except sqlite3.Error as e:
+            print(f"Error saving compiled command: {e}")
+
+    def touch(self, name):
+        """Record that a profile was just used to connect"""
+        record = self.index.get(name)
+        if record:
+            record.last_used = time.time()
+            with self.db:
+                self.db.execute("UPDATE profiles SET last_used = ? WHERE id = ?", (record.last_used, record.id))
+        return record
+
+    def close(self):
+        self.db.close()
+
+    def _write(self, name, settings, template=KEEP_TEMPLATE, pending=None):
+        """Insert or update one row inside the caller's transaction, storing only overrides
+
+        Returns the change for _apply to make to the index and caches once
+        the transaction has committed, so a rollback leaves them as they
+        were. pending maps names to the changes already written in the
+        same transaction.
+        """
+        record = self.index.get(name)
+        earlier = pending.get(name) if pending else None
+        if earlier:
+            row_id, current = earlier[1], earlier[3]
+        else:
+            row_id, current = (record.id, record.template) if record else (None, None)
+        if template is KEEP_TEMPLATE:
+            template = current
+        template = template or None
+        base = self.base_settings(template)
+        overrides = overrides_of(settings, base)
+        resolved = {**base, **overrides}
+        summary = [resolved.get(field, '') for field in SUMMARY_FIELDS]
+        if row_id is not None:
+            assignments = ", ".join(f"{field} = ?" for field in SUMMARY_FIELDS)
+            self.db.execute(f"UPDATE profiles SET {assignments}, data = ?, template = ?, argv = NULL, argv_key = NULL "
+                            f"WHERE id = ?", summary + [json.dumps(overrides), template, row_id])
+        else:
+            placeholders = ", ".join("?" for field in SUMMARY_FIELDS)
+            cursor = self.db.execute(
+                f"INSERT INTO profiles (name, {', '.join(SUMMARY_FIELDS)}, data, template) "
+                f"VALUES (?, {placeholders}, ?, ?)", [name] + summary + [json.dumps(overrides), template])
+            row_id = cursor.lastrowid
+        change = (name, row_id, summary, template, overrides, resolved)
+        if pending is not None:
+            pending[name] = change
+        return change
+
+    def _apply(self, change, cache=True):
+        """Bring the index, search index and caches up to date with a committed _write, returning its record"""
+        name, row_id, summary, template, overrides, resolved = change
+        record = self.index.get(name)
+        if record:
+            for field, value in zip(SUMMARY_FIELDS, summary):
+                setattr(record, field, value)
+            record.template = template
+        else:
+            record = ProfileRecord(row_id, name, *summary, template=template)
+            self.index.add(record)
+        if self._search is not None:
+            self._search.update(record)
+        if cache:
+            self._overrides[name] = overrides
+            self._cache[name] = resolved
+        else:
+            self._overrides.pop(name, None)
+            self._cache.pop(name, None)
+        return record
+
+    def __getitem__(self, name):
+        """Return a profile's resolved settings: defaults, then its template chain, then its overrides"""
+        if name not in self._cache:
+            overrides = self.overrides(name)
+            self._cache[name] = {**self.base_settings(self.index.get(name).template), **overrides}
+        return self._cache[name]
+
+    def __setitem__(self, name, settings):
+        self.put(name, settings)
+
+    def put(self, name, settings, template=KEEP_TEMPLATE):
+        """Insert or update one profile, returning its ProfileRecord
+
+        template names the template to inherit from (None for none); by
+        default an existing profile keeps its template.
+        """
+        with self.db:
+            change = self._write(name, settings, template)
+        return self._apply(change)
+
+    def put_many(self, items, template=KEEP_TEMPLATE):
+        """Insert or update many (name, settings) pairs in one transaction, returning their ProfileRecords
+
+        Unlike put, the settings are not kept in the decoded cache, so bulk
+        imports do not grow memory beyond the profile index.
+        """
+        pending = {}
+        with self.db:
+            changes = [self._write(name, settings, template, pending) for name, settings in items]
+        return [self._apply(change, cache=False) for change in changes]
+
+    def iter_settings(self):
+        """Yield (name, resolved settings) for every profile, decoding one row at a time without caching
+
+        Other threads read through a connection of their own, which WAL
+        lets run alongside writes on the owning thread.
+        """
+        if threading.get_ident() == self._owner or str(self.path) == ":memory:":
+            yield from self._iter_settings(self.db)
+            return
+        db = sqlite3.connect(str(self.path))
+        try:
+            yield from self._iter_settings(db)
+        finally:
+            db.close()
+
+    def _iter_settings(self, db):
+        for name, template, data in db.execute("SELECT name, template, data FROM profiles ORDER BY id"):
+            yield name, {**self.base_settings(template), **json.loads(data)}
+
+    def __delitem__(self, name):
+        if name not in self.index:
+            raise KeyError(name)
+        with self.db:
+            self.db.execute("DELETE FROM profiles WHERE name = ?", (name,))
+        record = self.index.remove(name)
+        if self._search is not None:
+            self._search.remove(record.id)
+        self._cache.pop(name, None)
+        self._overrides.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
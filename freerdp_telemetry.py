@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP Connection Telemetry
+Per-launch timelines kept in a local log, with per-profile latency aggregates
+"""
+
+import csv
+import json
+import math
+import os
+import secrets
+import threading
+import time
+from pathlib import Path
+
+# Records kept in the log; older ones are dropped when the file is compacted
+MAX_RECORDS = 5000
+
+# Timeline events in the order they normally happen (times are epoch seconds)
+EVENTS = ("requested", "built", "checked", "spawned", "first_output", "launched", "failed", "ended")
+
+# Aggregated phases: (name, from event, to event)
+PHASES = (
+    ("startup", "requested", "spawned"),
+    ("probe", "built", "checked"),
+    ("first_output", "spawned", "first_output"),
+    ("failure", "spawned", "failed"),
+    ("session", "launched", "ended"),
+)
+
+# Outcomes of a launch attempt
+OUTCOMES = ("launched", "failed", "exited", "unreachable", "error")
+
+SUMMARY_COLUMNS = (["profile", "server", "gateway", "attempts", "failures", "failure_rate"]
+                   + [f"{phase}_{stat}_ms" for phase, start, end in PHASES for stat in ("p50", "p95")]
+                   + ["last_outcome", "last_attempt"])
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of values (None when there are none)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def make_record(profile, timeline, outcome, server="", gateway="", returncode=None, detail=""):
+    """Build a compact log record: event times become millisecond offsets from the first event"""
+    start = min(timeline.values())
+    return {
+        'id': secrets.token_hex(6),
+        'profile': profile,
+        'server': server,
+        'gateway': gateway,
+        'start': round(start, 3),
+        'outcome': outcome,
+        'returncode': returncode,
+        'detail': detail,
+        'events': {event: round((timeline[event] - start) * 1000) for event in EVENTS if event in timeline},
+    }
+
+
+def session_outcome(session):
+    """Classify a finished Session for the telemetry log"""
+    if session.launched:
+        return "launched"
+    return "exited" if session.returncode == 0 else "failed"
+
+
+class ProfileStats:
+    """Aggregates over every logged attempt of one profile"""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.server = ""
+        self.gateway = ""
+        self.attempts = 0
+        self.failures = 0
+        self.last_outcome = None
+        self.last_attempt = None
+        self.samples = {phase: [] for phase, start, end in PHASES}
+
+    def add(self, record):
+        self.server = record.get('server', '')
+        self.gateway = record.get('gateway', '')
+        self.attempts += 1
+        if record['outcome'] not in ("launched", "exited"):
+            self.failures += 1
+        self.last_outcome = record['outcome']
+        self.last_attempt = record['start']
+        events = record['events']
+        for phase, start, end in PHASES:
+            if start in events and end in events:
+                self.samples[phase].append(events[end] - events[start])
+
+    def percentile(self, phase, fraction):
+        return percentile(self.samples[phase], fraction)
+
+    def to_dict(self):
+        data = {
+            'profile': self.profile,
+            'server': self.server,
+            'gateway': self.gateway,
+            'attempts': self.attempts,
+            'failures': self.failures,
+            'failure_rate': round(self.failures / self.attempts, 3) if self.attempts else 0.0,
+        }
+        for phase, start, end in PHASES:
+            data[f"{phase}_p50_ms"] = self.percentile(phase, 0.50)
+            data[f"{phase}_p95_ms"] = self.percentile(phase, 0.95)
+        data['last_outcome'] = self.last_outcome
+        data['last_attempt'] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.last_attempt))
+        return data
+
+
+def apply_update(records, update):
+    """Merge an update line into the record it names, searching from the newest"""
+    for record in reversed(records):
+        if record.get('id') == update['update']:
+            record['events'].update(update.get('events', {}))
+            record.update((key, value) for key, value in update.items() if key not in ('update', 'events'))
+            return
+
+
+class TelemetryLog:
+    """Append-only JSON Lines log of launch timelines
+
+    Each launch appends one line when its outcome is known; later facts,
+    such as when a launched session ended, are appended as update lines
+    that are merged into their record on load. The file is rewritten with
+    only the newest ``max_records`` records once it has grown to twice
+    that many lines, so appends stay cheap and the log stays bounded.
+    """
+
+    def __init__(self, path, max_records=MAX_RECORDS):
+        self.path = Path(path)
+        self.max_records = max_records
+        self._lock = threading.Lock()
+        self._records = None
+        self._lines = 0
+
+    def records(self):
+        """Return every logged record, oldest first (the file is read once)"""
+        with self._lock:
+            return list(self._load())
+
+    def _load(self):
+        if self._records is None:
+            self._records = []
+            try:
+                with open(self.path, 'r') as f:
+                    for line in f:
+                        self._lines += 1
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue
+                        if 'update' in record:
+                            apply_update(self._records, record)
+                        else:
+                            self._records.append(record)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Error loading telemetry: {e}")
+            del self._records[:-self.max_records]
+        return self._records
+
+    def append(self, record):
+        """Add one record to the log"""
+        with self._lock:
+            records = self._load()
+            records.append(record)
+            del records[:-self.max_records]
+            self._write(records, record)
+
+    def update(self, record_id, timeline, **fields):
+        """Add the events of timeline missing from a logged record, and replace its other fields"""
+        with self._lock:
+            records = self._load()
+            record = next((record for record in reversed(records) if record.get('id') == record_id), None)
+            if record is None:
+                return
+            start = record['start']
+            events = {event: round((timeline[event] - start) * 1000)
+                      for event in EVENTS if event in timeline and event not in record['events']}
+            update = dict(fields, update=record_id, events=events)
+            apply_update(records, update)
+            self._write(records, update)
+
+    def _write(self, records, line):
+        """Append one line, or compact the file once it holds twice max_records lines (callers hold the lock)"""
+        try:
+            if self._lines + 1 >= 2 * self.max_records:
+                self._rewrite(records)
+            else:
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(line, separators=(",", ":")) + "\n")
+                self._lines += 1
+        except Exception as e:
+            print(f"Error saving telemetry: {e}")
+
+    def _rewrite(self, records):
+        temp_file = self.path.with_name(self.path.name + ".tmp")
+        with open(temp_file, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        os.replace(temp_file, self.path)
+        self._lines = len(records)
+
+    def summary(self):
+        """Return ProfileStats for every profile in the log, slowest p95 startup first"""
+        stats = {}
+        for record in self.records():
+            profile = record.get('profile', '')
+            if profile not in stats:
+                stats[profile] = ProfileStats(profile)
+            stats[profile].add(record)
+        return sorted(stats.values(), key=lambda s: -(s.percentile("startup", 0.95) or 0))
+
+    def export_json(self, path):
+        """Write the per-profile summary and every record to a JSON file"""
+        with open(path, 'w') as f:
+            json.dump({'summary': [stats.to_dict() for stats in self.summary()], 'records': self.records()},
+                      f, indent=2)
+
+    def export_csv(self, path):
+        """Write the per-profile summary to a CSV file"""
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS)
+            writer.writeheader()
+            for stats in self.summary():
+                writer.writerow(stats.to_dict())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP Credential Vault
+Passwords encrypted with a key derived from a master password, which is kept
+in memory only while the vault is unlocked
+"""
+
+import base64
+import hashlib
+import json
+import os
+import secrets
+import threading
+import time
+import uuid
+from pathlib import Path
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:
+    # The vault needs the optional cryptography package; without it passwords are never saved
+    AESGCM = None
+    InvalidTag = None
+
+# Seconds the vault stays unlocked after it was last used
+VAULT_TIMEOUT = 15 * 60
+
+# scrypt cost: about 32 MiB and a tenth of a second, paid once per unlock rather than per password
+SCRYPT_N = 2 ** 15
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_MAXMEM = 64 * 1024 * 1024
+
+VAULT_VERSION = 1
+NONCE_BYTES = 12
+
+# Encrypted under the key so a wrong master password is detected on unlock
+CHECK_VALUE = b"freerdp-vault"
+
+
+class VaultError(Exception):
+    pass
+
+
+class VaultLocked(VaultError):
+    pass
+
+
+def vault_available():
+    """Return True when the cryptography package needed by the vault is installed"""
+    return AESGCM is not None
+
+
+def derive_key(master_password, salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    """Derive the 256-bit vault key from a master password"""
+    return hashlib.scrypt(master_password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=SCRYPT_MAXMEM,
+                          dklen=32)
+
+
+def encrypt(key, plaintext, associated_data):
+    nonce = secrets.token_bytes(NONCE_BYTES)
+    return base64.b64encode(nonce + AESGCM(key).encrypt(nonce, plaintext, associated_data)).decode("ascii")
+
+
+def decrypt(key, token, associated_data):
+    data = base64.b64decode(token)
+    return AESGCM(key).decrypt(data[:NONCE_BYTES], data[NONCE_BYTES:], associated_data)
+
+
+class Vault:
+    """Encrypted password store that profiles refer to by entry ID
+
+    Each password is encrypted with AES-GCM under a key derived from the
+    master password with scrypt, using its entry ID as associated data so
+    entries cannot be swapped. The key is derived once by ``unlock`` and
+    kept in memory until the vault has been idle for ``timeout`` seconds,
+    so decrypting a password costs microseconds, not a key derivation.
+    """
+
+    def __init__(self, path, timeout=VAULT_TIMEOUT):
+        self.path = Path(path)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._key = None
+        self._last_used = 0.0
+        self._data = None
+
+    def _load(self):
+        if self._data is None:
+            try:
+                with open(self.path, 'r') as f:
+                    self._data = json.load(f)
+            except FileNotFoundError:
+                self._data = {}
+            except ValueError as e:
+                raise VaultError(f"Vault file is damaged: {e}")
+        return self._data
+
+    def _save(self):
+        temp_file = self.path.with_name(self.path.name + ".tmp")
+        fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self._data, f, indent=2)
+        os.replace(temp_file, self.path)
+
+    def exists(self):
+        with self._lock:
+            return bool(self._load())
+
+    def is_unlocked(self):
+        with self._lock:
+            return self._current_key() is not None
+
+    def _current_key(self):
+        """Return the cached key, forgetting it once the vault has been idle too long"""
+        if self._key is not None and time.monotonic() - self._last_used > self.timeout:
+            self._key = None
+        if self._key is not None:
+            self._last_used = time.monotonic()
+        return self._key
+
+    def _require_key(self):
+        key = self._current_key()
+        if key is None:
+            raise VaultLocked("The password vault is locked")
+        return key
+
+    def create(self, master_password):
+        """Create an empty vault protected by master_password and leave it unlocked"""
+        if not vault_available():
+            raise VaultError("The password vault needs the 'cryptography' package (pip install cryptography)")
+        with self._lock:
+            if self._load():
+                raise VaultError("A password vault already exists")
+            salt = secrets.token_bytes(16)
+            key = derive_key(master_password, salt)
+            self._data = {
+                'version': VAULT_VERSION,
+                'kdf': {'name': 'scrypt', 'salt': base64.b64encode(salt).decode("ascii"),
+                        'n': SCRYPT_N, 'r': SCRYPT_R, 'p': SCRYPT_P},
+                'check': encrypt(key, CHECK_VALUE, b"check"),
+                'entries': {},
+            }
+            self._save()
+            self._key = key
+            self._last_used = time.monotonic()
+
+    def unlock(self, master_password):
+        """Derive the key from master_password and keep it in memory, raising VaultError if it is wrong"""
+        if not vault_available():
+            raise VaultError("The password vault needs the 'cryptography' package (pip install cryptography)")
+        with self._lock:
+            data = self._load()
+            if not data:
+                raise VaultError("No password vault has been created yet")
+            try:
+                kdf = data['kdf']
+                key = derive_key(master_password, base64.b64decode(kdf['salt']), kdf['n'], kdf['r'], kdf['p'])
+                decrypt(key, data['check'], b"check")
+            except InvalidTag:
+                raise VaultError("Wrong master password")
+            except (KeyError, ValueError, TypeError) as e:
+                raise VaultError(f"Vault file is damaged: {e!r}")
+            self._key = key
+            self._last_used = time.monotonic()
+
+    def lock(self):
+        with self._lock:
+            self._key = None
+
+    def store(self, password):
+        """Encrypt a password into a new entry, returning its ID"""
+        return self.store_many([password])[0]
+
+    def store_many(self, passwords):
+        """Encrypt many passwords with a single write of the vault file, returning their IDs"""
+        with self._lock:
+            key = self._require_key()
+            entries = self._load()['entries']
+            entry_ids = []
+            for password in passwords:
+                entry_id = uuid.uuid4().hex
+                entries[entry_id] = encrypt(key, password.encode("utf-8"), entry_id.encode("ascii"))
+                entry_ids.append(entry_id)
+            self._save()
+            return entry_ids
+
+    def get(self, entry_id):
+        """Return the password of an entry, raising VaultLocked if the vault is locked"""
+        with self._lock:
+            key = self._require_key()
+            token = self._load().get('entries', {}).get(entry_id)
+            if token is None:
+                raise VaultError(f"Password {entry_id} is not in the vault")
+            try:
+                return decrypt(key, token, entry_id.encode("ascii")).decode("utf-8")
+            except (InvalidTag, ValueError, TypeError):
+                # ValueError covers bad base64 (binascii.Error) and undecodable text, TypeError a non-string entry
+                raise VaultError(f"Password {entry_id} in the vault is damaged")
+
+    def delete(self, entry_id):
+        """Remove an entry (no unlock needed)"""
+        with self._lock:
+            if self._load().get('entries', {}).pop(entry_id, None) is not None:
+                self._save()
+
+
+def profile_password(settings, vault):
+    """Return the password to write to FreeRDP's stdin, or None
+
+    A password typed into the form wins over the vault entry the profile
+    refers to. Raises VaultLocked when the entry needs an unlocked vault.
+    """
+    if settings.get('password'):
+        return settings['password']
+    if settings.get('password_id'):
+        return vault.get(settings['password_id'])
+    return None
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+r"""
+FreeRDP GUI Widgets
+Reusable Tk widgets for the FreeRDP GUI Wrapper
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+# Fallback sizes until the first row has been drawn and measured
+DEFAULT_ROW_HEIGHT = 20
+DEFAULT_HEADING_HEIGHT = 24
+
+
+class VirtualTreeview(ttk.Frame):
+    """A Treeview that only materializes the rows currently visible
+
+    The model is a list of row keys in display order, optionally narrowed by
+    a filter set; the text shown for a key comes from ``get_values(key)``.
+    Only as many Tk items as fit in the widget exist, and scrolling or model
+    changes rewrite just the items whose contents changed. Selection is kept
+    by key, so it survives scrolling and sorting. Clicking a heading sorts by
+    that column using ``sort_value(key, column)``.
+
+    Generates ``<<SelectionChanged>>`` when the selection changes and
+    ``<<RowActivate>>`` on double-click or Return.
+    """
+
+    def __init__(self, parent, columns, get_values, sort_value=None, height=10, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.columns = [column for column, heading, width in columns]
+        self.headings = {column: heading for column, heading, width in columns}
+        self.get_values = get_values
+        self.sort_value = sort_value or self._default_sort_value
+        self.sort_column = None
+        self.sort_reverse = False
+
+        self.rows = []
+        self._all_rows = []
+        self._filter = None
+        self.selected = set()
+        self.anchor = None
+        self.offset = 0
+        self.page_size = height
+        self.row_height = DEFAULT_ROW_HEIGHT
+        self.heading_height = DEFAULT_HEADING_HEIGHT
+        self._positions = None
+        self._slots = []
+
+        self.tree = ttk.Treeview(self, columns=self.columns, show="headings", height=height,
+                                 selectmode="none")
+        for column, heading, width in columns:
+            self.tree.heading(column, text=heading, command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=width, anchor=tk.W)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side="right", fill=tk.Y)
+
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<Button-1>", lambda event: self._on_click(event, "single"))
+        self.tree.bind("<Control-Button-1>", lambda event: self._on_click(event, "toggle"))
+        self.tree.bind("<Shift-Button-1>", lambda event: self._on_click(event, "range"))
+        self.tree.bind("<Double-Button-1>", self._on_double_click)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self._scroll_units(-3))
+        self.tree.bind("<Button-5>", lambda event: self._scroll_units(3))
+        self.tree.bind("<Up>", lambda event: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda event: self._move_selection(-self.page_size))
+        self.tree.bind("<Next>", lambda event: self._move_selection(self.page_size))
+        self.tree.bind("<Home>", lambda event: self._move_selection(-len(self.rows)))
+        self.tree.bind("<End>", lambda event: self._move_selection(len(self.rows)))
+        self.tree.bind("<Return>", lambda event: self.event_generate("<<RowActivate>>"))
+
+    # Model
+
+    def set_rows(self, keys):
+        """Replace all rows, keeping the current sort order, filter and selection"""
+        self._all_rows = list(keys)
+        if self.sort_column is not None:
+            self._all_rows.sort(key=self._sort_key, reverse=self.sort_reverse)
+        self._apply_filter()
+
+    def set_filter(self, keys):
+        """Show only rows whose key is in keys (None shows every row)"""
+        self._filter = None if keys is None else set(keys)
+        self._apply_filter()
+
+    def insert(self, key):
+        """Add one row at its sorted position (or at the end when unsorted)"""
+        self._all_rows.insert(self._insert_position(self._all_rows, key), key)
+        if self._filter is None or key in self._filter:
+            self.rows.insert(self._insert_position(self.rows, key), key)
+            self._positions = None
+        self._render()
+
+    def refresh_row(self, key):
+        """Refresh one row after its values changed"""
+        if self.sort_column is not None:
+            self._all_rows.remove(key)
+            self._all_rows.insert(self._insert_position(self._all_rows, key), key)
+            if key in self._position_map():
+                self.rows.remove(key)
+                self.rows.insert(self._insert_position(self.rows, key), key)
+                self._positions = None
+        self._render()
+
+    def delete(self, key):
+        """Remove one row"""
+        self._all_rows.remove(key)
+        if key in self._position_map():
+            self.rows.remove(key)
+            self._positions = None
+        self.selected.discard(key)
+        if self.anchor == key:
+            self.anchor = None
+        self._render()
+
+    def selection(self):
+        """Return the selected keys in display order"""
+        positions = self._position_map()
+        return sorted(self.selected, key=positions.__getitem__)
+
+    def selection_set(self, keys):
+        """Select the given keys and scroll the first one into view"""
+        keys = [key for key in keys if key in self._position_map()]
+        self.selected = set(keys)
+        self.anchor = keys[0] if keys else None
+        if keys:
+            self.see(keys[0])
+        self._render()
+        self.event_generate("<<SelectionChanged>>")
+
+    def see(self, key):
+        """Scroll so that key is visible"""
+        position = self._position_map()[key]
+        if position < self.offset:
+            self.scroll_to(position)
+        elif position >= self.offset + self.page_size:
+            self.scroll_to(position - self.page_size + 1)
+
+    def sort_by(self, column):
+        """Sort by column, toggling the direction when it is already the sort column"""
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        for name in self.columns:
+            arrow = (" ▼" if self.sort_reverse else " ▲") if name == column else ""
+            self.tree.heading(name, text=self.headings[name] + arrow)
+        self.set_rows(self._all_rows)
+
+    # Scrolling
+
+    def yview(self, *args):
+        """Scrollbar command: handles moveto and scroll requests"""
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.rows)))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.page_size
+            self.scroll_to(self.offset + amount)
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, len(self.rows) - self.page_size))
+        if offset != self.offset:
+            self.offset = offset
+            self._render()
+
+    def _scroll_units(self, units):
+        self.scroll_to(self.offset + units)
+        return "break"
+
+    def _on_mousewheel(self, event):
+        step = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self._scroll_units(-3 * step)
+
+    # Events
+
+    def _on_configure(self, event):
+        page_size = max(1, (event.height - self.heading_height) // self.row_height)
+        if page_size != self.page_size:
+            self.page_size = page_size
+            self.scroll_to(self.offset)
+            self._render()
+
+    def _on_click(self, event, mode):
+        if self.tree.identify_region(event.x, event.y) == "heading":
+            return None
+        self.tree.focus_set()
+        iid = self.tree.identify_row(event.y)
+        if not iid:
+            return "break"
+        key = self.rows[self.offset + int(iid)]
+
+        if mode == "toggle":
+            self.selected ^= {key}
+            self.anchor = key
+        elif mode == "range" and self.anchor is not None:
+            positions = self._position_map()
+            start, end = sorted((positions[self.anchor], positions[key]))
+            self.selected = set(self.rows[start:end + 1])
+        else:
+            self.selected = {key}
+            self.anchor = key
+
+        self._render()
+        self.event_generate("<<SelectionChanged>>")
+        return "break"
+
+    def _on_double_click(self, event):
+        if self.tree.identify_row(event.y):
+            self.event_generate("<<RowActivate>>")
+        return "break"
+
+    def _move_selection(self, step):
+        if not self.rows:
+            return "break"
+        positions = self._position_map()
+        current = positions[self.anchor] if self.anchor is not None else -1
+        position = max(0, min(current + step, len(self.rows) - 1))
+        self.selection_set([self.rows[position]])
+        return "break"
+
+    # Internals
+
+    def _default_sort_value(self, key, column):
+        value = self.get_values(key)[self.columns.index(column)]
+        return value.lower() if isinstance(value, str) else value
+
+    def _sort_key(self, key):
+        return self.sort_value(key, self.sort_column)
+
+    def _apply_filter(self):
+        if self._filter is None:
+            self.rows = list(self._all_rows)
+        else:
+            self.rows = [key for key in self._all_rows if key in self._filter]
+        self._positions = None
+        present = self._position_map()
+        self.selected = {key for key in self.selected if key in present}
+        if self.anchor not in present:
+            self.anchor = None
+        self.offset = max(0, min(self.offset, len(self.rows) - self.page_size))
+        self._render()
+
+    def _insert_position(self, rows, key):
+        """Binary search for key's position in sorted rows"""
+        if self.sort_column is None:
+            return len(rows)
+        value = self._sort_key(key)
+        low, high = 0, len(rows)
+        while low < high:
+            middle = (low + high) // 2
+            other = self._sort_key(rows[middle])
+            if (other > value) if self.sort_reverse else (other < value):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _position_map(self):
+        if self._positions is None:
+            self._positions = {key: position for position, key in enumerate(self.rows)}
+        return self._positions
+
+    def _render(self):
+        """Show rows[offset:offset + page_size], touching only changed items"""
+        keys = self.rows[self.offset:self.offset + self.page_size]
+        selected = []
+        for slot, key in enumerate(keys):
+            iid = str(slot)
+            values = tuple(self.get_values(key))
+            if slot >= len(self._slots):
+                self.tree.insert("", tk.END, iid=iid, values=values)
+                self._slots.append(values)
+            elif self._slots[slot] != values:
+                self.tree.item(iid, values=values)
+                self._slots[slot] = values
+            if key in self.selected:
+                selected.append(iid)
+        while len(self._slots) > len(keys):
+            self._slots.pop()
+            self.tree.delete(str(len(self._slots)))
+        self.tree.selection_set(selected)
+        self._measure()
+
+        if self.rows:
+            first = self.offset / len(self.rows)
+            last = min(1.0, (self.offset + self.page_size) / len(self.rows))
+            self.scrollbar.set(first, last)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _measure(self):
+        """Take the real row and heading heights from the first drawn row"""
+        if not self._slots:
+            return
+        bbox = self.tree.bbox("0")
+        if bbox and bbox[3] > 0 and (bbox[1], bbox[3]) != (self.heading_height, self.row_height):
+            self.heading_height = bbox[1]
+            self.row_height = bbox[3]
+            height = self.tree.winfo_height()
+            if height > 1:
+                self.page_size = max(1, (height - self.heading_height) // self.row_height)
+                self.after_idle(self._render)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The freerdp_* modules live at the top of the repository, not in a package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,52 @@
+import pytest
+
+from freerdp_codecs import CPUFeatures, choose_codec
+from freerdp_discovery import FreeRDPInfo
+
+FULL_BUILD = FreeRDPInfo("/usr/bin/xfreerdp", "3.5.1", ("gfx", "rfx", "codec-cache"), features=("h264",))
+NO_H264_BUILD = FreeRDPInfo("/usr/bin/xfreerdp", "2.11.0", ("gfx", "rfx", "gfx-progressive"))
+FAST_CPU = CPUFeatures(8, ("avx2", "sse4_1"))
+
+
+def test_auto_prefers_avc444():
+    assert choose_codec({'codec': "auto"}, FULL_BUILD, FAST_CPU).codec == "avc444"
+
+
+def test_auto_uses_avc420_with_few_cores():
+    assert choose_codec({'codec': "auto"}, FULL_BUILD, CPUFeatures(2, ("avx2",))).codec == "avc420"
+
+
+def test_auto_uses_avc420_on_slow_links():
+    assert choose_codec({'codec': "auto", 'network_tuning': "satellite"}, FULL_BUILD, FAST_CPU).codec == "avc420"
+
+
+def test_auto_avoids_h264_without_simd():
+    assert choose_codec({'codec': "auto"}, FULL_BUILD, CPUFeatures(8, ("sse2",))).codec == "progressive"
+
+
+def test_auto_without_h264_uses_progressive():
+    assert choose_codec({'codec': "auto"}, NO_H264_BUILD, FAST_CPU).codec == "progressive"
+
+
+def test_auto_keeps_defaults_for_an_unprobed_build():
+    choice = choose_codec({'codec': "auto"}, None, FAST_CPU)
+    assert choice.codec == "" and choice.args == []
+
+
+def test_remotefx_checkbox_asks_auto_for_rfx():
+    assert choose_codec({'codec': "auto", 'remotefx': True}, FULL_BUILD, FAST_CPU).codec == "rfx"
+
+
+def test_requested_codec_is_used_as_is():
+    choice = choose_codec({'codec': "avc444"}, NO_H264_BUILD, FAST_CPU)
+    assert choice.codec == "avc444"
+    assert any("does not list" in reason for reason in choice.reasons)
+
+
+def test_codec_selection_off():
+    assert choose_codec({'codec': ""}, FULL_BUILD, FAST_CPU).codec == ""
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError, match="Unknown codec 'h265'"):
+        choose_codec({'codec': "h265"}, FULL_BUILD, FAST_CPU)
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from freerdp_control import ControlError, ControlServer, NotRunning, request, send_request, use_unix_socket
+
+pytestmark = pytest.mark.skipif(not use_unix_socket(), reason="tested over a Unix socket")
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "control.sock"
+
+
+def test_request_round_trip(path):
+    server = ControlServer(path, {"echo": lambda request: request['value']})
+    assert server.start()
+    try:
+        assert send_request(path, "echo", value=42) == 42
+        with pytest.raises(ControlError, match="unknown command"):
+            send_request(path, "missing")
+    finally:
+        server.close()
+
+
+def test_second_server_does_not_start(path):
+    first = ControlServer(path, {})
+    second = ControlServer(path, {})
+    assert first.start()
+    try:
+        assert not second.start()
+        assert "pid" in send_request(path, "ping")
+    finally:
+        first.close()
+
+
+def test_nothing_listening(path):
+    with pytest.raises(NotRunning):
+        send_request(path, "ping", timeout=1)
+
+
+@pytest.mark.parametrize("reply", [b"{truncated\n", b"[1, 2]\n"])
+def test_unreadable_answer(path, reply):
+    async def answer(reader, writer):
+        await reader.readline()
+        writer.write(reply)
+        await writer.drain()
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_unix_server(answer, path=str(path))
+        async with server:
+            await request(path, "ping", timeout=2)
+
+    with pytest.raises(ControlError, match="unreadable answer"):
+        asyncio.run(run())
@@ -0,0 +1,74 @@
+import pytest
+
+from freerdp_import import read_csv, read_rdp
+
+
+def write(path, text, encoding="utf-8"):
+    path.write_text(text, encoding=encoding)
+    return path
+
+
+def test_csv_with_header_aliases(tmp_path):
+    path = write(tmp_path / "hosts.csv", "Connection,Host,User,BPP,Gateway Host\n"
+                                         "Work,rdp.example.com:3390,CORP\\alice,16,gw.example.com\n"
+                                         ",bare.example.com,,,\n"
+                                         "No server,,bob,,\n")
+    assert list(read_csv(path)) == [
+        ("Work", {'server': "rdp.example.com", 'port': "3390", 'username': "alice", 'domain': "CORP",
+                  'color_depth': "16", 'gateway': "gw.example.com"}),
+        ("bare.example.com", {'server': "bare.example.com"}),
+    ]
+
+
+def test_csv_without_header_is_a_host_list(tmp_path):
+    path = write(tmp_path / "hosts.csv", "one.example.com\ntwo.example.com:3390\n")
+    assert list(read_csv(path)) == [
+        ("one.example.com", {'server': "one.example.com"}),
+        ("two.example.com", {'server': "two.example.com", 'port': "3390"}),
+    ]
+
+
+def test_csv_coerces_booleans_and_enumerations(tmp_path):
+    path = write(tmp_path / "hosts.csv", "name,server,clipboard,codec\na,h1,yes,AVC420\n")
+    [(name, settings)] = read_csv(path)
+    assert settings['clipboard'] is True
+    assert settings['codec'] == "avc420"
+
+
+def test_csv_bad_value_raises_without_on_error(tmp_path):
+    path = write(tmp_path / "hosts.csv", "name,server,codec\na,h1,bogus\n")
+    with pytest.raises(ValueError, match="line 2"):
+        list(read_csv(path))
+
+
+def test_csv_bad_value_is_skipped_with_on_error(tmp_path):
+    path = write(tmp_path / "hosts.csv", "name,server,codec\na,h1,bogus\nb,h2,rfx\n")
+    errors = []
+    records = list(read_csv(path, on_error=errors.append))
+    assert records == [("a", {'server': "h1"}), ("b", {'server': "h2", 'codec': "rfx"})]
+    assert len(errors) == 1 and errors[0].startswith("line 2: codec must be one of")
+
+
+def test_rdp_file(tmp_path):
+    path = write(tmp_path / "Work Server.rdp", "full address:s:rdp.example.com:3390\r\n"
+                                               "username:s:CORP\\alice\r\n"
+                                               "screen mode id:i:2\r\n"
+                                               "session bpp:i:24\r\n"
+                                               "disable wallpaper:i:1\r\n"
+                                               "gatewayhostname:s:gw.example.com\r\n"
+                                               "gatewayusagemethod:i:1\r\n", encoding="utf-16")
+    [(name, settings)] = read_rdp(path)
+    assert name == "Work Server"
+    assert settings == {'server': "rdp.example.com", 'port': "3390", 'username': "alice", 'domain': "CORP",
+                        'fullscreen': True, 'color_depth': "24", 'wallpaper': False, 'gateway': "gw.example.com"}
+
+
+def test_rdp_gateway_not_used(tmp_path):
+    path = write(tmp_path / "direct.rdp", "full address:s:host\ngatewayhostname:s:gw\ngatewayusagemethod:i:0\n")
+    [(name, settings)] = read_rdp(path)
+    assert 'gateway' not in settings
+
+
+def test_rdp_without_address_yields_nothing(tmp_path):
+    path = write(tmp_path / "empty.rdp", "username:s:alice\n")
+    assert list(read_rdp(path)) == []
@@ -0,0 +1,53 @@
+import pytest
+
+import freerdp_launcher
+from freerdp_launcher import RateLimiter, ReconnectSupervisor
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(freerdp_launcher.time, "monotonic", clock)
+    return clock
+
+
+def test_rate_limiter_allows_a_burst_then_the_rate(clock):
+    limiter = RateLimiter(per_minute=6, burst=2)
+    assert limiter.take() == 0
+    assert limiter.take() == 0
+    assert limiter.take() == pytest.approx(10.0)
+
+    clock.now += 4
+    assert limiter.take() == pytest.approx(6.0)
+    clock.now += 6
+    assert limiter.take() == 0
+
+
+def test_rate_limiter_refills_only_up_to_the_burst(clock):
+    limiter = RateLimiter(per_minute=60, burst=3)
+    for i in range(3):
+        limiter.take()
+    clock.now += 3600
+    assert [limiter.take() for i in range(3)] == [0, 0, 0]
+    assert limiter.take() > 0
+
+
+def test_backoff_doubles_with_equal_jitter():
+    supervisor = ReconnectSupervisor(lambda cmd, name: None, base_delay=2, max_delay=30)
+    for attempt, delay in ((1, 2), (2, 4), (3, 8), (4, 16)):
+        samples = [supervisor.backoff(attempt) for i in range(200)]
+        assert all(delay / 2 <= sample <= delay for sample in samples)
+
+
+def test_backoff_is_capped():
+    supervisor = ReconnectSupervisor(lambda cmd, name: None, base_delay=2, max_delay=30)
+    samples = [supervisor.backoff(20) for i in range(200)]
+    assert all(15 <= sample <= 30 for sample in samples)
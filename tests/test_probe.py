@@ -0,0 +1,122 @@
+import socket
+import struct
+import threading
+
+import pytest
+
+from freerdp_probe import connection_request, first_failure, probe_address, probe_settings
+
+
+def connection_confirm(kind, code):
+    """Build an X.224 Connection Confirm carrying an RDP_NEG_RSP (kind 2) or RDP_NEG_FAILURE (kind 3)"""
+    negotiation = struct.pack("<BBHI", kind, 0, 8, code)
+    x224 = struct.pack("!BBHHB", 6 + len(negotiation), 0xD0, 0, 0, 0) + negotiation
+    return struct.pack("!BBH", 3, 0, 4 + len(x224)) + x224
+
+
+class StubServer:
+    """Listen on a loopback port and answer one connection with reply, or stay silent when reply is None"""
+
+    def __init__(self, reply=None):
+        self.reply = reply
+        self.received = b""
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        conn, address = self.sock.accept()
+        with conn:
+            conn.settimeout(2)
+            try:
+                self.received = conn.recv(64)
+            except OSError:
+                pass
+            if self.reply is not None:
+                conn.sendall(self.reply)
+            else:
+                self._done.wait(5)
+
+    def close(self):
+        self._done.set()
+        self._thread.join(5)
+        self.sock.close()
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(reply=None):
+        server = StubServer(reply)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def closed_port():
+    with socket.create_server(("127.0.0.1", 0)) as sock:
+        return sock.getsockname()[1]
+
+
+def test_server_accepts_tls(stub):
+    server = stub(connection_confirm(0x02, 0x01))
+    result = probe_address("Server", "127.0.0.1", server.port, timeout=2, negotiate=True)
+    assert result.ok
+    assert result.detail == "TLS"
+    assert server.received == connection_request()
+
+
+def test_server_negotiation_failure_is_still_reachable(stub):
+    server = stub(connection_confirm(0x03, 0x05))
+    result = probe_address("Server", "127.0.0.1", server.port, timeout=2, negotiate=True)
+    assert result.ok
+    assert result.detail == "RDP, server requires NLA (CredSSP)"
+
+
+def test_server_refused():
+    result = probe_address("Server", "127.0.0.1", closed_port(), timeout=2, negotiate=True)
+    assert not result.ok
+    assert "no reply" not in result.detail
+
+
+def test_server_silent_times_out(stub):
+    server = stub(None)
+    result = probe_address("Server", "127.0.0.1", server.port, timeout=0.3, negotiate=True)
+    assert not result.ok
+    assert result.detail == "connected but no reply within 0.3 s"
+
+
+def test_server_bad_negotiation(stub):
+    server = stub(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+    result = probe_address("Server", "127.0.0.1", server.port, timeout=2, negotiate=True)
+    assert not result.ok
+    assert result.detail == "not an RDP server (no TPKT reply)"
+
+
+def test_settings_probe_the_server_with_its_port(stub):
+    server = stub(connection_confirm(0x02, 0x02))
+    results = probe_settings({'server': "127.0.0.1", 'port': str(server.port)}, timeout=2)
+    assert [(result.role, result.detail) for result in results] == [("Server", "NLA")]
+    assert first_failure(results) is None
+
+
+def test_gateway_is_probed_instead_of_the_server(stub):
+    # Not a TLS server, so the handshake fails after the TCP connect
+    server = stub(b"not tls")
+    results = probe_settings({'server': "unreachable.invalid", 'gateway': f"127.0.0.1:{server.port}"}, timeout=2)
+    assert len(results) == 1
+    assert results[0].role == "Gateway"
+    assert results[0].detail.startswith("connected but handshake failed")
+    assert first_failure(results) is results[0]
+
+
+def test_gateway_refused():
+    results = probe_settings({'server': "", 'gateway': f"127.0.0.1:{closed_port()}"}, timeout=2)
+    assert results[0].role == "Gateway"
+    assert not results[0].ok
@@ -0,0 +1,82 @@
+import pytest
+
+from freerdp_core import DEFAULT_SETTINGS
+from freerdp_store import ConnectionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ConnectionStore(tmp_path / "connections.db")
+    yield store
+    store.close()
+
+
+def settings(**values):
+    return dict(DEFAULT_SETTINGS, **values)
+
+
+def test_profile_inherits_its_template_chain(store):
+    store.save_template("Corp", settings(domain="CORP", gateway="gw.example.com"))
+    store.save_template("Corp HD", settings(domain="CORP", gateway="gw.example.com", width="2560"), parent="Corp")
+    store.put("Work", settings(server="rdp1", domain="CORP", gateway="gw.example.com", width="2560"),
+              template="Corp HD")
+
+    assert store.overrides("Work") == {'server': "rdp1"}
+    assert store["Work"]['domain'] == "CORP"
+    assert store["Work"]['width'] == "2560"
+    assert store.index.get("Work").gateway == "gw.example.com"
+
+
+def test_template_edit_reaches_profiles_that_do_not_override(store):
+    store.save_template("Corp", settings(gateway="gw1"))
+    store.put("Inherits", settings(server="a", gateway="gw1"), template="Corp")
+    store.put("Overrides", settings(server="b", gateway="own"), template="Corp")
+
+    assert store.save_template("Corp", settings(gateway="gw2")) == 2
+    assert store["Inherits"]['gateway'] == "gw2"
+    assert store.index.get("Inherits").gateway == "gw2"
+    assert store["Overrides"]['gateway'] == "own"
+    assert store.index.get("Overrides").gateway == "own"
+
+
+def test_resolution_survives_reopening(store, tmp_path):
+    store.save_template("Corp", settings(domain="CORP"))
+    store.put("Work", settings(server="rdp1", domain="CORP", username="alice"), template="Corp")
+    store.close()
+
+    reopened = ConnectionStore(tmp_path / "connections.db")
+    try:
+        assert reopened["Work"]['domain'] == "CORP"
+        assert reopened["Work"]['username'] == "alice"
+        assert reopened.index.get("Work").template == "Corp"
+    finally:
+        reopened.close()
+
+
+def test_template_cannot_inherit_from_its_child(store):
+    store.save_template("Parent", settings())
+    store.save_template("Child", settings(), parent="Parent")
+    with pytest.raises(ValueError):
+        store.save_template("Parent", settings(), parent="Child")
+
+
+def test_used_template_cannot_be_deleted(store):
+    store.save_template("Corp", settings())
+    store.put("Work", settings(server="a"), template="Corp")
+    with pytest.raises(ValueError):
+        store.delete_template("Corp")
+
+
+def test_failed_batch_leaves_the_index_unchanged(store):
+    store.put("Existing", settings(server="a"))
+    store.search("a")
+
+    class Broken(dict):
+        def items(self):
+            raise RuntimeError("cannot read settings")
+
+    with pytest.raises(RuntimeError):
+        store.put_many([("New", settings(server="new")), ("Broken", Broken())])
+    assert "New" not in store
+    assert len(store) == 1
+    assert store.search("new") == set()
@@ -0,0 +1,48 @@
+import pytest
+
+from freerdp_vault import Vault, VaultError, vault_available
+
+pytestmark = pytest.mark.skipif(not vault_available(), reason="the vault needs the cryptography package")
+
+# Deriving the key costs a tenth of a second, so the vault is created once per module
+MASTER = "correct horse"
+
+
+@pytest.fixture(scope="module")
+def vault_file(tmp_path_factory):
+    path = tmp_path_factory.mktemp("vault") / "vault.json"
+    Vault(path).create(MASTER)
+    return path
+
+
+@pytest.fixture
+def vault(vault_file):
+    vault = Vault(vault_file)
+    vault.unlock(MASTER)
+    return vault
+
+
+def test_password_round_trip(vault):
+    entry_id = vault.store("s3cret")
+    assert vault.get(entry_id) == "s3cret"
+
+
+def test_wrong_master_password(vault_file):
+    with pytest.raises(VaultError, match="Wrong master password"):
+        Vault(vault_file).unlock("wrong")
+
+
+@pytest.mark.parametrize("token", ["not base64!", "", "c2hvcnQ=", 42])
+def test_corrupt_entry_raises_vault_error(vault, token):
+    entry_id = vault.store("s3cret")
+    vault._load()['entries'][entry_id] = token
+    with pytest.raises(VaultError, match="is damaged"):
+        vault.get(entry_id)
+
+
+def test_swapped_entries_are_rejected(vault):
+    first, second = vault.store_many(["one", "two"])
+    entries = vault._load()['entries']
+    entries[first], entries[second] = entries[second], entries[first]
+    with pytest.raises(VaultError, match="is damaged"):
+        vault.get(first)